@@ -13,16 +13,14 @@ from utils.services import (
     get_food_type_by_points,
     get_next_goal_message,
     get_feed_point_by_id,
-    deduct_weekly_balance,
     execute_weekly_feeding_event,
     get_feeding_history,
-    get_week_start_date,
-    initialize_weekly_points_if_needed,
     get_all_feeds,
 )
 from utils.constants import FOOD_EMOJIS, CAT_EXPRESSIONS, PAGE_CONFIG
-from utils.ui import inject_base_styles
+from utils.ui import inject_base_styles, start_page_trace, finish_page_trace, food_tile_html
 from datetime import datetime, timedelta
+from utils.jst_calendar import JST, current_week
 
 # =========================
 # 🔐 認証チェック（最優先）
@@ -32,6 +30,7 @@ check_authentication()
 # ページ設定
 st.set_page_config(**PAGE_CONFIG)
 inject_base_styles()
+start_page_trace("main")
 
 # Supabase接続
 supabase = get_supabase_client()
@@ -55,34 +54,15 @@ with col2:
 # =========================
 # データ取得
 # =========================
+# ポイント・餌やりのデータは各パネル（fragment）の中で取得する
+# （パネル内の操作ではそのパネルの分だけ取り直す）
 
-# 今週分のweekly_pointsレコードを初期化(なければ作成)
-initialize_weekly_points_if_needed(supabase, user_id)
-
-# 今週のポイント
-week_points = get_current_week_points(supabase, user_id)
-
-# 餌やり可能残高(先週分)
-weekly_balance = get_weekly_balance(supabase, user_id)
-
-# 全餌マスタを取得
-all_feeds = get_all_feeds(supabase) 
-# 0ポイントの「カリカリ」を除外し、残高で買える餌をフィルタ
-affordable_feeds = [
-    f for f in all_feeds 
-    if f['feed_point'] <= weekly_balance and f['feed_point'] > 0
-]
-
-# 今週の餌(予定)の変数を再定義 (UIで利用するため)
-current_food_type = get_food_type_by_points(week_points)
-current_food_emoji = FOOD_EMOJIS.get(current_food_type, "❓")
-current_cat_expression = CAT_EXPRESSIONS.get(current_food_type, "😸")
+# 週の切り替え（スナップショットの作成）は週1回のジョブで行う（tools/points_rollover.py）
 
 # 先週の日付範囲(表示用)
-today = datetime.now().date()
-this_week_start = get_week_start_date(today)
-last_week_start = this_week_start - timedelta(days=7)
-last_week_end = this_week_start - timedelta(days=1)
+last_week = current_week(-1)
+last_week_start = last_week.start_date
+last_week_end = last_week.end_date - timedelta(days=1)
 last_week_range = f"{last_week_start.strftime('%m/%d')}~{last_week_end.strftime('%m/%d')}"
 
 # =========================
@@ -246,7 +226,17 @@ col_left, col_right = st.columns([1, 1])
 # ---------------------
 # 左側: 今週のポイント
 # ---------------------
-with col_left:
+@st.fragment
+def points_panel():
+    """今週の貯蓄ポイント（依存: 今週の weekly_points）"""
+    # 今週のポイント
+    week_points = get_current_week_points(supabase, user_id)
+
+    # 今週の餌(予定)
+    current_food_type = get_food_type_by_points(week_points)
+    current_food_emoji = FOOD_EMOJIS.get(current_food_type, "❓")
+    current_cat_expression = CAT_EXPRESSIONS.get(current_food_type, "😸")
+
     st.markdown("#### 💯 今週の貯蓄ポイント")
     
     # ポイント表示
@@ -287,39 +277,32 @@ with col_left:
         target_col = food_col1 if idx % 2 == 0 else food_col2
         
         with target_col:
-            unlocked = week_points >= threshold
-            is_current = food_name == current_food_type
-            
-            # スタイル設定
-            opacity = "1.0" if unlocked else "0.4"
-            border_color = "#667eea" if is_current else "#ddd"
-            bg_color = "#f0f4ff" if is_current else "#f9f9f9"
-            status = "✅" if unlocked else "🔒"
-            
             st.markdown(
-                f"""
-                <div style="
-                    text-align:center; 
-                    padding:8px; 
-                    margin:3px 0;
-                    border:2px solid {border_color}; 
-                    border-radius:8px; 
-                    background-color:{bg_color}; 
-                    opacity:{opacity};
-                ">
-                    <div style="font-size:24px; margin-bottom:2px;">{emoji}</div>
-                    <p style="margin:2px 0; font-weight:bold; font-size:11px;">{food_name}</p>
-                    <p style="margin:0; font-size:9px; color:#666;">{threshold}pt~</p>
-                    <p style="margin:2px 0; font-size:14px;">{status}</p>
-                </div>
-                """,
+                food_tile_html(food_name, threshold, emoji, week_points >= threshold, food_name == current_food_type),
                 unsafe_allow_html=True
             )
 
+
+with col_left:
+    points_panel()
+
 # ---------------------
 # 右側: 週末餌やりイベント
 # ---------------------
-with col_right:
+@st.fragment
+def feeding_panel():
+    """餌やりイベント（依存: 先週分の残高と餌マスタ。餌の選択ではこのパネルだけ再実行する）"""
+    # 餌やり可能残高(先週分)
+    weekly_balance = get_weekly_balance(supabase, user_id)
+
+    # 全餌マスタを取得
+    all_feeds = get_all_feeds(supabase)
+    # 0ポイントの「カリカリ」を除外し、残高で買える餌をフィルタ
+    affordable_feeds = [
+        f for f in all_feeds
+        if f['feed_point'] <= weekly_balance and f['feed_point'] > 0
+    ]
+
     st.markdown("#### 🎉🍖 餌やりイベント開催中!")
     st.caption(f"先週({last_week_range})貯めたポイントで、猫様にさっそく餌をあげよう!")
 
@@ -379,68 +362,76 @@ with col_right:
         ):
             feed_id = selected_feed['id']
 
-            if deduct_weekly_balance(supabase, user_id, selected_feed_cost):
-                success = execute_weekly_feeding_event(supabase, user_id, feed_id)
-
-                if success:
-                    new_balance = weekly_balance - selected_feed_cost
-
-                    st.success(f"🎉 {selected_feed_name}を あげました!")
-                    st.balloons()
-
-                    selected_cat_expression = CAT_EXPRESSIONS.get(selected_feed_name, "😸")
-                    st.markdown(f"""
-                    <div style="
-                        text-align: center;
-                        padding: 35px;
-                        background: linear-gradient(135deg, #ffeb3b 0%, #ff9800 100%);
-                        border-radius: 20px;
-                        margin: 20px 0;
-                        box-shadow: 0 6px 12px rgba(0, 0, 0, 0.15);
-                    ">
-                        <div style="font-size: 80px; margin-bottom: 15px;">{selected_cat_expression}{selected_cat_expression}{selected_cat_expression}</div>
-                        <h2 style="color: white; margin: 10px 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.3);">
-                            猫様たち大喜び!
-                        </h2>
-                        <p style="font-size: 16px; color: white; margin: 0;">
-                            残高: {new_balance}pt<br>
-                            また餌を あげられます!
-                        </p>
-                    </div>
-                    """, unsafe_allow_html=True)
-
-                    time.sleep(2)
-                    st.rerun()
-                else:
-                    st.error("餌やり履歴の登録に失敗しました。")
-            else:
-                st.error("残高が足りません。選択した餌のポイントを確認してください。")
-
-        # 📜💬 最近の餌やり履歴(右側ボックス内に表示)
-        with st.expander("📜 最近の餌やり履歴", expanded=False):
-            history = get_feeding_history(supabase, user_id, limit=3)
-
-            if not history:
-                st.info("まだ餌やり履歴が ありません")
-            else:
-                for record in history:
-                    feed_at = datetime.fromisoformat(record["feed_at"].replace("Z", "+00:00"))
-                    feed_name = record.get("feed_master", {}).get("feed_name", "不明")
-                    feed_point = record.get("feed_master", {}).get("feed_point", 0)
-                    feed_emoji = FOOD_EMOJIS.get(feed_name, "❓")
-                    date_str = feed_at.strftime("%m/%d(%a)")
-
-                    st.markdown(f"""
-                    <div style="
-                        padding: 12px;
-                        margin: 8px 0;
-                        background: #f9f9f9;
-                        border-left: 4px solid #667eea;
-                        border-radius: 5px;
-                    ">
-                        <span style="font-size: 14px;">📅 {date_str}</span>
-                        <span style="font-size: 20px; margin: 0 8px;">{feed_emoji}</span>
-                        <strong>{feed_name}</strong>
-                        <span style="color: #999; margin-left: 8px; font-size: 13px;">({feed_point}pt)</span>
-                    </div>
-                    """, unsafe_allow_html=True)
\ No newline at end of file
+            # 残高の確認・消費・餌やりの記録は1回の呼び出しで行う（残高不足などはその中で表示）
+            new_balance = execute_weekly_feeding_event(supabase, user_id, feed_id)
+
+            if new_balance is not None:
+                st.success(f"🎉 {selected_feed_name}を あげました!")
+                st.balloons()
+
+                selected_cat_expression = CAT_EXPRESSIONS.get(selected_feed_name, "😸")
+                st.markdown(f"""
+                <div style="
+                    text-align: center;
+                    padding: 35px;
+                    background: linear-gradient(135deg, #ffeb3b 0%, #ff9800 100%);
+                    border-radius: 20px;
+                    margin: 20px 0;
+                    box-shadow: 0 6px 12px rgba(0, 0, 0, 0.15);
+                ">
+                    <div style="font-size: 80px; margin-bottom: 15px;">{selected_cat_expression}{selected_cat_expression}{selected_cat_expression}</div>
+                    <h2 style="color: white; margin: 10px 0; text-shadow: 2px 2px 4px rgba(0,0,0,0.3);">
+                        猫様たち大喜び!
+                    </h2>
+                    <p style="font-size: 16px; color: white; margin: 0;">
+                        残高: {new_balance}pt<br>
+                        また餌を あげられます!
+                    </p>
+                </div>
+                """, unsafe_allow_html=True)
+
+                time.sleep(2)
+                # 残高と履歴の両方が変わるのでページ全体を再実行
+                st.rerun()
+
+
+@st.fragment
+def feeding_history_panel():
+    """最近の餌やり履歴（餌の選択では取り直さない）"""
+    with st.expander("📜 最近の餌やり履歴", expanded=False):
+        history = get_feeding_history(supabase, user_id, limit=3)
+
+        if not history:
+            st.info("まだ餌やり履歴が ありません")
+        else:
+            for record in history:
+                feed_at = datetime.fromisoformat(record["feed_at"].replace("Z", "+00:00"))
+                if feed_at.tzinfo is not None:
+                    feed_at = feed_at.astimezone(JST)
+                feed_name = record.get("feed_master", {}).get("feed_name", "不明")
+                feed_point = record.get("feed_master", {}).get("feed_point", 0)
+                feed_emoji = FOOD_EMOJIS.get(feed_name, "❓")
+                date_str = feed_at.strftime("%m/%d(%a)")
+
+                st.markdown(f"""
+                <div style="
+                    padding: 12px;
+                    margin: 8px 0;
+                    background: #f9f9f9;
+                    border-left: 4px solid #667eea;
+                    border-radius: 5px;
+                ">
+                    <span style="font-size: 14px;">📅 {date_str}</span>
+                    <span style="font-size: 20px; margin: 0 8px;">{feed_emoji}</span>
+                    <strong>{feed_name}</strong>
+                    <span style="color: #999; margin-left: 8px; font-size: 13px;">({feed_point}pt)</span>
+                </div>
+                """, unsafe_allow_html=True)
+
+
+with col_right:
+    feeding_panel()
+    # 📜💬 最近の餌やり履歴(右側ボックス内に表示)
+    feeding_history_panel()
+
+finish_page_trace()
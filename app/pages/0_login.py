@@ -1,8 +1,6 @@
 import streamlit as st
-from supabase import create_client, Client
-from dotenv import load_dotenv
 from PIL import Image
-import os
+from utils.services import get_supabase_client
 
 #画像挿入
 icon_image = Image.open("cat_icon.png")
@@ -14,10 +12,8 @@ st.set_page_config(
     layout="centered"
 )
 
-load_dotenv()
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+# ローカルスタンドイン（SUPABASE_BACKEND=local）にも対応するため共通関数から取得
+supabase = get_supabase_client()
 
 def sign_up(email, password):
     """新規登録処理"""
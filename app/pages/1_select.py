@@ -1,6 +1,5 @@
 # app/pages/1_select.py
 import streamlit as st
-from datetime import datetime
 from PIL import Image
 from utils.services import (
     check_authentication,       # 追加
@@ -9,9 +8,15 @@ from utils.services import (
     get_all_onomatopoeia,
     get_cat_by_onomatopoeia_id,
     get_all_situations,
+    get_situation_name,
+    get_current_season,
 )
-from utils.ui import setup_page
+from utils.ui import setup_page, finish_page_trace
 from utils.constants import ONOMATOPOEIA_EMOJIS
+from utils.jst_calendar import now_jst
+from utils.character_profiles import select_session_character
+from utils.character_selector import get_character_stats
+from utils.prefetch import get_prefetcher, session_prefetch_key
 
 #画像挿入
 icon_image = Image.open("cat_icon.png")
@@ -37,7 +42,7 @@ user_id = get_authenticated_user_id()  # 変更
 # =========================
 def get_default_situation_id():
     """現在時刻に基づいてデフォルトのsituation_idを返す"""
-    now = datetime.now()
+    now = now_jst()
     hour = now.hour
     
     # 時間帯別のデフォルトシーン
@@ -210,6 +215,31 @@ with col_pos:
             else:
                 st.error("❌ 対応する猫が見つかりません")
 
+# =========================
+# 提案の先読み
+# =========================
+# オノマトペを選んだ時点でキャラクターを決めて生成を始めておく（2_suggest で受け取る）
+
+prefetcher = get_prefetcher()
+if prefetcher is not None and st.session_state.get("selected_onomatopoeia_id"):
+    selected_onomatopoeia = st.session_state["selected_onomatopoeia"]
+    prefetch_character_name, prefetch_character_profile = select_session_character(
+        st.session_state,
+        selected_onomatopoeia,
+        onomatopoeia_id=st.session_state["selected_onomatopoeia_id"],
+        situation_id=st.session_state["selected_situation_id"],
+        stats=get_character_stats(supabase),
+    )
+    prefetcher.prefetch(
+        session_prefetch_key(st.session_state),
+        user_id,
+        selected_onomatopoeia,
+        prefetch_character_name,
+        prefetch_character_profile,
+        get_situation_name(supabase, st.session_state["selected_situation_id"]),
+        get_current_season(),
+    )
+
 # =========================
 # 選択状態の表示 + CTAボタン
 # =========================
@@ -227,4 +257,6 @@ with center:
         else:
             # 選択されていない場合はエラーメッセージを表示して処理を中断
             st.error("🐾 まず、今の気分に近いオノマトペを選択してください。")
-            st.stop()
\ No newline at end of file
+            st.stop()
+
+finish_page_trace()
@@ -7,14 +7,18 @@ from utils.services import (
     get_authenticated_user_id,  # 追加
     get_supabase_client,
     register_mood,
+    get_situation_name,
     get_current_season,
     generate_meal_suggestion_link,
 )
-from utils.ui import setup_page
+from utils.ui import setup_page, finish_page_trace, AFTER_MOOD_CARDS_HTML
 from utils.constants import AFTER_MOOD_CONFIG
 from utils.rhythm_reset import get_rhythm_reset
 from utils.meal_suggest import generate_meal_suggestion, get_fallback_meal
-from utils.character_profiles import select_character
+from utils.character_profiles import select_session_character
+from utils.character_selector import get_character_stats
+from utils.prefetch import get_prefetcher, session_prefetch_key
+from utils.session_store import MoodResult, get_session_store
 
 #画像挿入
 icon_image = Image.open("cat_icon.png")
@@ -64,21 +68,26 @@ cat_name = st.session_state["selected_cat_name"]
 situation_id = st.session_state["selected_situation_id"]
 
 # シーン名を取得
-situation_map = {
-    1: "会議前",
-    2: "締め切り直前",
-    3: "朝イチ",
-    4: "昼食後",
-    5: "夕方",
-    6: "その他"
-}
-situation = situation_map.get(situation_id, "その他")
+situation = get_situation_name(supabase, situation_id)
 
 # 季節を取得
 season = get_current_season()
 
-# キャラクター選択（オノマトペに応じて自動選択）
-character_name, character_profile = select_character(onomatopoeia)
+# キャラクター選択（オノマトペとシーンごとの効果をもとに自動選択、1_select で選んでいればそれを使う）
+character_name, character_profile = select_session_character(
+    st.session_state,
+    onomatopoeia,
+    onomatopoeia_id=st.session_state["selected_onomatopoeia_id"],
+    situation_id=situation_id,
+    stats=get_character_stats(supabase),
+)
+
+# 1_select で始めた先読み
+prefetcher = get_prefetcher()
+prefetch_key = session_prefetch_key(st.session_state)
+
+# 生成した提案の置き場（直近数件だけ持つ）
+store = get_session_store(st.session_state)
 
 # =========================
 # 上半分: 猫からの提案
@@ -98,6 +107,42 @@ st.markdown(f"""
 
 st.markdown("---")
 
+# =========================
+# タイマー（fragment: 押してもこの部分だけ再実行）
+# =========================
+
+@st.fragment
+def rhythm_timer(one_liner_after: str):
+    """タイマーボタン（10秒/30秒/60秒、デフォルトなし）とカウントダウン"""
+    st.markdown("**⏱️ タイマー：**")
+    col_t1, col_t2, col_t3 = st.columns(3)
+    
+    timer_clicked = None
+    with col_t1:
+        if st.button("10秒", key="timer_10", use_container_width=True):
+            timer_clicked = 10
+    with col_t2:
+        if st.button("30秒", key="timer_30", use_container_width=True):
+            timer_clicked = 30
+    with col_t3:
+        if st.button("60秒", key="timer_60", use_container_width=True):
+            timer_clicked = 60
+    
+    # タイマー実行
+    if timer_clicked:
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        
+        for t in range(timer_clicked, 0, -1):
+            progress = (timer_clicked - t) / timer_clicked
+            progress_bar.progress(progress)
+            status_text.info(f"⏱️ 残り {t} 秒")
+            time.sleep(1)
+        
+        progress_bar.progress(1.0)
+        status_text.success(f"✅ {one_liner_after}")
+
+
 # 2カラムレイアウト
 col1, col2 = st.columns(2)
 
@@ -119,14 +164,13 @@ with col1:
     """, unsafe_allow_html=True)
     
     # OpenAI生成（キャッシュ対応）
-    cache_key = f"rhythm_{onomatopoeia}_{character_name}_{situation}_{season}"
+    reset = store.suggestion("rhythm", onomatopoeia, character_name, situation, season)
     
-    if cache_key not in st.session_state:
+    if reset is None:
         with st.spinner("🐱 猫様が考え中..."):
-            reset = get_rhythm_reset(onomatopoeia, character_name, character_profile, situation, season, use_ai=True)
-            st.session_state[cache_key] = reset
-    else:
-        reset = st.session_state[cache_key]
+            reset = prefetcher.take(prefetch_key, "rhythm", onomatopoeia, character_name, situation, season) if prefetcher else None
+            reset = reset or get_rhythm_reset(onomatopoeia, character_name, character_profile, situation, season, use_ai=True, user_id=user_id)
+            store.remember_suggestion("rhythm", onomatopoeia, character_name, situation, season, reset)
     
     # タイトル
     st.markdown(f"### {reset.get('title', '')}")
@@ -138,34 +182,8 @@ with col1:
     
     st.markdown("")
     
-    # タイマーボタン（10秒/30秒/60秒、デフォルトなし）
-    st.markdown("**⏱️ タイマー：**")
-    col_t1, col_t2, col_t3 = st.columns(3)
-    
-    timer_clicked = None
-    with col_t1:
-        if st.button("10秒", key="timer_10", use_container_width=True):
-            timer_clicked = 10
-    with col_t2:
-        if st.button("30秒", key="timer_30", use_container_width=True):
-            timer_clicked = 30
-    with col_t3:
-        if st.button("60秒", key="timer_60", use_container_width=True):
-            timer_clicked = 60
-    
-    # タイマー実行
-    if timer_clicked:
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for t in range(timer_clicked, 0, -1):
-            progress = (timer_clicked - t) / timer_clicked
-            progress_bar.progress(progress)
-            status_text.info(f"⏱️ 残り {t} 秒")
-            time.sleep(1)
-        
-        progress_bar.progress(1.0)
-        status_text.success(f"✅ {reset.get('one_liner_after', 'お疲れ様！')}")
+    # タイマー（ボタンを押してもタイマー部分だけ再実行）
+    rhythm_timer(reset.get('one_liner_after', 'お疲れ様！'))
     
     # 猫のミニ儀式（薄い青、ここで改行OK）
     st.markdown(f"""
@@ -194,18 +212,17 @@ with col2:
     """, unsafe_allow_html=True)
     
     # OpenAI生成（キャッシュ対応）
-    cache_key = f"meal_{onomatopoeia}_{character_name}_{situation}_{season}"
+    meal = store.suggestion("meal", onomatopoeia, character_name, situation, season)
     
-    if cache_key not in st.session_state:
+    if meal is None:
         with st.spinner("🐱 猫様が考え中..."):
-            meal = generate_meal_suggestion(onomatopoeia, character_name, character_profile, situation, season)
+            meal = prefetcher.take(prefetch_key, "meal", onomatopoeia, character_name, situation, season) if prefetcher else None
+            meal = meal or generate_meal_suggestion(onomatopoeia, character_name, character_profile, situation, season, user_id=user_id)
             
             if meal is None:
-                meal = get_fallback_meal(onomatopoeia)
+                meal = get_fallback_meal(onomatopoeia, character_name, situation, season)
             
-            st.session_state[cache_key] = meal
-    else:
-        meal = st.session_state[cache_key]
+            store.remember_suggestion("meal", onomatopoeia, character_name, situation, season, meal)
     
     # メニュー名
     human = meal.get("human", {})
@@ -280,60 +297,57 @@ with col_link2:
 st.markdown("---")
 st.markdown("### 🐾 提案を見て、今の気持ちは？")
 
-# 3つの選択肢（横並び）
-cols = st.columns(3)
-
-selected_after_mood_id = None
-
-for after_mood_id, config in AFTER_MOOD_CONFIG.items():
-    col_idx = after_mood_id - 1
-    with cols[col_idx]:
-        st.markdown(
-            f"""
-            <div style="border:2px solid #ddd; border-radius:10px; padding:15px; margin:10px 0; background:#f9f9f9; text-align:center; height:180px; display:flex; flex-direction:column; justify-content:center;">
-                <h2 style="margin:10px 0; font-size:1.5em;">{config['label']}</h2>
-                <p style="color:#666; font-size:14px;">{config['description']}</p>
-                <p style="color:#999; font-size:12px;">+{config['points']}pt</p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        
-        if st.button(
-            "これ選ぶ", 
-            key=f"after_mood_{after_mood_id}", 
-            use_container_width=True,
-            type="secondary" # ← 条件分岐を削除し、すべてをsecondary（灰色）に固定
-        ):
-            selected_after_mood_id = after_mood_id
 
-# =========================
-# 気分登録
-# =========================
+@st.fragment
+def after_mood_panel():
+    """気分の変化の選択と登録（ボタンを押しても提案部分は再実行しない）"""
+    # 3つの選択肢（横並び）
+    cols = st.columns(3)
+
+    selected_after_mood_id = None
 
-if selected_after_mood_id:
-    points_earned = AFTER_MOOD_CONFIG[selected_after_mood_id]["points"]
+    for after_mood_id, config in AFTER_MOOD_CONFIG.items():
+        col_idx = after_mood_id - 1
+        with cols[col_idx]:
+            st.markdown(AFTER_MOOD_CARDS_HTML[after_mood_id], unsafe_allow_html=True)
+        
+            if st.button(
+                "これ選ぶ", 
+                key=f"after_mood_{after_mood_id}", 
+                use_container_width=True,
+                type="secondary" # ← 条件分岐を削除し、すべてをsecondary（灰色）に固定
+            ):
+                selected_after_mood_id = after_mood_id
+
+
+    # 気分登録
+    if selected_after_mood_id:
+        points_earned = AFTER_MOOD_CONFIG[selected_after_mood_id]["points"]
     
-    # データベースに登録（シーンID、キャラクター情報も含める）
-    success = register_mood(
-        supabase,
-        user_id,
-        st.session_state["selected_onomatopoeia_id"],
-        st.session_state["selected_cat_id"],
-        selected_after_mood_id,
-        points_earned,
-        situation_id=situation_id,
-        character_name=character_name,
-        rhythm_content=st.session_state.get(f"rhythm_{onomatopoeia}_{character_name}_{situation}_{season}"),
-        meal_content=st.session_state.get(f"meal_{onomatopoeia}_{character_name}_{situation}_{season}")
-    )
+        # データベースに登録（シーンID、キャラクター情報も含める）
+        success = register_mood(
+            supabase,
+            user_id,
+            st.session_state["selected_onomatopoeia_id"],
+            st.session_state["selected_cat_id"],
+            selected_after_mood_id,
+            points_earned,
+            situation_id=situation_id,
+            character_name=character_name,
+            rhythm_content=store.suggestion("rhythm", onomatopoeia, character_name, situation, season),
+            meal_content=store.suggestion("meal", onomatopoeia, character_name, situation, season)
+        )
     
-    if success:
-        # セッションに保存（3_complete.pyで使用）
-        st.session_state["points_earned"] = points_earned
-        st.session_state["after_mood_label"] = AFTER_MOOD_CONFIG[selected_after_mood_id]["label"]
+        if success:
+            # セッションに保存（3_complete.pyで使用）
+            store.result = MoodResult(points_earned, AFTER_MOOD_CONFIG[selected_after_mood_id]["label"])
         
-        # 完了画面へ
-        st.switch_page("pages/3_complete.py")
-    else:
-        st.error("❌ 登録に失敗しました。もう一度お試しください。")
\ No newline at end of file
+            # 完了画面へ
+            st.switch_page("pages/3_complete.py")
+        else:
+            st.error("❌ 登録に失敗しました。もう一度お試しください。")
+
+
+after_mood_panel()
+
+finish_page_trace()
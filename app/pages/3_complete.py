@@ -8,8 +8,9 @@ from utils.services import (
     get_current_week_points,
     get_food_type_by_points,
 )
-from utils.ui import setup_page
+from utils.ui import setup_page, finish_page_trace, food_card_html, points_earned_html, next_goal_html
 from utils.constants import FOOD_EMOJIS, FOOD_THRESHOLDS, CAT_EXPRESSIONS
+from utils.session_store import end_funnel, get_session_store
 
 #画像挿入
 icon_image = Image.open("cat_icon.png")
@@ -34,14 +35,16 @@ user_id = get_authenticated_user_id()  # 変更
 # セッション確認
 # =========================
 
-if "points_earned" not in st.session_state:
+result = get_session_store(st.session_state).result
+
+if result is None:
     st.warning("⚠️ 先に気分を登録してください")
     if st.button("気分選択へ", type="primary"):
         st.switch_page("pages/1_select.py")
     st.stop()
 
 # セッションデータ取得
-points_earned = st.session_state["points_earned"]
+points_earned = result.points_earned
 cat_name = st.session_state.get("selected_cat_name", "にゃん")
 
 # 今週の累積ポイント取得
@@ -85,15 +88,7 @@ col1, col2 = st.columns([1, 1])
 with col1:
     st.markdown("### 🎁 今回獲得ポイント")
     
-    st.markdown(
-        f"""
-        <div style="text-align:center; padding:40px 20px; background:linear-gradient(135deg,#667eea 0%,#764ba2 100%); border-radius:15px; color:white; margin:10px 0;">
-            <h1 style="font-size:60px; margin:0;">+{points_earned}pt</h1>
-            <p style="font-size:20px; margin-top:15px; opacity:.9;">🐱 {cat_name} も喜んでいるよ！</p>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    st.markdown(points_earned_html(points_earned, cat_name), unsafe_allow_html=True)
 
 # 間隔を広げる
 st.markdown("<div style='margin:40px 0;'></div>", unsafe_allow_html=True)
@@ -124,14 +119,7 @@ with col2:
     for threshold, food_name in [(30, "ちゅ〜る"), (60, "サーモン"), (100, "高級マグロ")]:
         if week_points < threshold:
             remaining = threshold - week_points
-            st.markdown(
-                f"""
-                <div style="background-color:#e3f2fd; padding:12px; border-radius:8px; border-left:4px solid #2196f3; text-align:center;">
-                    <p style="font-size:18px; margin:0; color:#1976d2; font-weight:bold;">💡 あと{remaining}ptで「{food_name}」！</p>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+            st.markdown(next_goal_html(remaining, food_name), unsafe_allow_html=True)
             break
     else:
         st.success("🎊 最高達成！")
@@ -157,33 +145,9 @@ cols = st.columns(4)
 
 for col, (food_name, threshold) in zip(cols, FOOD_THRESHOLDS.items()):
     with col:
-        unlocked = week_points >= threshold
-        
         # ロック済み: はっきり、未ロック: ぼやける
-        opacity = "1.0" if unlocked else "0.3"
-        border_color = "#667eea" if food_name == food_type else "#ddd"
-        bg_color = "#f0f4ff" if food_name == food_type else "#f9f9f9"
-        
-        emoji = FOOD_EMOJIS[food_name]
-        status = "✓" if unlocked else "🔒"
-        
         st.markdown(
-            f"""
-            <div style="
-                text-align:center; 
-                padding:15px; 
-                border:2px solid {border_color}; 
-                border-radius:10px; 
-                background-color:{bg_color}; 
-                opacity:{opacity};
-                transition: all 0.3s ease;
-            ">
-                <div style="font-size:40px; margin-bottom:5px;">{emoji}</div>
-                <p style="margin:3px 0; font-weight:bold; font-size:14px;">{food_name}</p>
-                <p style="margin:0; font-size:11px; color:#666;">{threshold}pt~</p>
-                <p style="margin:3px 0; font-size:18px;">{status}</p>
-            </div>
-            """,
+            food_card_html(food_name, threshold, FOOD_EMOJIS[food_name], week_points >= threshold, food_name == food_type),
             unsafe_allow_html=True
         )
 
@@ -198,18 +162,7 @@ col1, col2 = st.columns(2)
 with col1:
     if st.button("🏠 ホームへ戻る", use_container_width=True, type="primary"):
         # セッションクリア（ホームへ戻るため、これまでの記録をクリア）
-        keys_to_clear = [
-            "selected_onomatopoeia_id",
-            "selected_onomatopoeia",
-            "selected_cat_id",
-            "selected_cat_name",
-            "selected_cat_trait",
-            "points_earned",
-            "after_mood_label",
-        ]
-        for key in keys_to_clear:
-            if key in st.session_state:
-                del st.session_state[key]
+        end_funnel(st.session_state)
 
         st.switch_page("main.py")
 
@@ -222,3 +175,5 @@ with col2:
 
         # 遷移先を pages/4_feedback.py に変更
         st.switch_page("pages/4_feedback.py")
+
+finish_page_trace()
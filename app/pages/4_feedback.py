@@ -6,13 +6,16 @@ from utils.services import (
     get_authenticated_user_id,  # 追加
     get_supabase_client,
     get_month_summary,
+    get_master_index,
 )
-from utils.ui import setup_page
+from utils.ui import setup_page, finish_page_trace
+from utils.llm import complete_text
+from utils.llm_limits import LLMLimitExceeded
+from utils.shared_cache import get_shared_cache
+import hashlib
 import pandas as pd
-from datetime import date, timedelta
+from utils.jst_calendar import today_jst, current_week, days_window
 from supabase import create_client, Client
-from openai import OpenAI
-import pandas as pd
 
 #画像挿入
 icon_image = Image.open("cat_icon.png")
@@ -33,9 +36,9 @@ supabase = get_supabase_client()
 user_id = get_authenticated_user_id()  # 変更
 
 # 今日の日付
-today = date.today()
-monday_this_week = today - timedelta(days=today.weekday())  # 月曜始まり
-monday_last_week = monday_this_week - timedelta(weeks=1)
+today = today_jst()
+monday_this_week = current_week(today=today).start_date  # 月曜始まり（JST）
+monday_last_week = current_week(-1, today=today).start_date
 
 # 対象ユーザーのUUID（認証済みユーザー）
 target_user_id = user_id  # 🆕 変更: 既に取得済みのuser_idを使用
@@ -43,15 +46,18 @@ target_user_id = user_id  # 🆕 変更: 既に取得済みのuser_idを使用
 # ===================================
 # ログをまとめて取得（Supabaseクエリを1回に統合）★変更点
 # ===================================
-start_date_31days = (date.today() - timedelta(days=28)).isoformat()
+start_date_31days = days_window(today, 28).start_iso()
+# マスタは結合せずID列だけ取得し、キャッシュ済みのマスタインデックスで名前を解決する
+LOG_COLUMNS = ["id", "created_at", "situation_id", "onomatopoeia_id", "cat_id", "points_earned"]
 logs_response = (
     supabase.table("mood_register_log")
-    .select("id, created_at, situation_master(situation), onomatopoeia_master(onomatopoeia), cat_master(cat_name), points_earned")
+    .select(", ".join(LOG_COLUMNS))
     .eq("user_id", target_user_id)
     .gte("created_at", start_date_31days)
     .execute()
 )
-df_logs = pd.DataFrame(logs_response.data)
+df_logs = pd.DataFrame(logs_response.data or [], columns=LOG_COLUMNS)
+master_index = get_master_index(supabase)
 
 # 今週・先週・28日間の件数を pandas 側で計算
 # 日時のパース：Timestamp型として保持
@@ -86,17 +92,16 @@ except Exception as e:
 
 
 # ===================================
-# ログ整形（json_normalizeで高速化）★変更点
+# ログ整形（ID列をマスタインデックスで名前に解決）
 # ===================================
 df_logs["日付"] = pd.to_datetime(df_logs["created_at_jst"]).dt.strftime("%Y-%m-%d")
 
-# ネスト展開を apply ではなく json_normalize に変更
-situations = pd.json_normalize(df_logs["situation_master"])
-onomatopoeias = pd.json_normalize(df_logs["onomatopoeia_master"])
-cats = pd.json_normalize(df_logs["cat_master"])
-df_logs["シーン"] = situations["situation"]
-df_logs["オノマトペ"] = onomatopoeias["onomatopoeia"]
-df_logs["猫"] = cats["cat_name"]
+situation_names = {k: v["situation"] for k, v in master_index["situation"].items()}
+onomatopoeia_names = {k: v["onomatopoeia"] for k, v in master_index["onomatopoeia"].items()}
+cat_names = {k: v["cat_name"] for k, v in master_index["cat"].items()}
+df_logs["シーン"] = df_logs["situation_id"].map(situation_names)
+df_logs["オノマトペ"] = df_logs["onomatopoeia_id"].map(onomatopoeia_names)
+df_logs["猫"] = df_logs["cat_id"].map(cat_names)
 
 # 必要な列だけ残す
 log_display_df = df_logs[["日付", "シーン", "オノマトペ"]]
@@ -126,10 +131,9 @@ else:
 ## ---------------------------------------------
 ## A. 生成AI API 呼び出し関数
 ## ---------------------------------------------
-client = OpenAI()
 #GPT呼び出しをキャッシュ化
 @st.cache_data(ttl=3600) # キャッシュの有効期限を1時間に設定
-def run_gpt_cached(logs_text):
+def run_gpt_cached(logs_text, user_id):
     request_to_gpt = f"""
     あなたはユーザーの感情データを分析する優秀なアシスタントです。以下は、あるユーザーが過去28日間に記録した感情データです。
     各行には、記録日時、状況の説明、感情を表すオノマトペが含まれています。
@@ -148,15 +152,24 @@ def run_gpt_cached(logs_text):
     データ:
     {logs_text}
     """
-    response =  client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "user", "content": request_to_gpt },
-            ],
-        )
-    # 返って来たレスポンスの内容はresponse.choices[0].message.content.strip()に格納されているので、これをoutput_contentに代入
-    output_content = response.choices[0].message.content.strip()
-    return output_content # 返って来たレスポンスの内容を返す
+    def generate():
+        # 接続先（本番/スタブ/fake）は utils.llm の設定で切り替わる
+        response_text = complete_text(
+                [
+                    {"role": "user", "content": request_to_gpt },
+                ],
+                user_id=user_id,
+            )
+        if response_text is None:
+            raise RuntimeError("OPENAI_API_KEY が設定されていません")
+        return response_text.strip()
+
+    # 複数ワーカー構成では、別のワーカーが作った同じデータのレポートを使う
+    shared = get_shared_cache()
+    if shared is None:
+        return generate()
+    report_key = hashlib.sha256(f"{user_id}\n{logs_text}".encode("utf-8")).hexdigest()
+    return shared.get_or_compute("feedback", report_key, 3600, generate) # 返って来たレスポンスの内容を返す
 
 ## ---------------------------------------------
 ## A. ログ取得と整形
@@ -164,14 +177,15 @@ def run_gpt_cached(logs_text):
 try:
     #created_at と situation と onomatopoeia をプロンプト用に文章に変換
     logs_text = "\n".join(
-        f"{row['created_at']}: "
-        f"{row['situation_master']['situation'] if row.get('situation_master') else ''}: "
-        f"{row['onomatopoeia_master']['onomatopoeia'] if row.get('onomatopoeia_master') else ''}"
-        for _, row in df_logs.iterrows()
+        f"{created_at}: {situation if isinstance(situation, str) else ''}: {onomatopoeia if isinstance(onomatopoeia, str) else ''}"
+        for created_at, situation, onomatopoeia in zip(df_logs["created_at"], df_logs["シーン"], df_logs["オノマトペ"])
     )
     #生成AI分析実行
     with st.spinner("振り返りを作成中です。少々お待ちくださいニャ…🐾"):
-        output_content_text = run_gpt_cached(logs_text)
+        output_content_text = run_gpt_cached(logs_text, user_id)
+except LLMLimitExceeded:
+    # 制限超過はキャッシュされないので、時間をおけば再度生成される
+    output_content_text = "今日はたくさん振り返ってくれたニャ。少し時間をおいて、また見に来てほしいニャ🐾"
 except Exception as e:
     st.error(f"AI分析エラーが発生しました: {type(e).__name__}: {e}")
 
@@ -215,6 +229,8 @@ else:
 
 with st.expander("📂 直近4週間のログを表示"):
     st.dataframe(log_display_df)
+    if st.button("📚 すべての記録を見る", key="history_button"):
+        st.switch_page("pages/5_history.py")
 
 # =========================
 # アクションボタン
@@ -230,4 +246,6 @@ with col1:
 
 with col2:
     if st.button("📝 今の気分を記録する", use_container_width=True, type="secondary"):
-        st.switch_page("pages/1_select.py") 
\ No newline at end of file
+        st.switch_page("pages/1_select.py")
+
+finish_page_trace()
@@ -0,0 +1,130 @@
+# app/pages/5_history.py
+import streamlit as st
+import pandas as pd
+from PIL import Image
+from utils.services import (
+    check_authentication,
+    get_authenticated_user_id,
+    get_supabase_client,
+    get_master_index,
+    get_mood_history_page,
+)
+from utils.ui import setup_page, finish_page_trace
+from utils.constants import AFTER_MOOD_CONFIG
+
+#画像挿入
+icon_image = Image.open("cat_icon.png")
+
+# ページ設定
+setup_page(
+    page_title="すべての記録",
+    page_icon=icon_image,
+    show_home=True,
+    home_href="/",
+    add_title_spacer=True,
+)
+
+# 🔐 認証チェック（最優先）
+check_authentication()
+
+# Supabase接続
+supabase = get_supabase_client()
+user_id = get_authenticated_user_id()
+
+PAGE_SIZE = 30
+
+master_index = get_master_index(supabase)
+
+# =========================
+# 絞り込み
+# =========================
+
+ALL_LABEL = "すべて"
+
+situation_options = {ALL_LABEL: None, **{v["situation"]: k for k, v in master_index["situation"].items()}}
+onomatopoeia_options = {ALL_LABEL: None, **{v["onomatopoeia"]: k for k, v in master_index["onomatopoeia"].items()}}
+cat_options = {ALL_LABEL: None, **{v["cat_name"]: k for k, v in master_index["cat"].items()}}
+
+col_sit, col_ono, col_cat = st.columns(3)
+with col_sit:
+    situation_label = st.selectbox("🕐 シーン", list(situation_options.keys()), key="history_situation")
+with col_ono:
+    onomatopoeia_label = st.selectbox("🐾 オノマトペ", list(onomatopoeia_options.keys()), key="history_onomatopoeia")
+with col_cat:
+    cat_label = st.selectbox("🐱 猫", list(cat_options.keys()), key="history_cat")
+
+filters = (
+    situation_options[situation_label],
+    onomatopoeia_options[onomatopoeia_label],
+    cat_options[cat_label],
+)
+
+# 絞り込みが変わったら先頭ページに戻す
+# カーソルのスタックだけを保持し、読み込んだ行はセッションに溜めない（メモリを一定に保つ）
+if st.session_state.get("history_filters") != filters:
+    st.session_state["history_filters"] = filters
+    st.session_state["history_cursors"] = [None]
+
+cursors = st.session_state["history_cursors"]
+
+rows, next_cursor = get_mood_history_page(
+    supabase,
+    user_id,
+    cursor=cursors[-1],
+    page_size=PAGE_SIZE,
+    situation_id=filters[0],
+    onomatopoeia_id=filters[1],
+    cat_id=filters[2],
+)
+
+# =========================
+# 一覧表示
+# =========================
+
+if not rows:
+    st.info("該当する記録がありません。")
+else:
+    df = pd.DataFrame(rows)
+    created_at = pd.to_datetime(df["created_at"], format="ISO8601", utc=True).dt.tz_convert("Asia/Tokyo")
+    display_df = pd.DataFrame({
+        "日時": created_at.dt.strftime("%Y-%m-%d %H:%M"),
+        "シーン": df["situation_id"].map({k: v["situation"] for k, v in master_index["situation"].items()}),
+        "オノマトペ": df["onomatopoeia_id"].map({k: v["onomatopoeia"] for k, v in master_index["onomatopoeia"].items()}),
+        "猫": df["cat_id"].map({k: v["cat_name"] for k, v in master_index["cat"].items()}),
+        "気分の変化": df["after_mood_id"].map({k: v["label"] for k, v in AFTER_MOOD_CONFIG.items()}),
+        "ポイント": df["points_earned"],
+    })
+    display_df.index = display_df.index + 1 + (len(cursors) - 1) * PAGE_SIZE
+    st.dataframe(display_df, use_container_width=True)
+
+st.caption(f"{len(cursors)}ページ目")
+
+# =========================
+# ページ送り
+# =========================
+
+col_prev, col_next = st.columns(2)
+
+with col_prev:
+    if st.button("◀ 新しい記録へ", use_container_width=True, disabled=len(cursors) <= 1):
+        cursors.pop()
+        st.rerun()
+
+with col_next:
+    if st.button("古い記録へ ▶", use_container_width=True, disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+st.markdown("---")
+
+col1, col2 = st.columns(2)
+
+with col1:
+    if st.button("🏠 ホームへ戻る", use_container_width=True, type="primary"):
+        st.switch_page("main.py")
+
+with col2:
+    if st.button("📊 振り返りへ", use_container_width=True):
+        st.switch_page("pages/4_feedback.py")
+
+finish_page_trace()
@@ -0,0 +1,192 @@
+# app/utils/auth_session.py
+"""
+ログイン中のセッション（アクセストークン / リフレッシュトークン）の管理
+
+以前は get_supabase_client のたびにクライアントを作り直して auth.set_session を呼んでいたため、
+再実行のたびにトークンの確認（期限切れなら更新）の通信が発生し、期限が近くても前もって更新しなかった。
+ここでは
+
+- アクセストークン（JWT）の期限は手元でデコードして読む（署名の検証はPostgREST側で行われる）
+- 期限まで AUTH_REFRESH_MARGIN 秒より余裕があれば、そのまま使う（通信なし）
+- 余裕が AUTH_REFRESH_MARGIN 秒を切ったら、今のトークンを使いつつ裏で更新する
+  更新結果は次の再実行で st.session_state に取り込む（裏のスレッドからは session_state に書かない）
+- 残りが AUTH_MIN_VALIDITY 秒を切っていたら（期限切れを含む）、その場で更新してから使う
+- リフレッシュトークンは使うと失効する（ローテーション）ため、同じトークンの更新は1回にまとめる
+
+設定:
+    AUTH_REFRESH_MARGIN=300
+    AUTH_MIN_VALIDITY=30
+"""
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, MutableMapping, Optional
+
+# 更新済みのトークンを取り込まれるまで持っておく数の上限
+_REFRESHED_MAX = 1024
+
+# 別のスレッドが更新中のとき、その場で待つ時間の上限（秒）
+REFRESH_WAIT_SECONDS = 10.0
+
+
+def decode_jwt_expiry(token: str) -> Optional[float]:
+    """JWTのペイロードから exp（UNIX時刻）を読む（読めなければNone）"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+
+@dataclass(frozen=True)
+class AuthTokens:
+    """ログイン中のトークン（expires_at はアクセストークンの期限、UNIX時刻）"""
+
+    access_token: str
+    refresh_token: str
+    expires_at: float
+
+    @classmethod
+    def from_session(cls, session: Any) -> "AuthTokens":
+        """supabase の Session（sign_in / refresh_session の結果）から作る"""
+        expires_at = getattr(session, "expires_at", None) or decode_jwt_expiry(session.access_token) or 0.0
+        return cls(session.access_token, session.refresh_token, float(expires_at))
+
+
+class _Refresh:
+    __slots__ = ("done", "tokens")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.tokens: Optional[AuthTokens] = None
+
+
+class AuthSessionManager:
+    """トークンの期限を見て、使い回すか更新するかを決める（プロセスで1つ）"""
+
+    def __init__(
+        self,
+        refresher: Callable[[str], AuthTokens],
+        refresh_margin: float = 300.0,
+        min_validity: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._refresher = refresher
+        self.refresh_margin = refresh_margin
+        self.min_validity = min_validity
+        self._clock = clock
+        self._lock = threading.Lock()
+        # リフレッシュトークン → 更新中の処理
+        self._inflight: Dict[str, _Refresh] = {}
+        # 使い終わったリフレッシュトークン → 更新後のトークン（次の再実行で取り込む）
+        self._refreshed: "OrderedDict[str, AuthTokens]" = OrderedDict()
+        self.stats = {"reused": 0, "background_refreshes": 0, "sync_refreshes": 0, "failures": 0}
+
+    def current(self, session_state: MutableMapping) -> Optional[AuthTokens]:
+        """
+        いま使うトークンを返す（未ログインならNone）
+        期限に余裕があれば通信しない。更新したトークンは session_state に書き戻す
+        """
+        access_token = session_state.get("access_token")
+        refresh_token = session_state.get("refresh_token")
+        if not access_token or not refresh_token:
+            return None
+
+        with self._lock:
+            tokens = self._refreshed.pop(refresh_token, None)
+        if tokens is None:
+            tokens = AuthTokens(access_token, refresh_token, decode_jwt_expiry(access_token) or 0.0)
+        else:
+            _store(session_state, tokens)
+
+        remaining = tokens.expires_at - self._clock()
+        if remaining > self.refresh_margin:
+            self.stats["reused"] += 1
+            return tokens
+        if remaining > self.min_validity:
+            self._start_refresh(tokens.refresh_token, background=True)
+            return tokens
+
+        refreshed = self._refresh_now(tokens.refresh_token)
+        if refreshed is None:
+            # 更新に失敗したら今のトークンのまま（期限切れならDB側で拒否される）
+            return tokens
+        _store(session_state, refreshed)
+        return refreshed
+
+    def _start_refresh(self, refresh_token: str, background: bool) -> _Refresh:
+        """同じリフレッシュトークンの更新を1回にまとめる（すでに更新中ならそれを返す）"""
+        with self._lock:
+            flight = self._inflight.get(refresh_token)
+            if flight is not None:
+                return flight
+            flight = self._inflight[refresh_token] = _Refresh()
+        if background:
+            self.stats["background_refreshes"] += 1
+            threading.Thread(target=self._run_refresh, args=(refresh_token, flight), daemon=True).start()
+        else:
+            self.stats["sync_refreshes"] += 1
+            self._run_refresh(refresh_token, flight)
+        return flight
+
+    def _run_refresh(self, refresh_token: str, flight: _Refresh) -> None:
+        try:
+            flight.tokens = self._refresher(refresh_token)
+        except Exception:
+            self.stats["failures"] += 1
+        finally:
+            with self._lock:
+                self._inflight.pop(refresh_token, None)
+                if flight.tokens is not None:
+                    self._refreshed[refresh_token] = flight.tokens
+                    while len(self._refreshed) > _REFRESHED_MAX:
+                        self._refreshed.popitem(last=False)
+            flight.done.set()
+
+    def _refresh_now(self, refresh_token: str) -> Optional[AuthTokens]:
+        """その場で更新する（裏で更新中なら、それを待って受け取る）"""
+        flight = self._start_refresh(refresh_token, background=False)
+        flight.done.wait(REFRESH_WAIT_SECONDS)
+        with self._lock:
+            self._refreshed.pop(refresh_token, None)
+        return flight.tokens
+
+
+def _store(session_state: MutableMapping, tokens: AuthTokens) -> None:
+    session_state["access_token"] = tokens.access_token
+    session_state["refresh_token"] = tokens.refresh_token
+
+
+# =========================
+# プロセス内シングルトン
+# =========================
+
+_manager: Optional[AuthSessionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_auth_session_manager(refresher: Callable[[str], AuthTokens]) -> AuthSessionManager:
+    """プロセス内のセッション管理（refresher は最初の呼び出しのものを使う）"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = AuthSessionManager(
+                    refresher,
+                    refresh_margin=float(os.getenv("AUTH_REFRESH_MARGIN", "300")),
+                    min_validity=float(os.getenv("AUTH_MIN_VALIDITY", "30")),
+                )
+    return _manager
+
+
+def reset_auth_session_manager() -> None:
+    """設定を変えたときに作り直す（ベンチマーク用）"""
+    global _manager
+    with _manager_lock:
+        _manager = None
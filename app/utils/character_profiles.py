@@ -3,6 +3,9 @@
 キャラクタープロファイルとオノマトペマッピング
 """
 import random
+from typing import MutableMapping, Optional
+
+from utils.character_selector import CharacterStatsIndex, choose_character
 
 # オノマトペ → キャラのマッピング（相性の良いキャラを2-3名）
 CHARACTER_MAPPING = {
@@ -121,12 +124,21 @@ CHARACTER_PROFILES = {
     },
 }
 
-def select_character(onomatopoeia: str) -> tuple[str, dict]:
+def select_character(
+    onomatopoeia: str,
+    onomatopoeia_id: Optional[int] = None,
+    situation_id: Optional[int] = None,
+    stats: Optional[CharacterStatsIndex] = None,
+) -> tuple[str, dict]:
     """
-    オノマトペに応じたキャラクターをランダムに選択
+    オノマトペに応じたキャラクターを選択
+    統計索引が渡された場合は、これまで気分が上向いた割合に応じて選ぶ（バンディット）
     
     Args:
         onomatopoeia: オノマトペ
+        onomatopoeia_id: オノマトペID（統計の参照に使用）
+        situation_id: シーンID（統計の参照に使用）
+        stats: キャラクター効果の統計索引
     
     Returns:
         tuple: (キャラ名, キャラプロファイル)
@@ -134,10 +146,34 @@ def select_character(onomatopoeia: str) -> tuple[str, dict]:
     # マッピングから候補を取得
     candidates = CHARACTER_MAPPING.get(onomatopoeia, ["フレーバー・アルケミスト"])
     
-    # ランダムに1名選択
-    selected_name = random.choice(candidates)
+    if stats is not None and onomatopoeia_id is not None:
+        selected_name = choose_character(candidates, stats, onomatopoeia_id, situation_id)
+    else:
+        # ランダムに1名選択
+        selected_name = random.choice(candidates)
     
     # プロファイルを取得
     profile = CHARACTER_PROFILES.get(selected_name, CHARACTER_PROFILES["フレーバー・アルケミスト"])
     
-    return selected_name, profile
\ No newline at end of file
+    return selected_name, profile
+
+
+def select_session_character(
+    session_state: MutableMapping,
+    onomatopoeia: str,
+    onomatopoeia_id: Optional[int] = None,
+    situation_id: Optional[int] = None,
+    stats: Optional[CharacterStatsIndex] = None,
+) -> tuple[str, dict]:
+    """
+    セッション内で選んだキャラクターを使い回す（再描画のたびに選び直さない）
+    オノマトペかシーンが変わったときだけ select_character で選び直す
+    1_select（先読み）と 2_suggest（表示・登録）で同じキャラクターになる
+    """
+    selected = session_state.get("selected_character")
+    if not selected or selected["onomatopoeia"] != onomatopoeia or selected["situation_id"] != situation_id:
+        name, _ = select_character(onomatopoeia, onomatopoeia_id, situation_id, stats)
+        selected = {"onomatopoeia": onomatopoeia, "situation_id": situation_id, "name": name}
+        session_state["selected_character"] = selected
+    name = selected["name"]
+    return name, CHARACTER_PROFILES.get(name, CHARACTER_PROFILES["フレーバー・アルケミスト"])
@@ -0,0 +1,142 @@
+# app/utils/character_selector.py
+"""
+効果の高いキャラクターを選ぶための統計索引とバンディット選択
+
+- (オノマトペID, シーンID, キャラ名) → [試行数, 成功数] をメモリ上の辞書で持つ
+  成功 = 気分の変化 after_mood_id >= 2（少し楽になった / スッキリした）
+- 集計表 character_effectiveness_rollup から定期的に読み直し（バックグラウンド）、
+  その後の登録はプロセス内で加算する → 選択のたびにDBを引かない
+- 選択はトンプソンサンプリング（Beta分布）。試行の少ない組み合わせも一定の確率で選ばれる
+
+設定:
+    CHARACTER_STATS_REFRESH_SECONDS=900   # 集計表を読み直す間隔
+"""
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 成功とみなす after_mood_id の下限
+SUCCESS_AFTER_MOOD_ID = 2
+
+# シーン未設定（集計表では 0）
+NO_SITUATION = 0
+
+# シーン別の試行が少ないときに、オノマトペ全体の成功率を事前分布として何試行分混ぜるか
+PRIOR_WEIGHT = 5.0
+
+StatsKey = Tuple[int, int, str]
+
+
+class CharacterStatsIndex:
+    """(オノマトペ, シーン, キャラ) ごとの試行数・成功数の索引"""
+
+    def __init__(self):
+        self._stats: Dict[StatsKey, List[int]] = {}
+        # シーンをまとめたオノマトペ単位の合計（事前分布用）
+        self._totals: Dict[Tuple[int, str], List[int]] = {}
+        self._lock = threading.Lock()
+        self.refreshed_at = 0.0
+        self._refreshing = False
+
+    def get(self, onomatopoeia_id: int, situation_id: Optional[int], character_name: str) -> Tuple[int, int]:
+        stats = self._stats.get((onomatopoeia_id, situation_id or NO_SITUATION, character_name))
+        return (stats[0], stats[1]) if stats else (0, 0)
+
+    def get_total(self, onomatopoeia_id: int, character_name: str) -> Tuple[int, int]:
+        totals = self._totals.get((onomatopoeia_id, character_name))
+        return (totals[0], totals[1]) if totals else (0, 0)
+
+    def record(self, onomatopoeia_id: int, situation_id: Optional[int], character_name: str, after_mood_id: int) -> None:
+        """登録1件分を加算（次の集計表の読み直しまでの差分）"""
+        success = 1 if after_mood_id >= SUCCESS_AFTER_MOOD_ID else 0
+        with self._lock:
+            stats = self._stats.setdefault((onomatopoeia_id, situation_id or NO_SITUATION, character_name), [0, 0])
+            stats[0] += 1
+            stats[1] += success
+            totals = self._totals.setdefault((onomatopoeia_id, character_name), [0, 0])
+            totals[0] += 1
+            totals[1] += success
+
+    def load(self, rows: List[Dict]) -> None:
+        """集計表の行で置き換える（辞書ごと差し替えるので読み取り側はロック不要）"""
+        stats: Dict[StatsKey, List[int]] = {}
+        totals: Dict[Tuple[int, str], List[int]] = {}
+        for row in rows:
+            key = (row["onomatopoeia_id"], row["situation_id"] or NO_SITUATION, row["character_name"])
+            stats[key] = [int(row["trials"]), int(row["successes"])]
+            total = totals.setdefault((key[0], key[2]), [0, 0])
+            total[0] += int(row["trials"])
+            total[1] += int(row["successes"])
+        with self._lock:
+            self._stats = stats
+            self._totals = totals
+            self.refreshed_at = time.monotonic()
+
+    def refresh(self, supabase) -> None:
+        response = (
+            supabase.table("character_effectiveness_rollup")
+            .select("onomatopoeia_id, situation_id, character_name, trials, successes")
+            .execute()
+        )
+        self.load(response.data or [])
+
+    def refresh_in_background(self, supabase, max_age: float) -> None:
+        """古くなっていたら別スレッドで読み直す（ページの描画は待たせない）"""
+        with self._lock:
+            if self._refreshing or time.monotonic() - self.refreshed_at < max_age:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh(supabase)
+            except Exception:
+                # 失敗しても手元の統計で選び続け、次の間隔で再試行する
+                with self._lock:
+                    self.refreshed_at = time.monotonic()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="character-stats-refresh", daemon=True).start()
+
+
+def choose_character(
+    candidates: List[str],
+    index: CharacterStatsIndex,
+    onomatopoeia_id: int,
+    situation_id: Optional[int],
+    rng: Optional[random.Random] = None,
+) -> str:
+    """
+    トンプソンサンプリングで候補から1名選ぶ
+    事前分布: オノマトペ全体での成功率を PRIOR_WEIGHT 試行分（データがなければ Beta(1, 1)）
+    """
+    rng = rng or random
+    best_name, best_sample = candidates[0], -1.0
+    for name in candidates:
+        trials, successes = index.get(onomatopoeia_id, situation_id, name)
+        total_trials, total_successes = index.get_total(onomatopoeia_id, name)
+        prior_rate = (total_successes + 1) / (total_trials + 2)
+        alpha = successes + 1 + PRIOR_WEIGHT * prior_rate
+        beta = trials - successes + 1 + PRIOR_WEIGHT * (1 - prior_rate)
+        sample = rng.betavariate(alpha, beta)
+        if sample > best_sample:
+            best_name, best_sample = name, sample
+    return best_name
+
+
+# =========================
+# プロセス内シングルトン
+# =========================
+
+_index = CharacterStatsIndex()
+
+
+def get_character_stats(supabase=None) -> CharacterStatsIndex:
+    """統計索引を取得（supabase を渡すと、古ければバックグラウンドで読み直す）"""
+    if supabase is not None:
+        _index.refresh_in_background(supabase, float(os.getenv("CHARACTER_STATS_REFRESH_SECONDS", "900")))
+    return _index
@@ -67,6 +67,22 @@ ONOMATOPOEIA_EMOJIS: Dict[str, str] = {
     "いらいら": "😠",
 }
 
+# オノマトペの気分の向き（onomatopoeia_master.polarity と同じ値）
+ONOMATOPOEIA_POLARITY: Dict[str, str] = {
+    "うとうと": "ネガティブ",
+    "ぐったり": "ネガティブ",
+    "びくびく": "ネガティブ",
+    "いらいら": "ネガティブ",
+    "ぼんやり": "ニュートラル",
+    "だらだら": "ニュートラル",
+    "そわそわ": "ニュートラル",
+    "まあまあ": "ニュートラル",
+    "しゃきっ": "ポジティブ",
+    "きびきび": "ポジティブ",
+    "のびのび": "ポジティブ",
+    "るんるん": "ポジティブ",
+}
+
 # =========================
 # カテゴリ別の色設定（UI用）
 # =========================
@@ -140,4 +156,5 @@ def validate_constants() -> None:
         assert isinstance(level, int), "AFTER_MOOD_CONFIG のキーは int である必要があります"
         for required in ("label", "points", "description"):
             assert required in cfg, f"AFTER_MOOD_CONFIG[{level}] に {required} がありません"
-        assert isinstance(cfg["points"], int) and cfg["points"] >= 0, f"AFTER_MOOD_CONFIG[{level}].points は0以上のintが必要です"
\ No newline at end of file
+        assert isinstance(cfg["points"], int) and cfg["points"] >= 0, f"AFTER_MOOD_CONFIG[{level}].points は0以上のintが必要です"
+    assert set(ONOMATOPOEIA_POLARITY.keys()) == set(ONOMATOPOEIA_EMOJIS.keys()), "ONOMATOPOEIA_POLARITY のキーが ONOMATOPOEIA_EMOJIS と一致しません"
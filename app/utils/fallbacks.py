@@ -0,0 +1,490 @@
+# app/utils/fallbacks.py
+"""
+LLMが使えないとき（障害・タイムアウト・予算超過）の提案ライブラリ
+リズムリセットと食事提案を、キャラクター・シーン・季節・気分の向き（polarity）で引けるようにしておく
+
+- 各提案には「合う条件」をタグとして付ける（None はどの値にも合う）
+- 起動時に全組み合わせについて最も条件の合う候補を求めて辞書にしておくので、
+  実行時の選択は辞書を1回引くだけ
+- 同じ候補が複数あるときはオノマトペで決まった1つを選ぶ（再描画で内容が変わらない）
+"""
+import copy
+import zlib
+from itertools import product
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.character_profiles import CHARACTER_PROFILES
+from utils.constants import ONOMATOPOEIA_POLARITY
+
+SITUATIONS = ["会議前", "締め切り直前", "朝イチ", "昼食後", "午後", "夕方", "夜", "寝る前", "その他"]
+SEASONS = ["春", "夏", "秋", "冬"]
+POLARITIES = ["ネガティブ", "ニュートラル", "ポジティブ"]
+
+# 条件が合ったときの重み（シーン > 気分の向き = キャラクター > 季節）
+MATCH_WEIGHTS = {"situations": 3, "polarities": 2, "characters": 2, "seasons": 1}
+
+NEGATIVE = ("ネガティブ",)
+NEUTRAL = ("ニュートラル",)
+POSITIVE = ("ポジティブ",)
+EVENING = ("夕方", "夜", "寝る前")
+
+# =========================
+# リズムリセット
+# =========================
+
+RHYTHM_LIBRARY: List[Dict[str, Any]] = [
+    {
+        "polarities": NEGATIVE, "situations": ("朝イチ",),
+        "content": {
+            "title": "🌅 目覚めの伸び",
+            "one_liner": "ゆっくり体を起こそう",
+            "steps": ["両腕を上に伸ばす", "4秒吸って胸を開く", "6秒かけて吐き切る"],
+            "cat_ritual": "猫様と一緒に、朝日の方へ大きく伸びをするニャ",
+            "one_liner_after": "今日も始まるニャ",
+        },
+    },
+    {
+        "polarities": NEGATIVE, "situations": ("昼食後",),
+        "content": {
+            "title": "💤 昼下がりリセット",
+            "one_liner": "眠気をそっと流そう",
+            "steps": ["首をゆっくり回す", "冷たい水をひと口", "肩を3回すくめる"],
+            "cat_ritual": "ひなたの猫様みたいに、背中を丸めてから伸ばすニャ",
+            "one_liner_after": "眠気さよならニャ",
+        },
+    },
+    {
+        "polarities": NEGATIVE, "situations": ("会議前",),
+        "content": {
+            "title": "🫁 緊張ほどき呼吸",
+            "one_liner": "肩の力を抜いていこう",
+            "steps": ["肩を耳まで上げる", "ストンと落とす", "4秒吸い8秒吐く"],
+            "cat_ritual": "猫様のしっぽのように、息をゆっくり長く吐くニャ",
+            "one_liner_after": "大丈夫、いけるニャ",
+        },
+    },
+    {
+        "polarities": NEGATIVE, "situations": ("締め切り直前",),
+        "content": {
+            "title": "⏳ 30秒の小休止",
+            "one_liner": "焦る時こそひと呼吸",
+            "steps": ["手を止めて目を閉じる", "鼻から深く3回吸う", "次の作業を1つ決める"],
+            "cat_ritual": "隣で猫様がゴロゴロ鳴く音を思い浮かべるニャ",
+            "one_liner_after": "一歩ずつでいいニャ",
+        },
+    },
+    {
+        "polarities": NEGATIVE, "situations": EVENING,
+        "content": {
+            "title": "🌙 ほどける呼吸",
+            "one_liner": "今日の疲れをほどこう",
+            "steps": ["照明を少し落とす", "4秒吸って7秒止める", "8秒かけて吐く"],
+            "cat_ritual": "猫様と並んで丸くなり、ゆっくりまばたきするニャ",
+            "one_liner_after": "今日もおつかれニャ",
+        },
+    },
+    {
+        "polarities": NEGATIVE,
+        "content": {
+            "title": "🫧 リズム・リセット",
+            "one_liner": "深呼吸から始めよう",
+            "steps": ["4秒吸う", "6秒吐く", "8回繰り返す"],
+            "cat_ritual": "一緒に深呼吸して、ゆったり過ごすニャ",
+            "one_liner_after": "おつかれさま",
+        },
+    },
+    {
+        "polarities": NEUTRAL, "situations": ("朝イチ",),
+        "content": {
+            "title": "☀️ スイッチオン",
+            "one_liner": "小さく始めてみよう",
+            "steps": ["窓の外を10秒眺める", "背筋を伸ばして座る", "今日の一歩を決める"],
+            "cat_ritual": "窓辺の猫様と並んで、外の様子を眺めるニャ",
+            "one_liner_after": "いい滑り出しニャ",
+        },
+    },
+    {
+        "polarities": NEUTRAL, "situations": ("昼食後", "午後", "夕方"),
+        "content": {
+            "title": "🚶 ちょこっと散歩",
+            "one_liner": "少し動いて切り替えよう",
+            "steps": ["席を立って伸びをする", "1分だけ歩く", "深呼吸して座る"],
+            "cat_ritual": "猫様のパトロールのように、部屋をひと回りするニャ",
+            "one_liner_after": "頭がすっきりニャ",
+        },
+    },
+    {
+        "polarities": NEUTRAL, "situations": ("会議前", "締め切り直前"),
+        "content": {
+            "title": "🎯 ひと言準備",
+            "one_liner": "やることを1つに絞ろう",
+            "steps": ["伝えたい一言を決める", "心の中で3回唱える", "ゆっくり息を吐く"],
+            "cat_ritual": "獲物を狙う猫様のように、じっと一点を見つめるニャ",
+            "one_liner_after": "準備ばっちりニャ",
+        },
+    },
+    {
+        "polarities": NEUTRAL,
+        "content": {
+            "title": "🔄 姿勢リセット",
+            "one_liner": "整えば気分も整う",
+            "steps": ["足裏を床につける", "背筋をすっと伸ばす", "静かに3回呼吸"],
+            "cat_ritual": "猫様のように、すっと座って前足をそろえるニャ",
+            "one_liner_after": "いい姿勢ニャ",
+        },
+    },
+    {
+        "polarities": POSITIVE, "situations": ("会議前", "締め切り直前"),
+        "content": {
+            "title": "⚡ 集中キープ",
+            "one_liner": "この勢いのままいこう",
+            "steps": ["机の上を1つ片付ける", "3秒吸って3秒吐く", "次の一手を書き出す"],
+            "cat_ritual": "猫様と目を合わせて、ゆっくりうなずくニャ",
+            "one_liner_after": "その調子ニャ",
+        },
+    },
+    {
+        "polarities": POSITIVE, "situations": EVENING,
+        "content": {
+            "title": "🌇 いい日の締め",
+            "one_liner": "良かったことを味わおう",
+            "steps": ["今日の良かったことを1つ", "短くメモに書く", "ゆっくり伸びをする"],
+            "cat_ritual": "猫様に今日の良かったことを報告するニャ",
+            "one_liner_after": "いい一日だったニャ",
+        },
+    },
+    {
+        "polarities": POSITIVE,
+        "content": {
+            "title": "🎵 ごきげん維持",
+            "one_liner": "いい気分をおすそわけ",
+            "steps": ["好きな曲を思い出す", "リズムに合わせて呼吸", "笑顔で肩を回す"],
+            "cat_ritual": "猫様のゴロゴロに合わせて、小さく手拍子するニャ",
+            "one_liner_after": "ごきげんニャ",
+        },
+    },
+    # 季節
+    {
+        "seasons": ("夏",),
+        "content": {
+            "title": "🧊 ひんやりリセット",
+            "one_liner": "熱をすっと逃がそう",
+            "steps": ["冷たい水で手首を冷やす", "ゆっくり5回呼吸", "首の後ろを伸ばす"],
+            "cat_ritual": "涼しい床に寝そべる猫様を思い浮かべるニャ",
+            "one_liner_after": "すずしいニャ",
+        },
+    },
+    {
+        "seasons": ("冬",),
+        "content": {
+            "title": "☕ ぬくもり呼吸",
+            "one_liner": "温かさで心をほどこう",
+            "steps": ["温かい飲み物を持つ", "湯気を見ながら吸う", "手の温もりを感じる"],
+            "cat_ritual": "こたつの猫様のように、温もりの中で目を細めるニャ",
+            "one_liner_after": "ぽかぽかニャ",
+        },
+    },
+    {
+        "seasons": ("春",),
+        "content": {
+            "title": "🌸 ふわっと深呼吸",
+            "one_liner": "春の空気を吸いこもう",
+            "steps": ["窓辺で外の空気を感じる", "花の香りを想像して吸う", "肩をゆるめて吐く"],
+            "cat_ritual": "ちょうちょを目で追う猫様のように、ふわっと力を抜くニャ",
+            "one_liner_after": "ふんわり軽くニャ",
+        },
+    },
+    {
+        "seasons": ("秋",),
+        "content": {
+            "title": "🍂 しずかな呼吸",
+            "one_liner": "耳をすましてひと休み",
+            "steps": ["目を閉じて耳をすます", "4秒吸って4秒止める", "6秒かけて吐く"],
+            "cat_ritual": "落ち葉の音に耳を立てる猫様と、しずかに過ごすニャ",
+            "one_liner_after": "心が落ち着いたニャ",
+        },
+    },
+    # キャラクター
+    {
+        "characters": ("スリーピー・シェフ",), "polarities": NEGATIVE,
+        "content": {
+            "title": "💤 ゆるゆる呼吸",
+            "one_liner": "ちょっと力を抜こう",
+            "steps": ["目を閉じて肩を落とす", "4秒吸って7秒止める", "8秒かけて吐く"],
+            "cat_ritual": "丸くなった猫様の寝息に合わせて、ゆっくり呼吸するニャ",
+            "one_liner_after": "休むのも仕事ニャ",
+        },
+    },
+    {
+        "characters": ("フォーカス・バリスタ",),
+        "content": {
+            "title": "☕ シャキッと整え",
+            "one_liner": "背筋から集中モードへ",
+            "steps": ["背筋を伸ばして座る", "3秒吸って肩を上げる", "ストンと落として吐く"],
+            "cat_ritual": "コーヒーの香りのそばで、猫様と並んで背伸びするニャ",
+            "one_liner_after": "集中スイッチON",
+        },
+    },
+    {
+        "characters": ("サウンド・クッカー",),
+        "content": {
+            "title": "🎵 リズム呼吸",
+            "one_liner": "リズムに乗ってリセット",
+            "steps": ["指で机を4回たたく", "リズムに合わせて吸う", "同じリズムで吐く"],
+            "cat_ritual": "猫様のゴロゴロ音に合わせて、小さく手拍子するニャ",
+            "one_liner_after": "いいリズムだニャ",
+        },
+    },
+    {
+        "characters": ("アロマ・キッチェリアン",),
+        "content": {
+            "title": "🌿 香りの深呼吸",
+            "one_liner": "香りで心をほどこう",
+            "steps": ["好きな香りを思い出す", "4秒かけて鼻から吸う", "6秒かけて口から吐く"],
+            "cat_ritual": "猫様の毛並みの香りをそっと感じて、一緒に目を細めるニャ",
+            "one_liner_after": "ふんわり軽く",
+        },
+    },
+    {
+        "characters": ("テクスチャー・アーキ",),
+        "content": {
+            "title": "✋ 手のひらリセット",
+            "one_liner": "触れて今に戻ろう",
+            "steps": ["手のひらを重ねる", "指先を順に押す", "ふっと力を抜く"],
+            "cat_ritual": "猫様の肉球の感触を思い浮かべて、そっと手を握るニャ",
+            "one_liner_after": "今ここに戻った",
+        },
+    },
+    {
+        "characters": ("サーモ・コンダクター",),
+        "content": {
+            "title": "🌡️ ぬくもり調律",
+            "one_liner": "温度を感じてひと休み",
+            "steps": ["両手をこすり合わせる", "温かい手を目に当てる", "ゆっくり5回呼吸"],
+            "cat_ritual": "日なたの温度を猫様と一緒に手のひらで感じるニャ",
+            "one_liner_after": "ぽかぽか回復",
+        },
+    },
+]
+
+# =========================
+# 食事提案
+# =========================
+
+MEAL_LIBRARY: List[Dict[str, Any]] = [
+    {
+        "situations": ("朝イチ",),
+        "content": {
+            "human": {
+                "menu": "バナナきなこヨーグルト",
+                "ingredients": ["ヨーグルト 100g", "バナナ 1/2本", "きなこ 小さじ2", "はちみつ 少々"],
+                "steps": ["バナナを手でちぎって入れる", "きなこをふりかける", "はちみつをかけて完成"],
+            },
+            "cat_ritual": "朝の光の中で、猫様と一緒にゆっくり一口目を味わうニャ",
+            "one_liner": "朝ごはんは大事ニャ",
+        },
+    },
+    {
+        "situations": ("朝イチ",), "seasons": ("秋", "冬"),
+        "content": {
+            "human": {
+                "menu": "ふわ玉みそ汁",
+                "ingredients": ["インスタント味噌汁 1袋", "卵 1個", "お湯 160ml"],
+                "steps": ["お湯で味噌汁を溶く", "溶き卵を回し入れる", "レンジで20秒温めて完成"],
+            },
+            "cat_ritual": "湯気の向こうの猫様と、ふーふーしながら温まるニャ",
+            "one_liner": "おなかから温まるニャ",
+        },
+    },
+    {
+        "situations": ("会議前",),
+        "content": {
+            "human": {
+                "menu": "ひとくちナッツ＆チョコ",
+                "ingredients": ["ミックスナッツ 10g", "レーズン 10g", "ハイカカオチョコ 1かけ"],
+                "steps": ["小皿に全部のせる", "ナッツをよく噛んで食べる", "チョコを最後にひとかけ"],
+            },
+            "cat_ritual": "猫様と目を合わせて、カリッと一粒ずつ味わうニャ",
+            "one_liner": "手が汚れないニャ",
+        },
+    },
+    {
+        "situations": ("締め切り直前",),
+        "content": {
+            "human": {
+                "menu": "ツナマヨクラッカー",
+                "ingredients": ["クラッカー 4枚", "ツナ缶 1/2缶", "マヨネーズ 小さじ1"],
+                "steps": ["ツナとマヨネーズを混ぜる", "クラッカーにのせる", "片手でつまんで完成"],
+            },
+            "cat_ritual": "ツナの香りに寄ってくる猫様を、やさしくなでるニャ（ツナはあげないニャ）",
+            "one_liner": "腹が減っては戦えぬニャ",
+        },
+    },
+    {
+        "situations": ("昼食後", "午後"),
+        "content": {
+            "human": {
+                "menu": "レモン炭酸水",
+                "ingredients": ["炭酸水 200ml", "レモン汁 小さじ1", "氷 3個"],
+                "steps": ["グラスに氷を入れる", "炭酸水を注ぐ", "レモン汁をたらして完成"],
+            },
+            "cat_ritual": "シュワシュワの音に耳を立てる猫様と、一緒に聞くニャ",
+            "one_liner": "眠気もはじけるニャ",
+        },
+    },
+    {
+        "situations": EVENING,
+        "content": {
+            "human": {
+                "menu": "はちみつホットミルク",
+                "ingredients": ["牛乳 150ml", "はちみつ 小さじ1", "シナモン 少々"],
+                "steps": ["牛乳をレンジで1分温める", "はちみつを溶かす", "シナモンをふって完成"],
+            },
+            "cat_ritual": "毛布にくるまった猫様の隣で、ゆっくり飲むニャ",
+            "one_liner": "今日はもう休むニャ",
+        },
+    },
+    {
+        "seasons": ("夏",),
+        "content": {
+            "human": {
+                "menu": "冷やしトマトの塩昆布和え",
+                "ingredients": ["トマト 1個", "塩昆布 ひとつまみ", "ごま油 少々"],
+                "steps": ["トマトを一口大に切る", "塩昆布とごま油で和える", "冷蔵庫で1分冷やして完成"],
+            },
+            "cat_ritual": "ひんやりした床で伸びる猫様と、涼しさを分け合うニャ",
+            "one_liner": "夏バテ知らずニャ",
+        },
+    },
+    {
+        "seasons": ("冬",),
+        "content": {
+            "human": {
+                "menu": "はちみつしょうが湯",
+                "ingredients": ["お湯 150ml", "はちみつ 小さじ2", "しょうがチューブ 2cm"],
+                "steps": ["マグにしょうがとはちみつを入れる", "お湯を注ぐ", "よく混ぜて完成"],
+            },
+            "cat_ritual": "湯気を見つめる猫様と、マグで手を温めるニャ",
+            "one_liner": "ぽかぽかニャ",
+        },
+    },
+    {
+        "seasons": ("春",),
+        "content": {
+            "human": {
+                "menu": "つぶしいちごミルク",
+                "ingredients": ["いちご 4粒", "牛乳 150ml", "砂糖 小さじ1"],
+                "steps": ["いちごをフォークでつぶす", "砂糖を混ぜる", "牛乳を注いで完成"],
+            },
+            "cat_ritual": "ピンク色のミルクを猫様に見せて、春を感じるニャ",
+            "one_liner": "春の味がするニャ",
+        },
+    },
+    {
+        "seasons": ("秋",),
+        "content": {
+            "human": {
+                "menu": "甘栗ヨーグルト",
+                "ingredients": ["むき甘栗 5粒", "ヨーグルト 100g", "はちみつ 小さじ1"],
+                "steps": ["甘栗を半分に割る", "ヨーグルトにのせる", "はちみつをかけて完成"],
+            },
+            "cat_ritual": "落ち葉の音を聞きながら、猫様とのんびり味わうニャ",
+            "one_liner": "秋を食べたニャ",
+        },
+    },
+    {
+        "polarities": POSITIVE,
+        "content": {
+            "human": {
+                "menu": "フルーツ炭酸ポンチ",
+                "ingredients": ["炭酸水 150ml", "冷凍フルーツ 50g", "はちみつ 小さじ1"],
+                "steps": ["グラスに冷凍フルーツを入れる", "はちみつをかける", "炭酸水を注いで完成"],
+            },
+            "cat_ritual": "グラスの泡を不思議そうに見る猫様と、乾杯するニャ",
+            "one_liner": "ごきげんに乾杯ニャ",
+        },
+    },
+    {
+        "polarities": NEGATIVE,
+        "content": {
+            "human": {
+                "menu": "温かいミルクティー",
+                "ingredients": ["紅茶ティーバッグ 1個", "牛乳 100ml", "はちみつ 小さじ1"],
+                "steps": ["マグカップに牛乳を入れて電子レンジ1分", "ティーバッグを入れて1分待つ", "はちみつを混ぜて完成"],
+            },
+            "cat_ritual": "温かいマグを一緒に持って、香りを嗅ぐニャ",
+            "one_liner": "まず一息つこうニャ",
+        },
+    },
+    {
+        "content": {
+            "human": {
+                "menu": "塩むすびと麦茶",
+                "ingredients": ["ごはん 茶碗1杯", "塩 ひとつまみ", "麦茶 1杯"],
+                "steps": ["手を水でぬらして塩をなじませる", "ごはんをふんわりにぎる", "麦茶と一緒にどうぞ"],
+            },
+            "cat_ritual": "猫様と並んで、ひと口ずつゆっくり噛むニャ",
+            "one_liner": "シンプルが一番ニャ",
+        },
+    },
+]
+
+
+# =========================
+# 索引
+# =========================
+
+IndexKey = Tuple[str, str, str, str]  # (キャラクター, シーン, 季節, polarity)
+
+
+def _score(entry: Dict[str, Any], character: str, situation: str, season: str, polarity: str) -> Optional[int]:
+    """条件が1つでも外れていればNone、合っていれば重みの合計"""
+    score = 0
+    for field, value in (("characters", character), ("situations", situation), ("seasons", season), ("polarities", polarity)):
+        allowed = entry.get(field)
+        if allowed is None:
+            continue
+        if value not in allowed:
+            return None
+        score += MATCH_WEIGHTS[field]
+    return score
+
+
+def build_index(library: List[Dict[str, Any]]) -> Dict[IndexKey, List[Dict[str, Any]]]:
+    """全組み合わせについて、最も条件の合う候補（同点は全部）を求めておく"""
+    index: Dict[IndexKey, List[Dict[str, Any]]] = {}
+    for key in product(CHARACTER_PROFILES, SITUATIONS, SEASONS, POLARITIES):
+        scored = [(s, e["content"]) for e in library if (s := _score(e, *key)) is not None]
+        best = max(s for s, _ in scored)
+        index[key] = [content for s, content in scored if s == best]
+    return index
+
+
+RHYTHM_INDEX = build_index(RHYTHM_LIBRARY)
+MEAL_INDEX = build_index(MEAL_LIBRARY)
+
+DEFAULT_CHARACTER = "フレーバー・アルケミスト"
+
+
+def _lookup(index: Dict[IndexKey, List[Dict[str, Any]]], onomatopoeia: str, character_name: Optional[str], situation: Optional[str], season: Optional[str]) -> Dict[str, Any]:
+    key = (
+        character_name if character_name in CHARACTER_PROFILES else DEFAULT_CHARACTER,
+        situation if situation in SITUATIONS else "その他",
+        season if season in SEASONS else "春",
+        ONOMATOPOEIA_POLARITY.get(onomatopoeia, "ニュートラル"),
+    )
+    candidates = index[key]
+    # 同じ入力なら同じ提案（zlib.crc32 はプロセスをまたいでも同じ値）
+    chosen = candidates[zlib.crc32(onomatopoeia.encode("utf-8")) % len(candidates)]
+    return copy.deepcopy(chosen)
+
+
+def get_fallback_rhythm(onomatopoeia: str, character_name: Optional[str] = None, situation: Optional[str] = None, season: Optional[str] = None) -> Dict[str, Any]:
+    """リズムリセットの代替提案"""
+    return _lookup(RHYTHM_INDEX, onomatopoeia, character_name, situation, season)
+
+
+def get_fallback_meal_suggestion(onomatopoeia: str, character_name: Optional[str] = None, situation: Optional[str] = None, season: Optional[str] = None) -> Dict[str, Any]:
+    """食事提案の代替提案（共感セリフはオノマトペから作る）"""
+    meal = _lookup(MEAL_INDEX, onomatopoeia, character_name, situation, season)
+    return {"empathy": f"「{onomatopoeia}」な気持ち、わかるニャ", **meal}
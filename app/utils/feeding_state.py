@@ -0,0 +1,145 @@
+# app/utils/feeding_state.py
+"""
+ユーザーごとの餌やり状態（今週餌やり済みか・最近の履歴・回数）を1回のクエリで求めてキャッシュする
+
+- feeding_event_log を「週次イベントの餌（feed_id >= 2）、新しい順、最大 HISTORY_LIMIT 件」で1回だけ読む
+  回数は同じリクエストの count="exact"
+  どちらも (user_id, feed_at desc, feed_id) の索引だけで答えられる（20261019000000_hot_query_indexes.sql）
+- 今週餌やり済みかは、最新の1件が今週の範囲に入っているかで判定する
+  （先頭1件で決まるので LIMIT 付きの索引走査で済み、週の全行を読まない）
+  判定は読むたびに行うので、キャッシュしたまま週をまたいでも正しい
+- キャッシュは餌やりの書き込み（invalidate）まで使い回す
+  別のプロセス・端末からの餌やりに備えて FEEDING_STATE_TTL 秒で取り直す
+
+設定:
+    FEEDING_STATE_CACHE_SIZE=10000   # キャッシュするユーザー数の上限
+    FEEDING_STATE_TTL=600
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils import jst_calendar
+
+# 週次イベントの餌（カリカリ id=1 は除く）
+WEEKLY_FEED_MIN_ID = 2
+
+# 1回のクエリで読む履歴の件数（ホーム画面の履歴は3件）
+HISTORY_LIMIT = 5
+
+
+@dataclass(frozen=True)
+class FeedingState:
+    """餌やり状態（history は新しい順、total は週次イベントの餌やりの総回数）"""
+
+    history: Tuple[Dict[str, Any], ...]
+    total: int
+
+    @property
+    def last_feed_at(self) -> Optional[datetime]:
+        if not self.history:
+            return None
+        return datetime.fromisoformat(self.history[0]["feed_at"].replace("Z", "+00:00"))
+
+    def fed_this_week(self) -> bool:
+        last_feed_at = self.last_feed_at
+        return last_feed_at is not None and jst_calendar.current_week().contains(last_feed_at)
+
+
+def fetch_feeding_state(supabase, user_id: str, limit: int = HISTORY_LIMIT) -> FeedingState:
+    """feeding_event_log を1回だけ読んで餌やり状態を作る。失敗時は例外を投げる"""
+    response = (
+        supabase.table("feeding_event_log")
+        .select("feed_at, feed_id", count="exact")
+        .eq("user_id", user_id)
+        .gte("feed_id", WEEKLY_FEED_MIN_ID)
+        .order("feed_at", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    rows = tuple(response.data or [])
+    total = response.count if response.count is not None else len(rows)
+    return FeedingState(history=rows, total=total)
+
+
+class FeedingStateCache:
+    """ユーザーID → (餌やり状態, 読んだ件数, 読んだ時刻) のLRU"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 600.0, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[FeedingState, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 読み込み中に餌やりがあったら、その読み込み結果はキャッシュしない
+        self._invalidated = 0
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, supabase, user_id: str, limit: int = HISTORY_LIMIT) -> FeedingState:
+        limit = max(limit, HISTORY_LIMIT)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                state, fetched_limit, fetched_at = entry
+                # 読んだ件数が足りない（続きがある）ときだけ読み直す
+                enough = fetched_limit >= limit or state.total <= len(state.history)
+                if now - fetched_at < self.ttl and enough:
+                    self._entries.move_to_end(user_id)
+                    self.stats["hits"] += 1
+                    return state
+            self.stats["misses"] += 1
+            invalidated = self._invalidated
+
+        state = fetch_feeding_state(supabase, user_id, limit)
+        with self._lock:
+            if invalidated != self._invalidated:
+                return state
+            self._entries[user_id] = (state, limit, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return state
+
+    def invalidate(self, user_id: str) -> None:
+        """餌やりを書き込んだら呼ぶ（次の読み取りでDBから取り直す）"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._invalidated += 1
+            self.stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# =========================
+# プロセス内シングルトン
+# =========================
+
+_cache: Optional[FeedingStateCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_feeding_state_cache() -> FeedingStateCache:
+    """プロセス内の餌やり状態キャッシュ"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FeedingStateCache(
+                    max_size=int(os.getenv("FEEDING_STATE_CACHE_SIZE", "10000")),
+                    ttl=float(os.getenv("FEEDING_STATE_TTL", "600")),
+                )
+    return _cache
+
+
+def reset_feeding_state_cache() -> None:
+    """キャッシュを作り直す（設定変更・ベンチマーク用）"""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,107 @@
+# app/utils/jst_calendar.py
+"""
+日本時間（JST）基準の週・月の境界計算
+すべてのポイント・残高・集計クエリはここで求めた範囲を使う
+
+- 週は月曜0:00 JST始まり、月は1日0:00 JST始まり
+- クエリには aware なUTCの半開区間 [start, end) を渡す
+- 境界はJSTの日付ごとにメモ化する（同じ日の再計算をしない）
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+
+# JSTは夏時間がないので固定オフセットで表す（tzdataに依存しない）
+JST = timezone(timedelta(hours=9), "JST")
+
+
+@dataclass(frozen=True)
+class TimeWindow:
+    """JSTの日付で区切った半開区間 [start, end)（start/endはUTC）"""
+
+    start_date: date
+    end_date: date
+    start: datetime
+    end: datetime
+
+    def start_iso(self) -> str:
+        """クエリ用のUTC ISO文字列（例: 2026-10-18T15:00:00+00:00）"""
+        return self.start.isoformat()
+
+    def end_iso(self) -> str:
+        return self.end.isoformat()
+
+    def contains(self, moment: datetime) -> bool:
+        return self.start <= moment.astimezone(timezone.utc) < self.end
+
+
+# =========================
+# 現在時刻
+# =========================
+
+def now_jst() -> datetime:
+    """現在のJST時刻（aware）"""
+    return datetime.now(JST)
+
+
+def today_jst() -> date:
+    """今日のJST日付"""
+    return now_jst().date()
+
+
+def to_jst_date(moment: datetime) -> date:
+    """日時をJSTの日付に変換（naiveはUTCとみなす）"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(JST).date()
+
+
+def jst_midnight_utc(day: date) -> datetime:
+    """JST日付の0:00をUTCのawareな日時で返す"""
+    return datetime.combine(day, time.min, tzinfo=JST).astimezone(timezone.utc)
+
+
+# =========================
+# 週・月の範囲（日付ごとにメモ化）
+# =========================
+
+@lru_cache(maxsize=256)
+def week_window(day: date, offset_weeks: int = 0) -> TimeWindow:
+    """dayを含む週（月曜始まり）からoffset_weeks週ずらした範囲"""
+    start_date = day - timedelta(days=day.weekday()) + timedelta(weeks=offset_weeks)
+    end_date = start_date + timedelta(days=7)
+    return TimeWindow(start_date, end_date, jst_midnight_utc(start_date), jst_midnight_utc(end_date))
+
+
+@lru_cache(maxsize=256)
+def month_window(day: date, offset_months: int = 0) -> TimeWindow:
+    """dayを含む月からoffset_months月ずらした範囲"""
+    index = day.year * 12 + (day.month - 1) + offset_months
+    start_date = date(index // 12, index % 12 + 1, 1)
+    index += 1
+    end_date = date(index // 12, index % 12 + 1, 1)
+    return TimeWindow(start_date, end_date, jst_midnight_utc(start_date), jst_midnight_utc(end_date))
+
+
+@lru_cache(maxsize=256)
+def days_window(day: date, days: int) -> TimeWindow:
+    """dayを含む直近days日間（今日の終わりまで）"""
+    end_date = day + timedelta(days=1)
+    start_date = end_date - timedelta(days=days)
+    return TimeWindow(start_date, end_date, jst_midnight_utc(start_date), jst_midnight_utc(end_date))
+
+
+def current_week(offset_weeks: int = 0, today: Optional[date] = None) -> TimeWindow:
+    """今週（offset_weeks=-1 で先週）の範囲"""
+    return week_window(today or today_jst(), offset_weeks)
+
+
+def current_month(offset_months: int = 0, today: Optional[date] = None) -> TimeWindow:
+    """今月の範囲"""
+    return month_window(today or today_jst(), offset_months)
+
+
+def week_start_of(moment: datetime) -> date:
+    """日時が属するJST週の月曜日"""
+    return week_window(to_jst_date(moment)).start_date
@@ -0,0 +1,352 @@
+# app/utils/llm.py
+"""
+LLM呼び出しの共通レイヤー
+接続先（OpenAI本番 / ローカルスタブサーバー / インプロセスfake）の切り替えと
+Chat Completions 呼び出しを一元化する
+
+同じ入力の生成はプロセス内で集約する（complete_text の coalesce_key）
+    LLM_COALESCE=1               # 実行中の同一リクエストに相乗りする（single-flight）
+    LLM_VARIANT_POOL_SIZE=0      # 同じキーの生成結果を何通りまで使い回すか（既定の0は無効。使い回すなら3など）
+    LLM_VARIANT_TTL=900          # 使い回す期間（秒、±20%のゆらぎを入れる）
+SHARED_CACHE_PATH を設定すると、生成結果と実行中の鍵はワーカー間でも共有する（utils/shared_cache.py）
+
+呼び出しごとにレート制限と1日の予算を確認する（utils/llm_limits.py）
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from utils.llm_fake import FakeOpenAI
+from utils.llm_limits import LLMLimitExceeded, get_llm_limiter
+from utils.shared_cache import get_shared_cache
+from utils.tracing import span
+
+load_dotenv()
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# =========================
+# 接続設定
+# =========================
+# LLM_BACKEND:
+#   "openai" (既定) : OPENAI_API_KEY で本番APIへ接続
+#   "stub"          : LLM_BASE_URL のOpenAI互換スタブ（tools/llm_stub_server.py）へ接続
+#   "fake"          : ネットワークを使わないインプロセスfake（LLM_FAKE_* で遅延・エラー率を設定）
+
+_client = None
+_client_lock = threading.Lock()
+
+# 計測用：プロセス内でのLLM呼び出し回数とトークン使用量
+_call_count = 0
+_usage_totals = {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+_count_lock = threading.Lock()
+
+
+def get_llm_backend() -> str:
+    """設定されたLLMバックエンド名を取得"""
+    return (os.getenv("LLM_BACKEND") or "openai").lower()
+
+
+def _create_client():
+    backend = get_llm_backend()
+
+    if backend == "fake":
+        return FakeOpenAI()
+
+    base_url = os.getenv("LLM_BASE_URL")
+    api_key = os.getenv("OPENAI_API_KEY")
+
+    if backend == "stub":
+        return OpenAI(api_key=api_key or "stub-key", base_url=base_url or "http://127.0.0.1:8787/v1")
+
+    if not api_key:
+        return None
+    return OpenAI(api_key=api_key, base_url=base_url) if base_url else OpenAI(api_key=api_key)
+
+
+def get_llm_client():
+    """
+    LLMクライアントを取得（プロセス内で1つを使い回す）
+
+    Returns:
+        OpenAI互換クライアント、APIキー未設定時はNone
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+    return _client
+
+
+def reset_llm_client() -> None:
+    """接続設定を変えたときにクライアントを作り直す（ベンチマーク用）"""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def get_llm_call_count() -> int:
+    """これまでのLLM呼び出し回数（ベンチマークで差分を取って使う）"""
+    return _call_count
+
+
+def get_llm_usage() -> Dict[str, int]:
+    """これまでのトークン使用量（cached_tokens はプロンプトキャッシュに当たった分）"""
+    with _count_lock:
+        return dict(_usage_totals)
+
+
+def _record_usage(usage: Any) -> Dict[str, int]:
+    details = getattr(usage, "prompt_tokens_details", None)
+    counts = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+    with _count_lock:
+        for key, value in counts.items():
+            _usage_totals[key] += value
+    return counts
+
+
+# =========================
+# Chat Completions
+# =========================
+
+def create_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    prompt_cache_key: Optional[str] = None,
+    user_id: Optional[str] = None,
+    **params: Any,
+) -> Optional[Any]:
+    """
+    Chat Completionsを呼び出す
+
+    Args:
+        messages: メッセージ配列
+        model: モデル名
+        prompt_cache_key: 同じ接頭辞のリクエストを同じキャッシュに寄せるためのキー（utils/prompts.py）
+        user_id: レート制限・予算を数えるユーザー（Noneなら全体の制限だけ）
+        **params: temperature などの追加パラメータ
+
+    Returns:
+        レスポンスオブジェクト、クライアント未設定時はNone
+        （API例外はそのまま送出、制限超過は LLMLimitExceeded）
+    """
+    global _call_count
+    client = get_llm_client()
+    if client is None:
+        return None
+    limiter = get_llm_limiter()
+    if limiter is not None:
+        reason = limiter.acquire(user_id)
+        if reason is not None:
+            raise LLMLimitExceeded(reason)
+    with _count_lock:
+        _call_count += 1
+    if prompt_cache_key:
+        params["extra_body"] = {**params.get("extra_body", {}), "prompt_cache_key": prompt_cache_key}
+    with span(
+        "llm.chat.completions",
+        "llm",
+        **{
+            "llm.backend": get_llm_backend(),
+            "llm.model": model,
+            "llm.prompt_chars": sum(len(m.get("content") or "") for m in messages),
+        },
+    ) as s:
+        resp = client.chat.completions.create(model=model, messages=messages, **params)
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            counts = _record_usage(usage)
+            s.attributes["llm.prompt_tokens"] = counts["prompt_tokens"]
+            s.attributes["llm.cached_tokens"] = counts["cached_tokens"]
+            s.attributes["llm.completion_tokens"] = counts["completion_tokens"]
+            if limiter is not None:
+                limiter.charge(user_id, counts["prompt_tokens"] + counts["completion_tokens"])
+        return resp
+
+
+def complete_text(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    prompt_cache_key: Optional[str] = None,
+    coalesce_key: Optional[str] = None,
+    user_id: Optional[str] = None,
+    **params: Any,
+) -> Optional[str]:
+    """
+    Chat Completionsを呼び出し、本文テキストだけを返す
+
+    coalesce_key を渡すと、同じキーの同時リクエストは1回の呼び出しを共有する
+    （キーには出力を決める入力をすべて含めること。utils/prompts.suggestion_cache_key）
+    制限を超えたときは同じキーの使い回し結果を返し、それもなければ LLMLimitExceeded を送出する
+    """
+    def call() -> Optional[str]:
+        resp = create_chat_completion(messages, model=model, prompt_cache_key=prompt_cache_key, user_id=user_id, **params)
+        if resp is None:
+            return None
+        return resp.choices[0].message.content or ""
+
+    coalescer = get_completion_coalescer() if coalesce_key else None
+    if coalescer is None:
+        return call()
+    key = f"{model}:{coalesce_key}"
+    shared = get_shared_cache() if coalescer.pool_size > 0 else None
+    def run_shared() -> Optional[str]:
+        # プロセス内で集約したうえで、他のワーカーの生成結果・実行中の生成にも相乗りする
+        return shared.compute_variant("llm", key, coalescer.pool_size, coalescer.ttl, call)
+
+    try:
+        return coalescer.run(key, run_shared if shared is not None else call)
+    except LLMLimitExceeded:
+        text = coalescer.peek(key)
+        if text is None and shared is not None:
+            text = shared.pick_variant("llm", key, 1)
+        if text is None:
+            raise
+        return text
+
+
+# =========================
+# 同一リクエストの集約
+# =========================
+# 朝イチなど、同じオノマトペ・キャラ・シーン・季節の生成が同時に集中するときに
+# 1回のLLM呼び出しを共有する
+#   - single-flight: 実行中の同じキーには新しく呼ばず、その結果を待って受け取る
+#   - variant pool : 直近の生成結果をキーごとに数通り持ち、揃ったらその中からランダムに返す
+#                    （期限にゆらぎを入れて、同じ時刻に一斉に作り直さないようにする）
+
+_VARIANT_MAX_KEYS = 2048
+_VARIANT_TTL_JITTER = 0.2
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class CompletionCoalescer:
+    """キー単位でLLM生成を集約する（single-flight + variant pool）"""
+
+    def __init__(self, pool_size: int = 0, ttl: float = 900.0, max_keys: int = _VARIANT_MAX_KEYS, rng: Optional[random.Random] = None):
+        self.pool_size = pool_size
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        # キー → [(本文, 期限)]（古いキーから捨てる）
+        self._variants: "OrderedDict[str, List[tuple]]" = OrderedDict()
+        self.stats = {"calls": 0, "shared": 0, "variant_hits": 0}
+
+    def _pick_variant(self, key: str) -> Optional[str]:
+        """期限内の結果が pool_size 通り揃っていれば1つ返す（ロック内で呼ぶ）"""
+        variants = self._variants.get(key)
+        if not variants:
+            return None
+        now = time.monotonic()
+        variants[:] = [v for v in variants if v[1] > now]
+        if len(variants) < self.pool_size:
+            return None
+        self._variants.move_to_end(key)
+        return self._rng.choice(variants)[0]
+
+    def _store_variant(self, key: str, text: str) -> None:
+        expires_at = time.monotonic() + self.ttl * self._rng.uniform(1 - _VARIANT_TTL_JITTER, 1 + _VARIANT_TTL_JITTER)
+        variants = self._variants.setdefault(key, [])
+        variants.append((text, expires_at))
+        del variants[:-self.pool_size]
+        self._variants.move_to_end(key)
+        while len(self._variants) > self.max_keys:
+            self._variants.popitem(last=False)
+
+    def run(self, key: str, fn: Callable[[], Optional[str]]) -> Optional[str]:
+        """key が同じ呼び出しを集約して fn() の結果を返す（fn の例外は待っていた全員に送出）"""
+        with self._lock:
+            if self.pool_size > 0:
+                text = self._pick_variant(key)
+                if text is not None:
+                    self.stats["variant_hits"] += 1
+                    return text
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                # 空の応答は使い回さない
+                if flight.error is None and flight.result and self.pool_size > 0:
+                    self._store_variant(key, flight.result)
+            flight.done.set()
+        return flight.result
+
+    def peek(self, key: str) -> Optional[str]:
+        """期限内の結果があれば（揃っていなくても）1つ返す（制限超過時の代わりに使う）"""
+        with self._lock:
+            now = time.monotonic()
+            variants = [v for v in self._variants.get(key, ()) if v[1] > now]
+            if not variants:
+                return None
+            self.stats["variant_hits"] += 1
+            return self._rng.choice(variants)[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._variants.clear()
+
+
+_coalescer: Optional[CompletionCoalescer] = None
+
+
+def get_completion_coalescer() -> Optional[CompletionCoalescer]:
+    """
+    プロセス内の集約器（LLM_COALESCE=0 のときはNone）
+    既定では実行中の同一リクエストへの相乗りだけ。生成結果の使い回しは LLM_VARIANT_POOL_SIZE を設定したときだけ
+    """
+    global _coalescer
+    if os.getenv("LLM_COALESCE", "1") == "0":
+        return None
+    if _coalescer is None:
+        with _client_lock:
+            if _coalescer is None:
+                _coalescer = CompletionCoalescer(
+                    pool_size=int(os.getenv("LLM_VARIANT_POOL_SIZE", "0")),
+                    ttl=float(os.getenv("LLM_VARIANT_TTL", "900")),
+                )
+    return _coalescer
+
+
+def reset_completion_coalescer() -> None:
+    """設定を変えたときに集約器を作り直す（ベンチマーク用）"""
+    global _coalescer
+    with _client_lock:
+        _coalescer = None
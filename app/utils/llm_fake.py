@@ -0,0 +1,384 @@
+# app/utils/llm_fake.py
+"""
+ローカル計測用のLLMスタンドイン
+ネットワークなしで、レイテンシ分布・エラー率を再現しつつ
+キャラクターごとの定型JSONを返す決定的なfake
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+# =========================
+# キャラクター別の定型レスポンス
+# =========================
+
+CANNED_RHYTHM: Dict[str, dict] = {
+    "フォーカス・バリスタ": {
+        "title": "☕ シャキッと整え",
+        "one_liner": "背筋から集中モードへ",
+        "steps": ["背筋を伸ばして座る", "3秒吸って肩を上げる", "ストンと落として吐く"],
+        "cat_ritual": "コーヒーの香りのそばで、猫様と並んで背伸びするニャ",
+        "one_liner_after": "集中スイッチON",
+    },
+    "サーモ・コンダクター": {
+        "title": "🌡️ ぬくもり呼吸",
+        "one_liner": "温度を感じてひと休み",
+        "steps": ["両手をこすり合わせる", "温かい手を目に当てる", "ゆっくり5回呼吸"],
+        "cat_ritual": "日なたの温度を猫様と一緒に手のひらで感じるニャ",
+        "one_liner_after": "ぽかぽか回復",
+    },
+    "アロマ・キッチェリアン": {
+        "title": "🌿 香りの深呼吸",
+        "one_liner": "香りで心をほどこう",
+        "steps": ["好きな香りを思い出す", "4秒かけて鼻から吸う", "6秒かけて口から吐く"],
+        "cat_ritual": "猫様の毛並みの香りをそっと感じて、一緒に目を細めるニャ",
+        "one_liner_after": "ふんわり軽く",
+    },
+    "サウンド・クッカー": {
+        "title": "🎵 リズム呼吸",
+        "one_liner": "リズムに乗ってリセット",
+        "steps": ["指で机を4回たたく", "リズムに合わせて吸う", "同じリズムで吐く"],
+        "cat_ritual": "猫様のゴロゴロ音に合わせて、小さく手拍子するニャ",
+        "one_liner_after": "いいリズムだニャ",
+    },
+    "テクスチャー・アーキ": {
+        "title": "✋ 手のひらリセット",
+        "one_liner": "触れて今に戻ろう",
+        "steps": ["手のひらを重ねる", "指先を順に押す", "ふっと力を抜く"],
+        "cat_ritual": "猫様の肉球の感触を思い浮かべて、そっと手を握るニャ",
+        "one_liner_after": "今ここに戻った",
+    },
+    "フレーバー・アルケミスト": {
+        "title": "⚗️ 味わい瞑想",
+        "one_liner": "一口で気分を調合",
+        "steps": ["水をひと口ふくむ", "温度と味を感じる", "ゆっくり飲み込む"],
+        "cat_ritual": "猫様と一緒に、お水の味の違いを確かめる儀式ニャ",
+        "one_liner_after": "調合成功ニャ",
+    },
+    "ノスタル・キッチン": {
+        "title": "🍡 なつかし呼吸",
+        "one_liner": "昔の景色を思い出そう",
+        "steps": ["子供の頃を思い出す", "ゆっくり鼻から吸う", "ほーっと長く吐く"],
+        "cat_ritual": "縁側の猫様を思い浮かべて、並んでのんびりするニャ",
+        "one_liner_after": "ほっこりしたね",
+    },
+    "キャトラリー・バトラー": {
+        "title": "🎩 姿勢を正す儀",
+        "one_liner": "整えば心も整います",
+        "steps": ["足裏を床につける", "顎を軽く引く", "静かに3回呼吸"],
+        "cat_ritual": "猫様のように、すっと座って前足をそろえる儀式ニャ",
+        "one_liner_after": "お見事でございます",
+    },
+    "スリーピー・シェフ": {
+        "title": "💤 ゆるゆる呼吸",
+        "one_liner": "ちょっと力を抜こう",
+        "steps": ["目を閉じて肩を落とす", "4秒吸って7秒止める", "8秒かけて吐く"],
+        "cat_ritual": "丸くなった猫様の寝息に合わせて、ゆっくり呼吸するニャ",
+        "one_liner_after": "ふぁぁ、いい感じ",
+    },
+}
+
+CANNED_MEAL: Dict[str, dict] = {
+    "フォーカス・バリスタ": {
+        "empathy": "集中したい気持ち、応援するニャ",
+        "human": {
+            "menu": "ナッツのせコーヒーヨーグルト",
+            "ingredients": ["ヨーグルト 100g", "インスタントコーヒー 少々", "ミックスナッツ ひとつかみ"],
+            "steps": ["ヨーグルトを器に入れる", "コーヒーを振りかける", "ナッツをのせて完成"],
+        },
+        "cat_ritual": "香ばしい香りを猫様と一緒にくんくんするニャ",
+        "one_liner": "ナッツの音で目が覚めるニャ",
+    },
+    "サーモ・コンダクター": {
+        "empathy": "体をあたためて、ひと息つこうニャ",
+        "human": {
+            "menu": "レンジでしょうがスープ",
+            "ingredients": ["コンソメ 小さじ1", "お湯 150ml", "おろし生姜 少々"],
+            "steps": ["カップにコンソメを入れる", "お湯を注いで混ぜる", "生姜を加えて完成"],
+        },
+        "cat_ritual": "湯気の温度を猫様と手のひらで感じるニャ",
+        "one_liner": "湯気は冬の味方ニャ",
+    },
+    "アロマ・キッチェリアン": {
+        "empathy": "香りで、そっと心をほどこうニャ",
+        "human": {
+            "menu": "はちみつレモンミント水",
+            "ingredients": ["水 200ml", "レモン汁 小さじ1", "はちみつ 小さじ1", "ミント 少々"],
+            "steps": ["グラスに水を注ぐ", "レモンとはちみつを混ぜる", "ミントを浮かべて完成"],
+        },
+        "cat_ritual": "レモンの香りを猫様から少し離れて楽しむニャ",
+        "one_liner": "香りで癒されるニャ",
+    },
+    "サウンド・クッカー": {
+        "empathy": "いい音で気分を変えようニャ",
+        "human": {
+            "menu": "パリパリ海苔チーズ",
+            "ingredients": ["焼き海苔 1枚", "スライスチーズ 1枚", "ごま 少々"],
+            "steps": ["海苔にチーズをのせる", "ごまを振る", "レンジで30秒加熱"],
+        },
+        "cat_ritual": "パリパリの音を猫様と一緒に聴くニャ",
+        "one_liner": "いい音は元気の素ニャ",
+    },
+    "テクスチャー・アーキ": {
+        "empathy": "食感で、今この瞬間に戻ろうニャ",
+        "human": {
+            "menu": "バナナのグラノーラのせ",
+            "ingredients": ["バナナ 1本", "グラノーラ 大さじ2", "ヨーグルト 大さじ2"],
+            "steps": ["バナナを輪切りにする", "ヨーグルトをかける", "グラノーラをのせる"],
+        },
+        "cat_ritual": "もちもちとカリカリを、猫様の毛並みと比べてみるニャ",
+        "one_liner": "食感のコントラストだニャ",
+    },
+    "フレーバー・アルケミスト": {
+        "empathy": "意外な組み合わせで気分を変えようニャ",
+        "human": {
+            "menu": "塩バタートースト＆はちみつ",
+            "ingredients": ["食パン 1枚", "バター 少々", "塩 ひとつまみ", "はちみつ 少々"],
+            "steps": ["パンをトーストする", "バターと塩をのせる", "はちみつをかけて完成"],
+        },
+        "cat_ritual": "甘じょっぱい香りの実験を、猫様に見守ってもらうニャ",
+        "one_liner": "風味の魔法、成功ニャ",
+    },
+    "ノスタル・キッチン": {
+        "empathy": "懐かしい味で、ほっとしようニャ",
+        "human": {
+            "menu": "きなこミルク",
+            "ingredients": ["牛乳 150ml", "きなこ 大さじ1", "砂糖 小さじ1"],
+            "steps": ["牛乳を温める", "きなこと砂糖を入れる", "よく混ぜて完成"],
+        },
+        "cat_ritual": "昔話をするように、猫様にそっと話しかけるニャ",
+        "one_liner": "昔の味は心の薬ニャ",
+    },
+    "キャトラリー・バトラー": {
+        "empathy": "お疲れさまでございます、お任せくださいニャ",
+        "human": {
+            "menu": "クラッカーのクリームチーズ添え",
+            "ingredients": ["クラッカー 3枚", "クリームチーズ 大さじ1", "黒こしょう 少々"],
+            "steps": ["クラッカーを並べる", "クリームチーズをのせる", "こしょうを振って完成"],
+        },
+        "cat_ritual": "お皿をきれいに並べて、猫様に一礼するニャ",
+        "one_liner": "お皿は完璧に洗うニャ",
+    },
+    "スリーピー・シェフ": {
+        "empathy": "ちょっと休もう、がんばりすぎニャ",
+        "human": {
+            "menu": "はちみつホットミルク",
+            "ingredients": ["牛乳 150ml", "はちみつ 小さじ1", "シナモン 少々"],
+            "steps": ["牛乳をレンジで1分温める", "はちみつを混ぜる", "シナモンを振って完成"],
+        },
+        "cat_ritual": "温かいマグを持って、猫様の隣でまったりするニャ",
+        "one_liner": "二度寝も仕事ニャ",
+    },
+}
+
+CANNED_FEEDBACK = """最近のあなたは、いろいろな気分と上手に付き合えているニャ。
+
+#### 🏃‍♀️ 身体状態の分析
+- 朝の時間帯に眠気を感じやすい傾向があります
+
+#### 💖 感情傾向の分析
+- 気分の記録を続けられていること自体が前向きなサインです
+
+#### 🌈 改善のためのアドバイス
+1. 朝イチに短いストレッチを取り入れてみましょう
+2. 午後は5分だけ休憩の時間をつくりましょう
+
+この調子で続けてほしいニャ！"""
+
+DEFAULT_CHARACTER = "フレーバー・アルケミスト"
+
+_CHARACTER_RE = re.compile(r"「(.+?)」という猫様")
+
+# =========================
+# レイテンシ・エラー設定
+# =========================
+
+
+class FakeLLMError(RuntimeError):
+    """fakeが注入するAPIエラー"""
+
+
+class PrefixCacheEmulator:
+    """
+    プロバイダ側のプロンプトキャッシュ（前方一致）の簡易再現
+    過去のプロンプトとの最長共通接頭辞が min_tokens 以上なら、
+    min_tokens + increment 刻みでキャッシュ済みトークンとして数える（OpenAIと同じ規則）
+    """
+
+    def __init__(self, min_tokens: int = 1024, increment: int = 128, capacity: int = 256):
+        self.min_tokens = min_tokens
+        self.increment = increment
+        self.capacity = capacity
+        self._prompts: List[str] = []
+        self._lock = threading.Lock()
+
+    def lookup(self, messages: List[dict]) -> int:
+        """キャッシュ済みトークン数を返し、今回のプロンプトを記録する"""
+        prompt = "".join(m.get("content") or "" for m in messages)
+        with self._lock:
+            longest = max((len(os.path.commonprefix([prompt, seen])) for seen in self._prompts), default=0)
+            if prompt in self._prompts:
+                self._prompts.remove(prompt)
+            self._prompts.append(prompt)
+            del self._prompts[:-self.capacity]
+        tokens = estimate_tokens(prompt[:longest])
+        if tokens < self.min_tokens:
+            return 0
+        return self.min_tokens + (tokens - self.min_tokens) // self.increment * self.increment
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class FakeLLM:
+    """
+    設定可能なレイテンシ分布とエラー率を持つ決定的なLLMスタンドイン
+
+    Args:
+        latency_ms: レイテンシの中央値（ミリ秒）
+        latency_dist: "fixed" / "uniform" / "normal" / "lognormal"
+        jitter: 分布の広がり（uniformは±割合、normalは標準偏差の割合、lognormalはsigma）
+        error_rate: 0〜1のエラー注入率
+        seed: 乱数シード（同じシードなら同じ遅延・エラー列になる）
+        cache_min_tokens: プロンプトキャッシュが効き始めるトークン数
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        latency_dist: str = "fixed",
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        cache_min_tokens: int = 1024,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prefix_cache = PrefixCacheEmulator(min_tokens=cache_min_tokens)
+
+    @classmethod
+    def from_env(cls) -> "FakeLLM":
+        """LLM_FAKE_* 環境変数から生成"""
+        seed = os.getenv("LLM_FAKE_SEED")
+        return cls(
+            latency_ms=_env_float("LLM_FAKE_LATENCY_MS", 0.0),
+            latency_dist=os.getenv("LLM_FAKE_LATENCY_DIST", "fixed"),
+            jitter=_env_float("LLM_FAKE_JITTER", 0.0),
+            error_rate=_env_float("LLM_FAKE_ERROR_RATE", 0.0),
+            seed=int(seed) if seed else None,
+            cache_min_tokens=int(_env_float("LLM_FAKE_CACHE_MIN_TOKENS", 1024)),
+        )
+
+    def _draw(self) -> tuple:
+        """(遅延秒, エラー有無) を乱数列から取り出す"""
+        with self._lock:
+            self.calls += 1
+            base = self.latency_ms
+            if self.latency_dist == "uniform":
+                delay = self._rng.uniform(base * (1 - self.jitter), base * (1 + self.jitter))
+            elif self.latency_dist == "normal":
+                delay = self._rng.gauss(base, base * self.jitter)
+            elif self.latency_dist == "lognormal":
+                delay = base * self._rng.lognormvariate(0.0, self.jitter)
+            else:
+                delay = base
+            failed = self._rng.random() < self.error_rate
+        return max(delay, 0.0) / 1000.0, failed
+
+    def complete(self, messages: List[dict]) -> str:
+        """メッセージから用途とキャラクターを判定し、定型の応答本文を返す"""
+        delay, failed = self._draw()
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise FakeLLMError("injected fake LLM error")
+        return render_canned_content(messages)
+
+
+def render_canned_content(messages: List[dict]) -> str:
+    """プロンプト内容から定型レスポンスを選ぶ"""
+    prompt = "\n".join(m.get("content") or "" for m in messages)
+    match = _CHARACTER_RE.search(prompt)
+    character = match.group(1) if match else DEFAULT_CHARACTER
+
+    if '"one_liner_after"' in prompt:
+        return json.dumps(CANNED_RHYTHM.get(character, CANNED_RHYTHM[DEFAULT_CHARACTER]), ensure_ascii=False)
+    if '"ingredients"' in prompt:
+        return json.dumps(CANNED_MEAL.get(character, CANNED_MEAL[DEFAULT_CHARACTER]), ensure_ascii=False)
+    return CANNED_FEEDBACK
+
+
+def estimate_tokens(text: str) -> int:
+    """日本語主体のテキストのおおまかなトークン数（1文字≒1トークン）"""
+    return len(text or "")
+
+
+def build_completion(content: str, messages: List[dict], model: str, cached_tokens: int = 0) -> dict:
+    """OpenAI Chat Completions 形式のレスポンス辞書を組み立てる"""
+    prompt_tokens = sum(estimate_tokens(m.get("content")) for m in messages)
+    completion_tokens = estimate_tokens(content)
+    return {
+        "id": f"chatcmpl-fake-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        },
+    }
+
+
+def _to_namespace(value):
+    """dictを属性アクセス可能なオブジェクトに変換（SDKのレスポンス型の代わり）"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+# =========================
+# OpenAIクライアント互換のインプロセスfake
+# =========================
+
+
+class _FakeCompletions:
+    def __init__(self, llm: FakeLLM):
+        self._llm = llm
+
+    def create(self, model: str, messages: List[dict], **kwargs):
+        content = self._llm.complete(messages)
+        cached_tokens = self._llm.prefix_cache.lookup(messages)
+        return _to_namespace(build_completion(content, messages, model, cached_tokens))
+
+
+class FakeOpenAI:
+    """`client.chat.completions.create(...)` だけを備えたOpenAI互換fake"""
+
+    def __init__(self, llm: Optional[FakeLLM] = None):
+        self.llm = llm or FakeLLM.from_env()
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self.llm))
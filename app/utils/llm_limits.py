@@ -0,0 +1,211 @@
+# app/utils/llm_limits.py
+"""
+LLM呼び出しのレート制限と1日のトークン予算（ユーザー単位・全体）
+2_suggest の再読み込みや 4_feedback の連打で有料の生成が積み上がらないようにする
+
+- レート: トークンバケット（1分あたりの回数 + バースト）
+- 予算  : JSTの日付ごとのトークン使用量（prompt + completion）
+- 状態はプロセス内のメモリだけに持つ（判定は辞書を引いて数値を比べるだけ）
+
+制限に当たった呼び出しは LLMLimitExceeded を送出し、呼び出し側は
+使い回しの生成結果（utils/llm.py の variant pool）かフォールバック（utils/fallbacks.py）に切り替える
+
+設定（0 でその制限を無効化）:
+    LLM_LIMITS=1                        # 0 で制限全体を無効化
+    LLM_USER_RATE_PER_MIN=6             # ユーザーごとの1分あたりの呼び出し回数
+    LLM_USER_BURST=4                    # ユーザーごとに連続して呼べる回数
+    LLM_GLOBAL_RATE_PER_MIN=600         # プロセス全体の1分あたりの呼び出し回数
+    LLM_GLOBAL_BURST=60
+    LLM_USER_DAILY_TOKENS=40000         # ユーザーごとの1日のトークン数
+    LLM_GLOBAL_DAILY_TOKENS=5000000     # プロセス全体の1日のトークン数
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+JST_OFFSET_SECONDS = 9 * 3600
+
+# 状態を持つユーザー数の上限（古いユーザーから捨てる）
+MAX_TRACKED_USERS = 10000
+
+# 拒否理由
+USER_RATE = "user_rate"
+GLOBAL_RATE = "global_rate"
+USER_BUDGET = "user_budget"
+GLOBAL_BUDGET = "global_budget"
+
+
+class LLMLimitExceeded(RuntimeError):
+    """レート制限または1日の予算を超えた"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM limit exceeded: {reason}")
+        self.reason = reason
+
+
+class TokenBucket:
+    """1秒あたり rate 個補充され、最大 capacity 個まで貯まるバケット"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if tokens < 1.0:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - 1.0
+        return True
+
+    def refund(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1.0)
+
+
+def _jst_day(epoch: float) -> int:
+    """JSTの日付を通し番号で返す（日付が変わったら予算をリセットする）"""
+    return int((epoch + JST_OFFSET_SECONDS) // 86400)
+
+
+class LLMLimiter:
+    """ユーザー単位・全体のレート制限と1日の予算"""
+
+    def __init__(
+        self,
+        user_rate_per_min: float = 6,
+        user_burst: int = 4,
+        global_rate_per_min: float = 600,
+        global_burst: int = 60,
+        user_daily_tokens: int = 40000,
+        global_daily_tokens: int = 5000000,
+        max_users: int = MAX_TRACKED_USERS,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self.user_rate = user_rate_per_min / 60.0
+        self.user_burst = user_burst
+        self.user_daily_tokens = user_daily_tokens
+        self.global_daily_tokens = global_daily_tokens
+        self.max_users = max_users
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._lock = threading.Lock()
+        self._global_bucket = TokenBucket(global_rate_per_min / 60.0, global_burst, clock()) if global_rate_per_min > 0 else None
+        self._user_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._day = _jst_day(wall_clock())
+        self._user_tokens: Dict[str, int] = {}
+        self._global_tokens = 0
+        self.denials: Dict[str, int] = {USER_RATE: 0, GLOBAL_RATE: 0, USER_BUDGET: 0, GLOBAL_BUDGET: 0}
+
+    def _roll_day(self) -> None:
+        """日付が変わっていれば予算をリセット（ロック内で呼ぶ）"""
+        day = _jst_day(self._wall_clock())
+        if day != self._day:
+            self._day = day
+            self._user_tokens.clear()
+            self._global_tokens = 0
+
+    def _user_bucket(self, user_id: str, now: float) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst, now)
+            if len(self._user_buckets) > self.max_users:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(user_id)
+        return bucket
+
+    def acquire(self, user_id: Optional[str] = None) -> Optional[str]:
+        """
+        1回分の呼び出しを許可するか判定する
+
+        Returns:
+            None なら許可、拒否のときは理由（USER_RATE など）
+        """
+        now = self._clock()
+        with self._lock:
+            self._roll_day()
+            reason = None
+            if self.global_daily_tokens and self._global_tokens >= self.global_daily_tokens:
+                reason = GLOBAL_BUDGET
+            elif user_id and self.user_daily_tokens and self._user_tokens.get(user_id, 0) >= self.user_daily_tokens:
+                reason = USER_BUDGET
+            else:
+                user_bucket = self._user_bucket(user_id, now) if user_id and self.user_rate > 0 else None
+                if user_bucket is not None and not user_bucket.take(now):
+                    reason = USER_RATE
+                elif self._global_bucket is not None and not self._global_bucket.take(now):
+                    # 全体で拒否したときはユーザーの分を返す
+                    if user_bucket is not None:
+                        user_bucket.refund()
+                    reason = GLOBAL_RATE
+            if reason is not None:
+                self.denials[reason] += 1
+            return reason
+
+    def charge(self, user_id: Optional[str], tokens: int) -> None:
+        """呼び出し後に実際のトークン使用量を予算に計上する"""
+        if tokens <= 0:
+            return
+        with self._lock:
+            self._roll_day()
+            self._global_tokens += tokens
+            if user_id:
+                self._user_tokens[user_id] = self._user_tokens.get(user_id, 0) + tokens
+
+    def usage(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        """今日のトークン使用量"""
+        with self._lock:
+            self._roll_day()
+            return {
+                "global_tokens": self._global_tokens,
+                "user_tokens": self._user_tokens.get(user_id, 0) if user_id else 0,
+            }
+
+
+# =========================
+# プロセス内シングルトン
+# =========================
+
+_limiter: Optional[LLMLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_llm_limiter() -> Optional[LLMLimiter]:
+    """プロセス内の制限器（LLM_LIMITS=0 のときはNone）"""
+    global _limiter
+    if os.getenv("LLM_LIMITS", "1") == "0":
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = LLMLimiter(
+                    user_rate_per_min=_env_number("LLM_USER_RATE_PER_MIN", 6),
+                    user_burst=int(_env_number("LLM_USER_BURST", 4)),
+                    global_rate_per_min=_env_number("LLM_GLOBAL_RATE_PER_MIN", 600),
+                    global_burst=int(_env_number("LLM_GLOBAL_BURST", 60)),
+                    user_daily_tokens=int(_env_number("LLM_USER_DAILY_TOKENS", 40000)),
+                    global_daily_tokens=int(_env_number("LLM_GLOBAL_DAILY_TOKENS", 5000000)),
+                )
+    return _limiter
+
+
+def reset_llm_limiter() -> None:
+    """設定を変えたときに制限器を作り直す（ベンチマーク用）"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
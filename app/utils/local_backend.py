@@ -0,0 +1,727 @@
+# app/utils/local_backend.py
+"""
+Supabaseのローカルスタンドイン（SQLiteバックエンド）
+services.py が使うクエリビルダーAPI（table().select().eq()...execute()）を
+同じ形で提供し、ネットワークなしでアプリとベンチマークを動かせるようにする
+アプリから呼ぶストアドファンクションは rpc() で同じ処理を実行する（LOCAL_FUNCTIONS）
+
+有効化:
+    SUPABASE_BACKEND=local
+    LOCAL_DB_PATH=:memory:   # 省略時はメモリ上（ファイルパスを指定すると永続化）
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils import jst_calendar
+
+# =========================
+# スキーマとマスタデータ
+# =========================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS onomatopoeia_master (
+    id INTEGER PRIMARY KEY,
+    onomatopoeia TEXT NOT NULL,
+    polarity TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS situation_master (
+    id INTEGER PRIMARY KEY,
+    situation TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS cat_master (
+    id INTEGER PRIMARY KEY,
+    cat_name TEXT NOT NULL,
+    personality_trait TEXT,
+    onomatopoeia_id INTEGER REFERENCES onomatopoeia_master(id)
+);
+
+CREATE TABLE IF NOT EXISTS feed_master (
+    id INTEGER PRIMARY KEY,
+    feed_name TEXT NOT NULL,
+    feed_point INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS mood_register_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    onomatopoeia_id INTEGER,
+    cat_id INTEGER,
+    after_mood_id INTEGER,
+    points_earned INTEGER NOT NULL DEFAULT 0,
+    situation_id INTEGER,
+    comment TEXT,
+    character_name TEXT,
+    rhythm_content TEXT,
+    meal_content TEXT,
+    client_event_id TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS weekly_points (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    week_start_date TEXT NOT NULL,
+    total_points INTEGER NOT NULL DEFAULT 0,
+    exchangeable_next_week INTEGER,
+    exchangeable INTEGER,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS feeding_event_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    feed_id INTEGER REFERENCES feed_master(id),
+    feed_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- supabase/migrations/20261019040000_points_ledger.sql
+CREATE TABLE IF NOT EXISTS points_ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    week_start_date TEXT NOT NULL,
+    delta INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS points_ledger_snapshot (
+    user_id TEXT NOT NULL,
+    week_start_date TEXT NOT NULL,
+    balance INTEGER NOT NULL DEFAULT 0,
+    last_entry_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    PRIMARY KEY (user_id, week_start_date)
+);
+
+-- supabase/migrations/20261019030000_character_effectiveness_rollup.sql
+CREATE TABLE IF NOT EXISTS character_effectiveness_rollup (
+    onomatopoeia_id INTEGER NOT NULL,
+    situation_id INTEGER NOT NULL DEFAULT 0,
+    character_name TEXT NOT NULL,
+    trials INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    PRIMARY KEY (onomatopoeia_id, situation_id, character_name)
+);
+
+-- supabase/migrations/20261019000000_hot_query_indexes.sql と同じインデックス
+CREATE INDEX IF NOT EXISTS mood_register_log_user_created_idx
+    ON mood_register_log (user_id, created_at DESC, id DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS weekly_points_user_week_key
+    ON weekly_points (user_id, week_start_date);
+CREATE INDEX IF NOT EXISTS feeding_event_log_user_feed_at_idx
+    ON feeding_event_log (user_id, feed_at DESC, feed_id);
+CREATE INDEX IF NOT EXISTS cat_master_onomatopoeia_idx
+    ON cat_master (onomatopoeia_id);
+-- supabase/migrations/20261019020000_mood_register_log_client_event_id.sql
+CREATE UNIQUE INDEX IF NOT EXISTS mood_register_log_client_event_key
+    ON mood_register_log (client_event_id, created_at);
+-- supabase/migrations/20261019040000_points_ledger.sql
+CREATE UNIQUE INDEX IF NOT EXISTS points_ledger_source_key
+    ON points_ledger (source, source_id);
+CREATE INDEX IF NOT EXISTS points_ledger_user_week_idx
+    ON points_ledger (user_id, week_start_date, id);
+"""
+
+# (id, オノマトペ, polarity)
+SEED_ONOMATOPOEIA = [
+    (1, "うとうと", "ネガティブ"),
+    (2, "ぐったり", "ネガティブ"),
+    (3, "びくびく", "ネガティブ"),
+    (4, "いらいら", "ネガティブ"),
+    (5, "ぼんやり", "ニュートラル"),
+    (6, "だらだら", "ニュートラル"),
+    (7, "そわそわ", "ニュートラル"),
+    (8, "まあまあ", "ニュートラル"),
+    (9, "しゃきっ", "ポジティブ"),
+    (10, "きびきび", "ポジティブ"),
+    (11, "のびのび", "ポジティブ"),
+    (12, "るんるん", "ポジティブ"),
+]
+
+SEED_SITUATIONS = [
+    (1, "会議前"),
+    (2, "締め切り直前"),
+    (3, "朝イチ"),
+    (4, "昼食後"),
+    (5, "午後"),
+    (6, "その他"),
+    (7, "夜"),
+    (8, "寝る前"),
+]
+
+# (id, 猫の名前, 性格, onomatopoeia_id)
+SEED_CATS = [
+    (1, "ねむねむにゃん", "いつも眠そう", 1),
+    (2, "ごろごろにゃん", "だらけ上手", 2),
+    (3, "びっくりにゃん", "怖がりだけど優しい", 3),
+    (4, "ぷんぷんにゃん", "怒りっぽいけど情に厚い", 4),
+    (5, "ぽわぽわにゃん", "マイペース", 5),
+    (6, "のんびりにゃん", "急がない", 6),
+    (7, "きょろきょろにゃん", "好奇心旺盛", 7),
+    (8, "だいじょうぶにゃん", "いつも落ち着いている", 8),
+    (9, "しゃんとにゃん", "きっちり者", 9),
+    (10, "てきぱきにゃん", "働き者", 10),
+    (11, "ひなたにゃん", "おおらか", 11),
+    (12, "ごきげんにゃん", "陽気", 12),
+]
+
+SEED_FEEDS = [
+    (1, "カリカリ", 0),
+    (2, "ちゅ〜る", 30),
+    (3, "サーモン", 60),
+    (4, "高級マグロ", 100),
+]
+
+# dictをJSON文字列として保存する列
+JSON_COLUMNS = {"rhythm_content", "meal_content"}
+
+# 埋め込みリソース（例: situation_master(situation)）の外部キー
+EMBED_FOREIGN_KEYS = {
+    "situation_master": "situation_id",
+    "onomatopoeia_master": "onomatopoeia_id",
+    "cat_master": "cat_id",
+    "feed_master": "feed_id",
+}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_EMBED = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)\((.*)\)$")
+_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class LocalBackendError(Exception):
+    """スタンドインのクエリエラー（PostgRESTのAPIErrorに相当）"""
+
+
+def _ident(name: str) -> str:
+    name = name.strip()
+    if not _IDENTIFIER.match(name):
+        raise LocalBackendError(f"invalid identifier: {name!r}")
+    return name
+
+
+def _split_columns(columns: str) -> List[str]:
+    """括弧の中のカンマを無視して select 句を分割"""
+    parts, depth, current = [], 0, ""
+    for ch in columns:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += ch
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _parse_logic(expr: str) -> Tuple[List[str], List[Any]]:
+    """
+    PostgRESTの論理式（or_ の引数）をSQLに変換
+    例: 'created_at.lt."2026-01-01T00:00:00+00:00",and(created_at.eq."...",id.lt.10)'
+    """
+    clauses, params = [], []
+    for part in _split_columns(expr):
+        m = re.match(r"^(and|or)\((.*)\)$", part)
+        if m:
+            inner, inner_params = _parse_logic(m.group(2))
+            joiner = " AND " if m.group(1) == "and" else " OR "
+            clauses.append("(" + joiner.join(inner) + ")")
+            params.extend(inner_params)
+            continue
+        column, op, value = part.split(".", 2)
+        if op not in _OPERATORS:
+            raise LocalBackendError(f"unsupported operator in logic tree: {op}")
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        clauses.append(f"{_ident(column)} {_OPERATORS[op]} ?")
+        params.append(value)
+    return clauses, params
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _decode_row(row: sqlite3.Row) -> Dict[str, Any]:
+    data = dict(row)
+    for col in JSON_COLUMNS.intersection(data):
+        if isinstance(data[col], str):
+            data[col] = json.loads(data[col])
+    return data
+
+
+# =========================
+# クエリビルダー
+# =========================
+
+class LocalQuery:
+    """supabase-py の QueryRequestBuilder と同じ呼び出し方をするクエリ"""
+
+    def __init__(self, backend: "LocalSupabaseClient", table: str):
+        self._backend = backend
+        self._table = _ident(table)
+        self._action = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._ignore_duplicates = False
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+
+    # --- アクション ---
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "LocalQuery":
+        self._action = "select"
+        self._columns = columns
+        self._count = count
+        return self
+
+    def insert(self, rows) -> "LocalQuery":
+        self._action = "insert"
+        self._payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, ignore_duplicates: bool = False) -> "LocalQuery":
+        self._action = "upsert"
+        self._payload = rows
+        self._on_conflict = on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "LocalQuery":
+        self._action = "update"
+        self._payload = values
+        return self
+
+    def delete(self) -> "LocalQuery":
+        self._action = "delete"
+        return self
+
+    # --- フィルタ ---
+    def _filter(self, column: str, op: str, value: Any) -> "LocalQuery":
+        self._filters.append((_ident(column), op, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "=", value)
+
+    def neq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "!=", value)
+
+    def gt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, ">", value)
+
+    def gte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, ">=", value)
+
+    def lt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "<", value)
+
+    def lte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "<=", value)
+
+    def in_(self, column: str, values: List[Any]) -> "LocalQuery":
+        return self._filter(column, "IN", list(values))
+
+    def or_(self, filters: str) -> "LocalQuery":
+        self._filters.append(("", "OR", filters))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "LocalQuery":
+        self._order.append((_ident(column), desc))
+        return self
+
+    def limit(self, size: int) -> "LocalQuery":
+        self._limit = int(size)
+        return self
+
+    # --- SQL組み立て ---
+    def _where(self) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for column, op, value in self._filters:
+            if op == "OR":
+                inner, inner_params = _parse_logic(value)
+                clauses.append("(" + " OR ".join(inner) + ")")
+                params.extend(inner_params)
+            elif op == "IN":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{column} IN ({', '.join('?' for _ in value)})")
+                params.extend(_encode(v) for v in value)
+            else:
+                clauses.append(f"{column} {op} ?")
+                params.append(_encode(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select_sql(self) -> Tuple[str, List[Any], List[Tuple[str, List[str]]], List[str]]:
+        plain, embeds = [], []
+        for col in _split_columns(self._columns):
+            m = _EMBED.match(col)
+            if m:
+                embeds.append((m.group(1), [c.strip() for c in _split_columns(m.group(2))]))
+            elif col == "*":
+                plain.append("*")
+            else:
+                plain.append(_ident(col))
+
+        # 埋め込み解決のために外部キーが必要なら一時的に取得する
+        hidden = []
+        if "*" not in plain:
+            for name, _ in embeds:
+                fk = EMBED_FOREIGN_KEYS.get(name)
+                if fk is None:
+                    raise LocalBackendError(f"unknown embedded resource: {name}")
+                if fk not in plain:
+                    plain.append(fk)
+                    hidden.append(fk)
+
+        where, params = self._where()
+        sql = f"SELECT {', '.join(plain) or '*'} FROM {self._table}{where}"
+        if self._order:
+            sql += " ORDER BY " + ", ".join(f"{c} {'DESC' if d else 'ASC'}" for c, d in self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+        return sql, params, embeds, hidden
+
+    def execute(self) -> SimpleNamespace:
+        return self._backend._execute(self)
+
+
+# =========================
+# 認証のスタンドイン
+# =========================
+
+class LocalAuth:
+    """auth.* の最低限のスタンドイン（メールアドレスから決定的にユーザーIDを作る）"""
+
+    def __init__(self):
+        self.session = None
+
+    def _session_for(self, email: str) -> SimpleNamespace:
+        user = SimpleNamespace(id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"growbit-local:{email}")), email=email)
+        session = SimpleNamespace(access_token=f"local-access-{user.id}", refresh_token=f"local-refresh-{user.id}")
+        return SimpleNamespace(user=user, session=session)
+
+    def sign_up(self, credentials: Dict[str, str]) -> SimpleNamespace:
+        return self._session_for(credentials["email"])
+
+    def sign_in_with_password(self, credentials: Dict[str, str]) -> SimpleNamespace:
+        response = self._session_for(credentials["email"])
+        self.session = response.session
+        return response
+
+    def set_session(self, access_token: str, refresh_token: str) -> None:
+        self.session = SimpleNamespace(access_token=access_token, refresh_token=refresh_token)
+
+    def sign_out(self) -> None:
+        self.session = None
+
+    def uid(self) -> Optional[str]:
+        """auth.uid() 相当（ログイン中のユーザーID。トークンは local-access-<ユーザーID>）"""
+        token = getattr(self.session, "access_token", "") or ""
+        return token[len("local-access-"):] if token.startswith("local-access-") else None
+
+
+# =========================
+# ストアドファンクションのスタンドイン（rpc）
+# =========================
+# supabase/migrations の security definer 関数と同じ処理。呼び出し元のユーザーは auth.uid() で決まる
+
+def _require_uid(backend: "LocalSupabaseClient") -> str:
+    uid = backend.auth.uid()
+    if uid is None:
+        raise LocalBackendError("not_authenticated")
+    return uid
+
+
+def _fn_advance_points_snapshot(backend: "LocalSupabaseClient", params: Dict[str, Any]) -> int:
+    """20261019040000_points_ledger.sql の advance_points_snapshot()"""
+    uid = _require_uid(backend)
+    week = params["p_week_start"]
+    conn = backend.connection
+    snapshot = conn.execute(
+        "SELECT balance, last_entry_id FROM points_ledger_snapshot WHERE user_id = ? AND week_start_date = ?", (uid, week)
+    ).fetchone()
+    base, last_id = (snapshot["balance"], snapshot["last_entry_id"]) if snapshot else (0, 0)
+    cutoff = conn.execute(
+        "SELECT MIN(id) FROM points_ledger WHERE user_id = ? AND week_start_date = ? AND id > ? "
+        "AND created_at >= strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now', '-60 seconds')",
+        (uid, week, last_id),
+    ).fetchone()[0]
+    added, new_last_id = conn.execute(
+        "SELECT SUM(delta), MAX(id) FROM points_ledger WHERE user_id = ? AND week_start_date = ? AND id > ? AND id < ?",
+        (uid, week, last_id, cutoff if cutoff is not None else 2 ** 63 - 1),
+    ).fetchone()
+    if new_last_id is None:
+        return base
+    conn.execute(
+        "INSERT INTO points_ledger_snapshot (user_id, week_start_date, balance, last_entry_id, updated_at) "
+        "VALUES (?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')) "
+        "ON CONFLICT (user_id, week_start_date) DO UPDATE SET balance = excluded.balance, "
+        "last_entry_id = excluded.last_entry_id, updated_at = excluded.updated_at "
+        "WHERE points_ledger_snapshot.last_entry_id = ?",
+        (uid, week, base + added, new_last_id, last_id),
+    )
+    return base + added
+
+
+def _fn_feed_weekly_event(backend: "LocalSupabaseClient", params: Dict[str, Any]) -> int:
+    """20261019040000_points_ledger.sql の feed_weekly_event()（ロックは backend の1本のロックで代用）"""
+    uid = _require_uid(backend)
+    feed_id = params["p_feed_id"]
+    request_id = params.get("p_request_id")
+    if not request_id:
+        raise LocalBackendError("missing_request_id")
+    conn = backend.connection
+    feed = conn.execute("SELECT feed_point FROM feed_master WHERE id = ?", (feed_id,)).fetchone()
+    if feed is None:
+        raise LocalBackendError(f"unknown_feed: {feed_id}")
+    cost = feed["feed_point"]
+    spend_week = jst_calendar.current_week(-1).start_date.isoformat()
+
+    snapshot = conn.execute(
+        "SELECT balance, last_entry_id FROM points_ledger_snapshot WHERE user_id = ? AND week_start_date = ?", (uid, spend_week)
+    ).fetchone()
+    base, last_id = (snapshot["balance"], snapshot["last_entry_id"]) if snapshot else (0, 0)
+    tail = conn.execute(
+        "SELECT COALESCE(SUM(delta), 0) FROM points_ledger WHERE user_id = ? AND week_start_date = ? AND id > ?",
+        (uid, spend_week, last_id),
+    ).fetchone()[0]
+    balance = base + tail
+
+    spend_key = f"weekly_feed:{uid}:{uuid.UUID(str(request_id))}"
+    if conn.execute("SELECT 1 FROM points_ledger WHERE source = 'feed' AND source_id = ?", (spend_key,)).fetchone():
+        return balance
+    if balance < cost:
+        raise LocalBackendError(f"insufficient_points: balance {balance}, required {cost}")
+
+    conn.execute(
+        "INSERT INTO points_ledger (user_id, week_start_date, delta, source, source_id) VALUES (?, ?, ?, 'feed', ?)",
+        (uid, spend_week, -cost, spend_key),
+    )
+    conn.execute(
+        "INSERT INTO feeding_event_log (user_id, feed_id, feed_at) VALUES (?, ?, strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))",
+        (uid, feed_id),
+    )
+    return balance - cost
+
+
+LOCAL_FUNCTIONS: Dict[str, Callable[["LocalSupabaseClient", Dict[str, Any]], Any]] = {
+    "advance_points_snapshot": _fn_advance_points_snapshot,
+    "feed_weekly_event": _fn_feed_weekly_event,
+}
+
+
+class LocalRpc:
+    """rpc() の戻り値（execute() で実行する）"""
+
+    def __init__(self, backend: "LocalSupabaseClient", name: str, params: Dict[str, Any]):
+        self._backend = backend
+        self._name = name
+        self._params = params
+
+    def execute(self) -> SimpleNamespace:
+        return self._backend._call(self._name, self._params)
+
+
+# =========================
+# クライアント
+# =========================
+
+class LocalSupabaseClient:
+    """
+    SQLiteで動くSupabaseクライアント互換オブジェクト
+
+    Attributes:
+        round_trips: execute() が呼ばれた回数（DB往復回数の計測用）
+    """
+
+    def __init__(self, db_path: str = ":memory:", seed: bool = True):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self.auth = LocalAuth()
+        self.round_trips = 0
+        # 発行した読み取りSQLを受け取るフック（tools/check_query_plans.py が実行計画の確認に使う）
+        self.query_hook: Optional[Callable[[str, List[Any]], None]] = None
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            if seed:
+                self._seed_masters()
+
+    def _seed_masters(self) -> None:
+        cur = self._conn.cursor()
+        cur.executemany("INSERT OR IGNORE INTO onomatopoeia_master (id, onomatopoeia, polarity) VALUES (?, ?, ?)", SEED_ONOMATOPOEIA)
+        cur.executemany("INSERT OR IGNORE INTO situation_master (id, situation) VALUES (?, ?)", SEED_SITUATIONS)
+        cur.executemany("INSERT OR IGNORE INTO cat_master (id, cat_name, personality_trait, onomatopoeia_id) VALUES (?, ?, ?, ?)", SEED_CATS)
+        cur.executemany("INSERT OR IGNORE INTO feed_master (id, feed_name, feed_point) VALUES (?, ?, ?)", SEED_FEEDS)
+        self._conn.commit()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """ジョブやベンチマークから直接SQLを流すための接続"""
+        return self._conn
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def from_(self, name: str) -> LocalQuery:
+        return self.table(name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> LocalRpc:
+        if name not in LOCAL_FUNCTIONS:
+            raise LocalBackendError(f"unsupported function: {name}")
+        return LocalRpc(self, name, params or {})
+
+    # --- 実行 ---
+    def _execute(self, query: LocalQuery) -> SimpleNamespace:
+        with self._lock:
+            self.round_trips += 1
+            try:
+                if query._action == "select":
+                    return self._run_select(query)
+                if query._action in ("insert", "upsert"):
+                    return self._run_insert(query)
+                if query._action == "update":
+                    return self._run_update(query)
+                if query._action == "delete":
+                    return self._run_delete(query)
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                raise LocalBackendError(str(e)) from e
+        raise LocalBackendError(f"unsupported action: {query._action}")
+
+    def _call(self, name: str, params: Dict[str, Any]) -> SimpleNamespace:
+        """関数1回 = 1トランザクション（失敗したら書き込みを取り消す）"""
+        with self._lock:
+            self.round_trips += 1
+            try:
+                data = LOCAL_FUNCTIONS[name](self, params)
+                self._conn.commit()
+                return SimpleNamespace(data=data, count=None)
+            except LocalBackendError:
+                self._conn.rollback()
+                raise
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                raise LocalBackendError(str(e)) from e
+
+    def _observe(self, sql: str, params: List[Any]) -> None:
+        if self.query_hook is not None:
+            self.query_hook(sql, params)
+
+    def _run_select(self, query: LocalQuery) -> SimpleNamespace:
+        sql, params, embeds, hidden = query._select_sql()
+        self._observe(sql, params)
+        rows = [_decode_row(r) for r in self._conn.execute(sql, params).fetchall()]
+
+        for name, columns in embeds:
+            fk = EMBED_FOREIGN_KEYS[name]
+            ids = sorted({r[fk] for r in rows if r.get(fk) is not None})
+            lookup = {}
+            if ids:
+                cols = ", ".join(["id"] + [_ident(c) for c in columns if c != "id"])
+                placeholders = ", ".join("?" for _ in ids)
+                for m in self._conn.execute(f"SELECT {cols} FROM {_ident(name)} WHERE id IN ({placeholders})", ids):
+                    lookup[m["id"]] = {c: m[c] for c in columns}
+            for r in rows:
+                r[name] = lookup.get(r.get(fk))
+
+        for r in rows:
+            for col in hidden:
+                r.pop(col, None)
+
+        count = None
+        if query._count:
+            where, wparams = query._where()
+            self._observe(f"SELECT COUNT(*) FROM {query._table}{where}", wparams)
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {query._table}{where}", wparams).fetchone()[0]
+        return SimpleNamespace(data=rows, count=count)
+
+    def _run_insert(self, query: LocalQuery) -> SimpleNamespace:
+        rows = query._payload if isinstance(query._payload, list) else [query._payload]
+        inserted = []
+        for row in rows:
+            columns = [_ident(c) for c in row]
+            values = [_encode(row[c]) for c in row]
+            verb = "INSERT OR REPLACE" if query._action == "upsert" and not query._on_conflict else "INSERT"
+            sql = f"{verb} INTO {query._table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+            if query._action == "upsert" and query._on_conflict:
+                conflict = [_ident(c) for c in query._on_conflict.split(",")]
+                updates = [] if query._ignore_duplicates else [c for c in columns if c not in conflict]
+                sql += f" ON CONFLICT ({', '.join(conflict)}) DO "
+                sql += ("UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)) if updates else "NOTHING"
+            cur = self._conn.execute(sql, values)
+            if cur.rowcount == 0:
+                continue
+            fetched = self._conn.execute(f"SELECT * FROM {query._table} WHERE rowid = ?", (cur.lastrowid,)).fetchone()
+            if fetched is not None:
+                inserted.append(_decode_row(fetched))
+        self._conn.commit()
+        return SimpleNamespace(data=inserted, count=None)
+
+    def _run_update(self, query: LocalQuery) -> SimpleNamespace:
+        values = query._payload
+        where, params = query._where()
+        sets = ", ".join(f"{_ident(c)} = ?" for c in values)
+        self._observe(f"SELECT * FROM {query._table}{where}", params)
+        self._conn.execute(f"UPDATE {query._table} SET {sets}{where}", [_encode(v) for v in values.values()] + params)
+        self._conn.commit()
+        rows = [_decode_row(r) for r in self._conn.execute(f"SELECT * FROM {query._table}{where}", params).fetchall()]
+        return SimpleNamespace(data=rows, count=None)
+
+    def _run_delete(self, query: LocalQuery) -> SimpleNamespace:
+        where, params = query._where()
+        self._observe(f"SELECT * FROM {query._table}{where}", params)
+        rows = [_decode_row(r) for r in self._conn.execute(f"SELECT * FROM {query._table}{where}", params).fetchall()]
+        self._conn.execute(f"DELETE FROM {query._table}{where}", params)
+        self._conn.commit()
+        return SimpleNamespace(data=rows, count=None)
+
+
+# =========================
+# プロセス内シングルトン
+# =========================
+
+_clients: Dict[str, LocalSupabaseClient] = {}
+_clients_lock = threading.Lock()
+
+
+def is_local_backend() -> bool:
+    """SUPABASE_BACKEND=local が設定されているか"""
+    return (os.getenv("SUPABASE_BACKEND") or "").lower() == "local"
+
+
+def get_local_client(db_path: Optional[str] = None) -> LocalSupabaseClient:
+    """DBパスごとに1つのローカルクライアントを共有して返す"""
+    path = db_path or os.getenv("LOCAL_DB_PATH") or ":memory:"
+    with _clients_lock:
+        if path not in _clients:
+            _clients[path] = LocalSupabaseClient(path)
+        return _clients[path]
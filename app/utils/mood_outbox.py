@@ -0,0 +1,332 @@
+# app/utils/mood_outbox.py
+"""
+気分登録の書き込みキュー（write-behind）
+登録はローカルのSQLiteジャーナルに書くだけで即座に返し、
+バックグラウンドのワーカーがまとめてSupabaseへ送る
+
+- 各イベントには client_event_id（冪等キー）と created_at を登録時に付ける
+  → 再送しても mood_register_log には1行しか入らない
+- 送信失敗は指数バックオフで再試行し、成功するまでジャーナルから消さない
+  → Supabaseが落ちていても記録は失われない（プロセスを再起動しても残る）
+- ワーカーはユーザーのセッションではなく自分の接続（service_role）で送る
+  → ユーザーがログアウトしても、トークンが切れても送信は続く
+- MOOD_OUTBOX_MAX_ATTEMPTS 回続けて失敗したイベントは再試行をやめて「停止中」にする
+  → tools/mood_outbox_status.py で一覧を出し、原因を直してから --requeue で戻す
+
+設定:
+    MOOD_WRITE_BEHIND=0          # 0 で無効化（従来どおり同期で登録）
+    MOOD_OUTBOX_PATH=...         # ジャーナルの保存先（省略時はリポジトリ直下）
+    MOOD_OUTBOX_BATCH_SIZE=50
+    MOOD_OUTBOX_INTERVAL=1.0     # 送信待ちを確認する間隔（秒）
+    MOOD_OUTBOX_MAX_ATTEMPTS=10  # これだけ続けて失敗したら停止中にする
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_OUTBOX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    ".growbit_outbox.sqlite3",
+)
+
+# 送信段階
+STAGE_PENDING = "pending"  # mood_register_log への挿入待ち
+STAGE_LOGGED = "logged"    # 挿入済み、ポイント台帳への追記待ち
+
+# 再試行の間隔（秒）。attempts 回目の失敗後は min(BASE * 2^attempts, MAX) ± ジッター
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 300.0
+
+# 既定では、10回（間隔1〜256秒の倍々、ジッター込みでおよそ5〜8分）続けて失敗したら停止中にする
+DEFAULT_MAX_ATTEMPTS = 10
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mood_outbox (
+    event_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    points INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    stage TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    stuck_at REAL
+);
+CREATE INDEX IF NOT EXISTS mood_outbox_due_idx ON mood_outbox (next_attempt_at, user_id);
+CREATE INDEX IF NOT EXISTS mood_outbox_user_idx ON mood_outbox (user_id, stage, created_at);
+"""
+
+
+def is_write_behind_enabled() -> bool:
+    return os.getenv("MOOD_WRITE_BEHIND", "1") != "0"
+
+
+def retry_delay(attempts: int) -> float:
+    """attempts回失敗した後の待ち時間（秒）"""
+    delay = min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+# =========================
+# ジャーナル
+# =========================
+
+class MoodOutbox:
+    """送信待ちの気分イベントを保持するSQLiteジャーナル"""
+
+    def __init__(self, path: str = DEFAULT_OUTBOX_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                # 書き込みは1行のINSERTだけなので、WALで読み取りとぶつからないようにする
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(OUTBOX_SCHEMA)
+            # stuck_at がなかった頃のジャーナルには列を足す
+            columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(mood_outbox)")}
+            if "stuck_at" not in columns:
+                self._conn.execute("ALTER TABLE mood_outbox ADD COLUMN stuck_at REAL")
+
+    def enqueue(self, row: Dict[str, Any]) -> str:
+        """mood_register_log の1行分を追加（client_event_id と created_at を含むこと）"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO mood_outbox (event_id, user_id, payload, points, created_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    row["client_event_id"],
+                    row["user_id"],
+                    json.dumps(row, ensure_ascii=False),
+                    int(row.get("points_earned") or 0),
+                    row["created_at"],
+                ),
+            )
+        return row["client_event_id"]
+
+    def due(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """送信時刻を過ぎたイベント（全ユーザー、古い順。停止中は除く）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT event_id, user_id, payload, stage, attempts FROM mood_outbox "
+                "WHERE next_attempt_at <= ? AND stuck_at IS NULL "
+                "ORDER BY created_at LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        return [
+            {
+                "event_id": r["event_id"],
+                "user_id": r["user_id"],
+                "row": json.loads(r["payload"]),
+                "stage": r["stage"],
+                "attempts": r["attempts"],
+            }
+            for r in rows
+        ]
+
+    def mark_logged(self, event_ids: List[str]) -> None:
+        self._update_many("UPDATE mood_outbox SET stage = 'logged', attempts = 0, next_attempt_at = 0, last_error = NULL WHERE event_id = ?", event_ids)
+
+    def mark_done(self, event_ids: List[str]) -> None:
+        self._update_many("DELETE FROM mood_outbox WHERE event_id = ?", event_ids)
+
+    def mark_failed(self, event_ids: List[str], error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[str]:
+        """失敗を記録して次の送信時刻を決める。max_attempts 回に達して停止中にしたイベントを返す"""
+        stuck = []
+        now = time.time()
+        with self._lock:
+            for event_id in event_ids:
+                row = self._conn.execute("SELECT attempts FROM mood_outbox WHERE event_id = ?", (event_id,)).fetchone()
+                if row is None:
+                    continue
+                attempts = row["attempts"] + 1
+                stuck_at = now if attempts >= max_attempts else None
+                if stuck_at is not None:
+                    stuck.append(event_id)
+                self._conn.execute(
+                    "UPDATE mood_outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, stuck_at = ? WHERE event_id = ?",
+                    (attempts, now + retry_delay(attempts), error[:500], stuck_at, event_id),
+                )
+        return stuck
+
+    def stuck_users(self) -> List[Dict[str, Any]]:
+        """停止中のイベントがあるユーザー（件数・ポイント・最後のエラー）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, COUNT(*) AS events, SUM(points) AS points, MIN(stuck_at) AS stuck_since, "
+                "MIN(created_at) AS oldest, MAX(last_error) AS last_error "
+                "FROM mood_outbox WHERE stuck_at IS NOT NULL GROUP BY user_id ORDER BY stuck_since"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def requeue_stuck(self, user_ids: Optional[List[str]] = None) -> int:
+        """停止中のイベントを送信待ちに戻す（user_ids がなければ全員分）。戻した件数を返す"""
+        sql = "UPDATE mood_outbox SET attempts = 0, next_attempt_at = 0, stuck_at = NULL WHERE stuck_at IS NOT NULL"
+        params: List[str] = []
+        if user_ids:
+            sql += f" AND user_id IN ({', '.join('?' for _ in user_ids)})"
+            params = list(user_ids)
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def pending_points(self, user_id: str, start_iso: str, end_iso: str) -> int:
+        """
+        まだポイント台帳に入っていないイベントのポイント合計（期間内）
+        挿入待ち（pending）も、挿入済みで台帳への追記待ち（logged）も含める。停止中のイベントも含める
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(points), 0) AS points FROM mood_outbox "
+                "WHERE user_id = ? AND stage IN ('pending', 'logged') AND created_at >= ? AND created_at < ?",
+                (user_id, start_iso, end_iso),
+            ).fetchone()
+        return int(row["points"])
+
+    def pending_count(self, user_id: Optional[str] = None) -> int:
+        """送信待ちの件数（停止中は含めない）"""
+        with self._lock:
+            if user_id is None:
+                row = self._conn.execute("SELECT COUNT(*) AS n FROM mood_outbox WHERE stuck_at IS NULL").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) AS n FROM mood_outbox WHERE stuck_at IS NULL AND user_id = ?", (user_id,)
+                ).fetchone()
+        return int(row["n"])
+
+    def _update_many(self, sql: str, event_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany(sql, [(event_id,) for event_id in event_ids])
+
+
+# =========================
+# バックグラウンド送信
+# =========================
+
+# flush(client, events, mark_logged) は送り終えたイベントを {"done": [...]} で返す
+# 途中段階まで進んだイベントは mark_logged(event_ids) で記録しておき、例外を投げたら再試行する
+FlushFunc = Callable[[Any, List[Dict[str, Any]], Callable[[List[str]], None]], Dict[str, List[str]]]
+
+
+class OutboxWorker:
+    """
+    ジャーナルを定期的に確認し、ユーザーごとにまとめて送信するデーモンスレッド
+    送信には client_factory() で作るワーカー自身の接続を使う（全ユーザー分を送れる権限が要る）
+    """
+
+    def __init__(
+        self,
+        outbox: MoodOutbox,
+        flush: FlushFunc,
+        client_factory: Callable[[], Any],
+        batch_size: int = 50,
+        interval: float = 1.0,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.outbox = outbox
+        self.flush = flush
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self._client_factory = client_factory
+        self._client: Any = None
+        # バックグラウンドとdrain()が同じイベントを二重に送らないようにする
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mood-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self) -> None:
+        """新しいイベントが入ったことを知らせ、待たずに送信させる"""
+        self._wake.set()
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """送信待ちがなくなるまで待つ（ジョブ・ベンチマーク用）"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.flush_once() == 0 and self.outbox.pending_count() == 0:
+                return True
+            time.sleep(0.05)
+        return self.outbox.pending_count() == 0
+
+    def flush_once(self) -> int:
+        """送信時刻を過ぎたイベントを1バッチずつ送り、処理した件数を返す"""
+        with self._flush_lock:
+            return self._flush_batch()
+
+    def _flush_batch(self) -> int:
+        events = self.outbox.due(limit=self.batch_size)
+        if not events:
+            return 0
+        if self._client is None:
+            self._client = self._client_factory()
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            by_user.setdefault(event["user_id"], []).append(event)
+
+        for user_id, user_events in by_user.items():
+            event_ids = [e["event_id"] for e in user_events]
+            try:
+                result = self.flush(self._client, user_events, self.outbox.mark_logged)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                stuck = self.outbox.mark_failed(event_ids, error, self.max_attempts)
+                if stuck:
+                    print(f"⚠️ mood_outbox: user {user_id} の {len(stuck)} 件は {self.max_attempts} 回失敗したため再試行を止めました（{error}）")
+                continue
+            self.outbox.mark_done(result.get("done", []))
+        return len(events)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.flush_once()
+            except Exception:
+                processed = 0
+            if processed < self.batch_size:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+
+# =========================
+# プロセス内シングルトン
+# =========================
+
+_worker: Optional[OutboxWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_outbox_worker(flush: FlushFunc, client_factory: Callable[[], Any]) -> OutboxWorker:
+    """ジャーナルとワーカーを1プロセスに1つだけ起動する（引数は最初の呼び出しのものを使う）"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            outbox = MoodOutbox(os.getenv("MOOD_OUTBOX_PATH", DEFAULT_OUTBOX_PATH))
+            _worker = OutboxWorker(
+                outbox,
+                flush,
+                client_factory,
+                batch_size=int(os.getenv("MOOD_OUTBOX_BATCH_SIZE", "50")),
+                interval=float(os.getenv("MOOD_OUTBOX_INTERVAL", "1.0")),
+                max_attempts=int(os.getenv("MOOD_OUTBOX_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))),
+            )
+            _worker.start()
+        return _worker
@@ -0,0 +1,247 @@
+# app/utils/points_ledger.py
+"""
+ポイント台帳（獲得・消費を追記だけで記録し、残高は台帳から求める）
+
+- 1エントリ = (ユーザー, 週, 増減)。獲得は正、餌やりでの消費は負の値
+  餌やりは先週分から差し引くので、消費エントリの週は「先週」になる
+- (source, source_id) で一意。同じ記録を再送しても1回分しか入らず、
+  既存行を更新しないので同時に書き込んでも競合しない
+- 残高 = スナップショット（points_ledger_snapshot）+ last_entry_id より後のエントリ（テール）
+  テールが POINTS_SNAPSHOT_EVERY 件以上になったら、読み取りのついでにスナップショットを進める
+  （advance_points_snapshot() が台帳から計算する。採番順とコミット順が入れ替わっても
+    取りこぼさないよう、直近のエントリは畳み込まない）
+- クライアントが追記できるのは自分の気分登録の獲得エントリだけ（RLS）
+  消費は feed_weekly_event()、調整とスナップショットの作り直しは service_role のツールが書く
+- 記録との突き合わせは reconcile_user（tools/points_reconcile.py から実行）
+
+設定:
+    POINTS_SNAPSHOT_EVERY=16
+"""
+import os
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterator, List
+
+from utils import jst_calendar
+
+SOURCE_MOOD = "mood"      # 気分登録での獲得（source_id = client_event_id）
+SOURCE_FEED = "feed"      # 餌やりでの消費（source_id = weekly_feed:<ユーザー>:<押した1回ごとのキー> など）
+SOURCE_ADJUST = "adjust"  # 移行・突き合わせでの調整
+
+# この秒数より新しいエントリはスナップショットに畳み込まない（advance_points_snapshot() と同じ）
+SNAPSHOT_SETTLE_SECONDS = 60
+
+# 突き合わせで台帳・記録を読むときの1回の件数
+RECONCILE_CHUNK_SIZE = 1000
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _snapshot_every() -> int:
+    return max(int(os.getenv("POINTS_SNAPSHOT_EVERY", "16")), 1)
+
+
+# =========================
+# エントリの作成と追記
+# =========================
+
+def mood_source_id(row: Dict[str, Any]) -> str:
+    """気分登録の行のエントリキー（冪等キーのない古い行は id を使う）"""
+    return row.get("client_event_id") or f"mood_register_log:{row['id']}"
+
+
+def mood_entry(row: Dict[str, Any]) -> Dict[str, Any]:
+    """mood_register_log の1行から獲得エントリを作る（週は登録時刻のJSTの週）"""
+    return {
+        "user_id": row["user_id"],
+        "week_start_date": jst_calendar.week_start_of(_parse_ts(row["created_at"])).isoformat(),
+        "delta": int(row.get("points_earned") or 0),
+        "source": SOURCE_MOOD,
+        "source_id": mood_source_id(row),
+    }
+
+
+def spend_entry(user_id: str, week_start_date: date, points: int, source_id: str) -> Dict[str, Any]:
+    """
+    週 week_start_date の残高から points を使う消費エントリ（service_role のツール用）
+    source_id は再送しても変わらないキーにする（アプリの餌やりは feed_weekly_event() が書く）
+    """
+    return {
+        "user_id": user_id,
+        "week_start_date": week_start_date.isoformat(),
+        "delta": -int(points),
+        "source": SOURCE_FEED,
+        "source_id": source_id,
+    }
+
+
+def append_entries(supabase, entries: List[Dict[str, Any]]) -> int:
+    """
+    台帳にまとめて追記し、新しく入った件数を返す（増減0のエントリは書かない）
+    (source, source_id) が既にあれば何もしない。失敗時は例外を投げる
+    """
+    entries = [e for e in entries if e["delta"]]
+    if not entries:
+        return 0
+    response = (
+        supabase.table("points_ledger")
+        .upsert(entries, on_conflict="source,source_id", ignore_duplicates=True)
+        .execute()
+    )
+    return len(response.data or [])
+
+
+# =========================
+# 残高（スナップショット + テール）
+# =========================
+
+def get_balance(supabase, user_id: str, week_start_date: date) -> int:
+    """週 week_start_date の残高（獲得 − 消費）。失敗時は例外を投げる"""
+    week = week_start_date.isoformat()
+    snapshot = (
+        supabase.table("points_ledger_snapshot")
+        .select("balance, last_entry_id")
+        .eq("user_id", user_id)
+        .eq("week_start_date", week)
+        .execute()
+    )
+    base, last_entry_id = 0, 0
+    if snapshot.data:
+        base, last_entry_id = snapshot.data[0]["balance"], snapshot.data[0]["last_entry_id"]
+
+    tail = (
+        supabase.table("points_ledger")
+        .select("id, delta")
+        .eq("user_id", user_id)
+        .eq("week_start_date", week)
+        .gt("id", last_entry_id)
+        .order("id")
+        .execute()
+    ).data or []
+
+    if len(tail) >= _snapshot_every():
+        _advance_snapshot(supabase, week)
+    return base + sum(e["delta"] for e in tail)
+
+
+def _advance_snapshot(supabase, week: str) -> None:
+    """
+    スナップショットを進める（advance_points_snapshot() が台帳から計算して書く）
+    落ち着いた（SNAPSHOT_SETTLE_SECONDS より古い）エントリの手前までを畳み込む
+    """
+    try:
+        supabase.rpc("advance_points_snapshot", {"p_week_start": week}).execute()
+    except Exception:
+        # スナップショットは読み取りを速くするためだけのもの。書けなくても残高は正しい
+        pass
+
+
+def write_snapshot(supabase, user_id: str, week: str, balance: int, last_entry_id: int) -> None:
+    """スナップショットを直接書く（service_role のツール用。クライアントには書き込みのポリシーがない）"""
+    supabase.table("points_ledger_snapshot").upsert(
+        {
+            "user_id": user_id,
+            "week_start_date": week,
+            "balance": balance,
+            "last_entry_id": last_entry_id,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        },
+        on_conflict="user_id,week_start_date",
+    ).execute()
+
+
+# =========================
+# 突き合わせ
+# =========================
+
+def _iter_user_rows(supabase, table: str, columns: str, user_id: str, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    """ユーザーの行を id 順に chunk_size 件ずつ読む"""
+    last_id = 0
+    while True:
+        rows = (
+            supabase.table(table)
+            .select(columns)
+            .eq("user_id", user_id)
+            .gt("id", last_id)
+            .order("id")
+            .limit(chunk_size)
+            .execute()
+        ).data or []
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def reconcile_user(supabase, user_id: str, fix: bool = False, chunk_size: int = RECONCILE_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    ユーザーの台帳を記録と突き合わせる
+
+    - missing_entries: 台帳に入っていない気分登録（書き込み途中の失敗など）
+    - mismatched_entries: 記録とポイントが食い違う獲得エントリ
+    - stale_snapshots: 台帳の合計と合わないスナップショット
+
+    fix=True なら、足りないエントリを追記してスナップショットを台帳から作り直す
+    （台帳の既存行は書き換えない。食い違いは件数を報告するだけで、調べてから adjust エントリで直す）
+    """
+    ledger: Dict[str, Dict[str, Any]] = {}
+    for entry in _iter_user_rows(supabase, "points_ledger", "id, week_start_date, delta, source, source_id", user_id, chunk_size):
+        if entry["source"] == SOURCE_MOOD:
+            ledger[entry["source_id"]] = entry
+
+    missing: List[Dict[str, Any]] = []
+    mismatched = 0
+    mood_columns = "id, client_event_id, user_id, points_earned, created_at"
+    for row in _iter_user_rows(supabase, "mood_register_log", mood_columns, user_id, chunk_size):
+        expected = mood_entry(row)
+        if not expected["delta"]:
+            continue
+        entry = ledger.get(expected["source_id"])
+        if entry is None:
+            missing.append(expected)
+        elif entry["delta"] != expected["delta"] or str(entry["week_start_date"]) != expected["week_start_date"]:
+            mismatched += 1
+
+    if fix:
+        append_entries(supabase, missing)
+
+    stale = rebuild_snapshots(supabase, user_id, write=fix, chunk_size=chunk_size)
+    return {
+        "user_id": user_id,
+        "missing_entries": len(missing),
+        "mismatched_entries": mismatched,
+        "stale_snapshots": stale,
+        "fixed": fix,
+    }
+
+
+def rebuild_snapshots(supabase, user_id: str, write: bool = True, chunk_size: int = RECONCILE_CHUNK_SIZE) -> int:
+    """台帳の合計と食い違うスナップショットの数を返す（write=True なら台帳から作り直す）"""
+    entries: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in _iter_user_rows(supabase, "points_ledger", "id, week_start_date, delta", user_id, chunk_size):
+        entries.setdefault(str(entry["week_start_date"]), []).append(entry)
+
+    snapshots = (
+        supabase.table("points_ledger_snapshot")
+        .select("week_start_date, balance, last_entry_id")
+        .eq("user_id", user_id)
+        .execute()
+    ).data or []
+
+    stale = 0
+    for snapshot in snapshots:
+        week_entries = entries.get(str(snapshot["week_start_date"]), [])
+        covered = sum(e["delta"] for e in week_entries if e["id"] <= snapshot["last_entry_id"])
+        if covered == snapshot["balance"]:
+            continue
+        stale += 1
+        if write:
+            write_snapshot(
+                supabase,
+                user_id,
+                str(snapshot["week_start_date"]),
+                sum(e["delta"] for e in week_entries),
+                max((e["id"] for e in week_entries), default=0),
+            )
+    return stale
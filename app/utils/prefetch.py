@@ -0,0 +1,181 @@
+# app/utils/prefetch.py
+"""
+提案の先読み（1_select でオノマトペを選んだ時点で生成を始める）
+2_suggest に移ったときには生成が終わっている（か途中まで進んでいる）ようにする
+
+- セッションごとに「今先読みしている入力」を1つだけ持つ
+  別のオノマトペ・シーンを選び直したら、まだ始まっていない生成は取り消す
+- 使われずに終わった先読みをセッションごとに数え、PREFETCH_MAX_WASTED 回で先読みをやめる
+- 待ち行列が詰まっているときは先読みしない（本来のページ表示の生成を優先）
+- 生成は utils/llm の集約（coalesce_key）を通るので、
+  先読み中に 2_suggest が同じ生成を始めても二重には呼ばれない
+
+設定:
+    PREFETCH_ENABLED=1
+    PREFETCH_WORKERS=4          # 先読み用スレッド数（プロセス全体）
+    PREFETCH_MAX_WASTED=3       # セッションごとに無駄になってよい先読みの回数
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, MutableMapping, Optional, Tuple
+
+from utils.meal_suggest import generate_meal_suggestion
+from utils.rhythm_reset import generate_rhythm_reset
+
+# 使われなかった先読みを捨てるまでの時間（秒）
+PREFETCH_TTL_SECONDS = 600
+
+# 2_suggest で実行中の先読みを待つ上限（秒、超えたらページ側で生成する）
+PREFETCH_WAIT_SECONDS = 30.0
+
+PrefetchKey = Tuple[str, str, str, str]  # (オノマトペ, キャラ名, シーン, 季節)
+
+
+class _SessionPrefetch:
+    __slots__ = ("key", "futures", "started_at", "taken", "wasted")
+
+    def __init__(self):
+        self.key: Optional[PrefetchKey] = None
+        self.futures: Dict[str, Future] = {}
+        self.started_at = 0.0
+        self.taken = False
+        self.wasted = 0
+
+
+class SuggestionPrefetcher:
+    """セッション単位の提案の先読み"""
+
+    def __init__(self, max_workers: int = 4, max_wasted: int = 3, ttl: float = PREFETCH_TTL_SECONDS):
+        self.max_workers = max_workers
+        self.max_wasted = max_wasted
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="suggest-prefetch")
+        self._sessions: Dict[str, _SessionPrefetch] = {}
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "cancelled": 0, "taken": 0, "wasted": 0, "skipped": 0}
+
+    def _pending(self) -> int:
+        return sum(1 for state in self._sessions.values() for f in state.futures.values() if not f.done())
+
+    def _retire(self, state: _SessionPrefetch) -> None:
+        """今の先読みを終わらせる（始まっていない生成は取り消し、走った分は無駄として数える）"""
+        ran = False
+        for future in state.futures.values():
+            if future.cancel():
+                self.stats["cancelled"] += 1
+            else:
+                ran = True
+        if ran and not state.taken:
+            state.wasted += 1
+            self.stats["wasted"] += 1
+        state.key = None
+        state.futures = {}
+        state.taken = False
+
+    def _prune(self, now: float) -> None:
+        """古いセッションの先読みを捨てる（無駄の回数もここでリセットされる）"""
+        for session_key in [k for k, s in self._sessions.items() if now - s.started_at > self.ttl]:
+            self._retire(self._sessions.pop(session_key))
+
+    def prefetch(
+        self,
+        session_key: str,
+        user_id: Optional[str],
+        onomatopoeia: str,
+        character_name: str,
+        character_profile: dict,
+        situation: str,
+        season: str,
+    ) -> bool:
+        """先読みを始める（同じ入力で先読み済み・上限到達・混雑時は何もしない）"""
+        key = (onomatopoeia, character_name, situation, season)
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            state = self._sessions.setdefault(session_key, _SessionPrefetch())
+            if state.key == key:
+                return False
+            if state.key is not None:
+                self._retire(state)
+            if state.wasted >= self.max_wasted or self._pending() >= self.max_workers * 2:
+                self.stats["skipped"] += 1
+                return False
+            state.key = key
+            state.started_at = now
+            state.futures = {
+                "rhythm": self._executor.submit(generate_rhythm_reset, onomatopoeia, character_name, character_profile, situation, season, user_id),
+                "meal": self._executor.submit(generate_meal_suggestion, onomatopoeia, character_name, character_profile, situation, season, user_id),
+            }
+            self.stats["started"] += 1
+            return True
+
+    def take(
+        self,
+        session_key: str,
+        kind: str,
+        onomatopoeia: str,
+        character_name: str,
+        situation: str,
+        season: str,
+        timeout: float = PREFETCH_WAIT_SECONDS,
+    ) -> Optional[dict]:
+        """
+        先読みの結果を受け取る（実行中なら timeout 秒まで待つ）
+
+        Returns:
+            生成結果、先読みしていない・失敗した場合はNone
+        """
+        with self._lock:
+            state = self._sessions.get(session_key)
+            if state is None or state.key != (onomatopoeia, character_name, situation, season):
+                return None
+            future = state.futures.pop(kind, None)
+            if future is None:
+                return None
+            state.taken = True
+            self.stats["taken"] += 1
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            # 取り消し・待ち時間切れ・生成失敗はページ側で生成し直す
+            return None
+
+    def forget(self, session_key: str) -> None:
+        """セッションの先読みを取り消す（ログアウトなど）"""
+        with self._lock:
+            state = self._sessions.pop(session_key, None)
+            if state is not None:
+                self._retire(state)
+
+
+def session_prefetch_key(session_state: MutableMapping) -> str:
+    """セッションごとの先読みのキー（st.session_state に1つ持つ）"""
+    if "prefetch_session_key" not in session_state:
+        session_state["prefetch_session_key"] = uuid.uuid4().hex
+    return session_state["prefetch_session_key"]
+
+
+# =========================
+# プロセス内シングルトン
+# =========================
+
+_prefetcher: Optional[SuggestionPrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Optional[SuggestionPrefetcher]:
+    """プロセス内の先読み器（PREFETCH_ENABLED=0 のときはNone）"""
+    global _prefetcher
+    if os.getenv("PREFETCH_ENABLED", "1") == "0":
+        return None
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = SuggestionPrefetcher(
+                    max_workers=int(os.getenv("PREFETCH_WORKERS", "4")),
+                    max_wasted=int(os.getenv("PREFETCH_MAX_WASTED", "3")),
+                )
+    return _prefetcher
@@ -3,71 +3,12 @@
 リズム・リセット機能
 オノマトペに応じた呼吸法・リラックス法を提案
 """
-import os
 import json
 from typing import Optional
-from openai import OpenAI
-from dotenv import load_dotenv
 
-load_dotenv()
-
-def get_system_prompt(character_name: str, character_profile: dict, situation: str = None, season: str = None) -> str:
-    """キャラクターに応じたシステムプロンプトを生成"""
-    
-    # シーンと季節の情報を追加
-    context_info = ""
-    if situation:
-        context_info += f"\n現在のシーン: {situation}"
-    if season:
-        context_info += f"\n現在の季節: {season}"
-    
-    return f"""あなたは「{character_name}」という猫様のキャラクター。
-{character_profile['specialty']}として、人間の気持ちに寄り添い、短時間でできるリラックス法を提案します。
-{context_info}
-
-あなたの特徴:
-- 専門分野: {character_profile['rhythm_focus']}
-- 語り口: {character_profile['tone']}
-- キャッチフレーズ: {character_profile['catchphrase']}
-
-出力は必ずJSON（オブジェクト）1つ。説明文や前置きは出さない。
-
-生成ルール:
-1) タイトル（絵文字1つ+短い名前、例: 🌬️ クールダウン）
-2) 一言（短くやさしく、10〜20文字）
-3) やり方: 3ステップ厳守、各ステップは20文字以内
-4) 猫のミニ儀式: 温度・音・距離感で一緒に楽しむ儀式（15〜30文字）
-5) 一言フォロー: 10〜16文字
-
-内容の方針:
-- あなたの専門分野を活かした提案
-- シーンと季節に合った内容にする（例: 朝イチなら目覚めサポート、会議前なら緊張ほぐし）
-- オフィスや自宅で気軽にできる
-- 道具不要
-
-JSONスキーマ:
-{{
-  "title": string,
-  "one_liner": string,
-  "steps": string[],
-  "cat_ritual": string,
-  "one_liner_after": string
-}}
-
-制約:
-- JSON以外は出さない
-- 3ステップ厳守、簡潔に
-- あなたのキャラクター性を活かす
-- シーンと季節を考慮する
-"""
-
-USER_PROMPT_TEMPLATE = """入力:
-onomatopoeia="{onomatopoeia}"
-situation="{situation}"
-season="{season}"
-constraints="3ステップ/各20文字以内/道具不要/シーンと季節に合わせる"
-出力は上記JSONスキーマに完全準拠し、余計な文字を一切含めないこと。
-"""
+from utils.fallbacks import get_fallback_rhythm
+from utils.llm import get_llm_client, complete_text
+from utils.prompts import get_prompt, suggestion_cache_key
 
 def _extract_json(text: str) -> str:
     """JSONテキストを抽出（前後の余分な文字を削除）"""
@@ -82,7 +23,8 @@ def generate_rhythm_reset(
     character_name: str, 
     character_profile: dict,
     situation: str = None,
-    season: str = None
+    season: str = None,
+    user_id: str = None
 ) -> Optional[dict]:
     """
     OpenAI APIでリズム・リセットを生成
@@ -93,36 +35,26 @@ def generate_rhythm_reset(
         character_profile: キャラクタープロファイル
         situation: シーン（オプション）
         season: 季節（オプション）
+        user_id: レート制限・予算を数えるユーザー（オプション）
     
     Returns:
-        dict or None: リセット提案のJSON、失敗時はNone
+        dict or None: リセット提案のJSON、失敗時・制限超過時はNone
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    
-    if not api_key:
+    if get_llm_client() is None:
         return None
     
     try:
-        client = OpenAI(api_key=api_key)
-        
-        system_prompt = get_system_prompt(character_name, character_profile, situation, season)
-        user_prompt = USER_PROMPT_TEMPLATE.format(
-            onomatopoeia=onomatopoeia,
-            situation=situation or "その他",
-            season=season or "春"
-        )
+        # 組み立て済みのプロンプト（共通ルール → キャラクター → 入力の順）
+        prompt = get_prompt("rhythm", character_name, character_profile)
         
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        content = complete_text(
+            prompt.messages(onomatopoeia, situation, season),
+            prompt_cache_key=prompt.cache_key,
+            user_id=user_id,
+            coalesce_key=suggestion_cache_key("rhythm", onomatopoeia, prompt.character_name, situation, season),
             temperature=0.8,
             top_p=0.9,
-        )
-        
-        content = resp.choices[0].message.content or ""
+        ) or ""
         json_text = _extract_json(content)
         return json.loads(json_text)
         
@@ -136,7 +68,8 @@ def get_rhythm_reset(
     character_profile: dict = None, 
     situation: str = None,
     season: str = None,
-    use_ai: bool = True
+    use_ai: bool = True,
+    user_id: str = None
 ) -> dict:
     """
     オノマトペに応じたリズム・リセット提案を返す
@@ -148,6 +81,7 @@ def get_rhythm_reset(
         situation: シーン（オプション）
         season: 季節（オプション）
         use_ai: OpenAI生成を使うか（デフォルトTrue）
+        user_id: レート制限・予算を数えるユーザー（オプション）
     
     Returns:
         dict: リセット提案
@@ -155,21 +89,9 @@ def get_rhythm_reset(
     
     # AI生成を試みる
     if use_ai and character_name and character_profile:
-        result = generate_rhythm_reset(onomatopoeia, character_name, character_profile, situation, season)
+        result = generate_rhythm_reset(onomatopoeia, character_name, character_profile, situation, season, user_id)
         if result:
             return result
     
-    # フォールバック（静的データ）
-    FALLBACK = {
-        "title": "🫧 リズム・リセット",
-        "one_liner": "深呼吸から始めよう",
-        "steps": [
-            "4秒吸う",
-            "6秒吐く",
-            "8回繰り返す"
-        ],
-        "cat_ritual": "一緒に深呼吸して、ゆったり過ごすニャ",
-        "one_liner_after": "おつかれさま"
-    }
-    
-    return FALLBACK
\ No newline at end of file
+    # フォールバック（キャラクター・シーン・季節・気分に合うものをライブラリから選ぶ）
+    return get_fallback_rhythm(onomatopoeia, character_name, situation, season)
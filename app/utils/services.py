@@ -1,13 +1,22 @@
 import os
 import uuid
-from datetime import datetime, timedelta, date
-from typing import Optional, Dict, Any, List
+from datetime import datetime, date, timezone
+from typing import Optional, Dict, Any, List, Tuple
 
 import streamlit as st
 from dotenv import load_dotenv
-from datetime import datetime, timezone
 from supabase import create_client, Client 
 
+from utils import jst_calendar, points_ledger
+from utils.local_backend import is_local_backend, get_local_client
+from utils.character_selector import get_character_stats
+from utils.feeding_state import get_feeding_state_cache
+from utils.session_store import clear_session
+from utils.shared_cache import get_shared_cache
+from utils.auth_session import AuthTokens, get_auth_session_manager
+from utils.mood_outbox import is_write_behind_enabled, get_outbox_worker
+from utils.tracing import trace_client
+
 # .env 読み込み
 load_dotenv(dotenv_path=".env")
 
@@ -37,19 +46,33 @@ SUPABASE_URL, SUPABASE_KEY = _get_supabase_creds()
 def get_supabase_client():
     """Supabaseクライアントを取得（認証セッション付き）"""
     load_dotenv()
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_KEY")
-    
-    supabase = create_client(supabase_url, supabase_key)
-    
-    # 🆕 セッションステートから認証情報を取得して設定
-    if "access_token" in st.session_state and "refresh_token" in st.session_state:
-        supabase.auth.set_session(
-            st.session_state["access_token"],
-            st.session_state["refresh_token"]
-        )
+
+    # ローカルスタンドイン（SUPABASE_BACKEND=local）ならSQLite版を返す
+    if is_local_backend():
+        return trace_client(get_local_client())
+
+    # クライアントはセッションごとに1つ作って使い回す
+    supabase = st.session_state.get("supabase_client")
+    if supabase is None:
+        supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+        st.session_state["supabase_client"] = supabase
+
+    # 🆕 トークンは期限に余裕があればそのまま使う（auth.set_session の確認通信をしない）
+    tokens = get_auth_session_manager(_refresh_auth_tokens).current(st.session_state)
+    if tokens is not None and st.session_state.get("supabase_client_token") != tokens.access_token:
+        supabase.postgrest.auth(tokens.access_token)
+        st.session_state["supabase_client_token"] = tokens.access_token
     
-    return supabase
+    # クエリごとのspanを記録する（デバッグパネル・トレース出力用）
+    return trace_client(supabase)
+
+def _refresh_auth_tokens(refresh_token: str) -> AuthTokens:
+    """リフレッシュトークンでセッションを更新する（裏のスレッドからも呼ばれるので専用のクライアントを使う）"""
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    response = client.auth.refresh_session(refresh_token)
+    if response is None or response.session is None:
+        raise RuntimeError("セッションを更新できませんでした")
+    return AuthTokens.from_session(response.session)
 
 # =========================
 # 🔐 認証機能（新規追加）
@@ -80,12 +103,20 @@ def logout():
     """ログアウト処理"""
     supabase = get_supabase_client()
     try:
-        supabase.auth.sign_out()
+        if is_local_backend():
+            supabase.auth.sign_out()
+        elif st.session_state.get("access_token"):
+            # クライアントに auth.set_session していないので、トークンを渡してサーバー側で失効させる
+            supabase.auth.admin.sign_out(st.session_state["access_token"])
         st.session_state.auth_user_id = None
         st.session_state.user_email = None
-        # 🆕 トークンもクリア
+        # 🆕 トークンとクライアントもクリア
         st.session_state.access_token = None
         st.session_state.refresh_token = None
+        st.session_state.pop("supabase_client", None)
+        st.session_state.pop("supabase_client_token", None)
+        # 選択中の状態・提案もクリア
+        clear_session(st.session_state)
         st.success("✅ ログアウトしました")
         st.switch_page("pages/0_login.py")
     except Exception as e:
@@ -147,22 +178,22 @@ def get_or_create_user_id() -> str:
 # =========================
 
 def get_week_start_date(today: Optional[date] = None) -> date:
-    """週の開始日（月曜日）を取得"""
+    """週の開始日（JSTの月曜日）を取得。日時を渡した場合はJSTの日付に直して計算"""
     if today is None:
-        today = datetime.now().date()
-    days_since_monday = today.weekday()
-    week_start = today - timedelta(days=days_since_monday)
-    return week_start
+        today = jst_calendar.today_jst()
+    elif isinstance(today, datetime):
+        today = jst_calendar.to_jst_date(today)
+    return jst_calendar.week_window(today).start_date
 
 def get_month_start_date(today: Optional[date] = None) -> date:
-    """月の開始日を取得"""
+    """月の開始日（JST）を取得"""
     if today is None:
-        today = datetime.now().date()
-    return date(today.year, today.month, 1)
+        today = jst_calendar.today_jst()
+    return jst_calendar.month_window(today).start_date
 
 def get_current_season() -> str:
-    """現在の季節を取得"""
-    month = datetime.now().month
+    """現在の季節を取得（JST）"""
+    month = jst_calendar.today_jst().month
     if month in [3, 4, 5]:
         return "春"
     elif month in [6, 7, 8]:
@@ -179,7 +210,7 @@ def get_current_season() -> str:
 def get_all_onomatopoeia(supabase) -> List[Dict[str, Any]]:
     """全オノマトペを取得"""
     try:
-        response = supabase.table("onomatopoeia_master").select("*").order("id").execute()
+        response = supabase.table("onomatopoeia_master").select("id, onomatopoeia, polarity").order("id").execute()
         return response.data if response.data else []
     except Exception as e:
         st.error(f"❌ オノマトペ取得エラー: {e}")
@@ -188,18 +219,22 @@ def get_all_onomatopoeia(supabase) -> List[Dict[str, Any]]:
 def get_all_situations(supabase) -> List[Dict[str, Any]]:
     """全シーンを取得"""
     try:
-        response = supabase.table("situation_master").select("*").order("id").execute()
+        response = supabase.table("situation_master").select("id, situation").order("id").execute()
         return response.data if response.data else []
     except Exception as e:
         st.error(f"❌ シーン取得エラー: {e}")
         return []
 
+def get_situation_name(supabase, situation_id: Optional[int]) -> str:
+    """シーンIDを提案生成に渡すシーン名に解決（situation_master から。見つからなければ「その他」）"""
+    return resolve_master_name(get_master_index(supabase), "situation", situation_id, "situation") or "その他"
+
 def get_cat_by_onomatopoeia_id(supabase, onomatopoeia_id: int) -> Optional[Dict[str, Any]]:
     """オノマトペIDから対応する猫を取得"""
     try:
         response = (
             supabase.table("cat_master")
-            .select("*")
+            .select("id, cat_name, personality_trait")
             .eq("onomatopoeia_id", onomatopoeia_id)
             .execute()
         )
@@ -225,24 +260,61 @@ def get_all_feeds(supabase) -> List[Dict[str, Any]]:
         st.error(f"❌ 餌マスタ取得エラー: {e}")
         return []
 
+# =========================
+# マスタインデックス（ログのID列をPython側で名前に解決する）
+# =========================
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _load_master_index(_supabase) -> Dict[str, Dict[int, Dict[str, Any]]]:
+    """マスタ4表をID→行の辞書にまとめる（失敗時は例外を送出してキャッシュさせない）"""
+    queries = {
+        "situation": ("situation_master", "id, situation"),
+        "onomatopoeia": ("onomatopoeia_master", "id, onomatopoeia, polarity"),
+        "cat": ("cat_master", "id, cat_name"),
+        "feed": ("feed_master", "id, feed_name, feed_point"),
+    }
+    shared = get_shared_cache()
+    index = {}
+    for key, (table, columns) in queries.items():
+        def load(table=table, columns=columns) -> List[Dict[str, Any]]:
+            return _supabase.table(table).select(columns).execute().data or []
+        # 複数ワーカー構成では、どれか1つのワーカーが読んだ行を全員で使う（行のリストで持つ）
+        rows = shared.get_or_compute("master", table, 3600, load) if shared is not None else load()
+        index[key] = {row["id"]: row for row in rows}
+    return index
+
+def get_master_index(supabase) -> Dict[str, Dict[int, Dict[str, Any]]]:
+    """
+    マスタのインデックスを取得（1時間キャッシュ）
+
+    Returns:
+        {"situation": {id: row}, "onomatopoeia": {...}, "cat": {...}, "feed": {...}}
+    """
+    try:
+        return _load_master_index(supabase)
+    except Exception as e:
+        st.error(f"❌ マスタ取得エラー: {e}")
+        return {"situation": {}, "onomatopoeia": {}, "cat": {}, "feed": {}}
+
+def resolve_master_name(index: Dict[str, Dict[int, Dict[str, Any]]], kind: str, master_id: Any, column: str) -> Optional[Any]:
+    """マスタIDを名前などの列値に解決（見つからなければNone）"""
+    row = index.get(kind, {}).get(master_id)
+    return row.get(column) if row else None
+
 # =========================
 # ポイント管理
 # =========================
 
 def get_current_week_points(supabase, user_id: str) -> int:
-    """今週の累積ポイントを取得"""
-    week_start = get_week_start_date()
+    """今週の累積ポイントを取得（ポイント台帳の今週分）"""
+    week = jst_calendar.current_week()
     try:
-        response = (
-            supabase.table("mood_register_log")
-            .select("points_earned")
-            .eq("user_id", user_id)
-            .gte("created_at", f"{week_start}T00:00:00")
-            .execute()
-        )
-        if response.data:
-            return sum(item["points_earned"] for item in response.data)
-        return 0
+        points = points_ledger.get_balance(supabase, user_id, week.start_date)
+        # 書き込みキューでポイント台帳への追記を待っている分（挿入前・挿入済みとも）も今週のポイントに含める
+        if is_mood_write_behind_available():
+            worker = get_mood_outbox_worker()
+            points += worker.outbox.pending_points(user_id, week.start_iso(), week.end_iso())
+        return points
     except Exception as e:
         st.error(f"❌ ポイント取得エラー: {e}")
         return 0
@@ -251,6 +323,108 @@ def get_current_week_points(supabase, user_id: str) -> int:
 # 気分登録
 # =========================
 
+def build_mood_row(
+    user_id: str,
+    onomatopoeia_id: int,
+    cat_id: str,
+    after_mood_id: int,
+    points_earned: int,
+    situation_id: Optional[int] = None,
+    comment: Optional[str] = None,
+    character_name: Optional[str] = None,
+    rhythm_content: Optional[Dict[str, Any]] = None,
+    meal_content: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    mood_register_log の1行を作成
+    client_event_id（冪等キー）と created_at は登録時点で決め、再送しても変わらないようにする
+    """
+    data = {
+        "client_event_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "onomatopoeia_id": onomatopoeia_id,
+        "cat_id": cat_id,
+        "after_mood_id": after_mood_id,
+        "points_earned": points_earned,
+        "situation_id": situation_id,
+        "comment": comment,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+    # 追加データがあれば含める
+    if character_name:
+        data["character_name"] = character_name
+    if rhythm_content:
+        data["rhythm_content"] = rhythm_content
+    if meal_content:
+        data["meal_content"] = meal_content
+
+    return data
+
+
+def insert_mood_rows(supabase, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    mood_register_log にまとめて挿入し、今回新しく入った行だけを返す
+    (client_event_id, created_at) が既にあれば何もしない（再送しても二重登録にならない）
+    """
+    # 一括挿入は列がそろっている必要があるので、行ごとに無い列はNoneで埋める
+    columns = list(dict.fromkeys(c for row in rows for c in row))
+    rows = [{c: row.get(c) for c in columns} for row in rows]
+    response = (
+        supabase.table("mood_register_log")
+        .upsert(rows, on_conflict="client_event_id,created_at", ignore_duplicates=True)
+        .execute()
+    )
+    return response.data or []
+
+
+def flush_mood_events(supabase, events: List[Dict[str, Any]], mark_logged) -> Dict[str, List[str]]:
+    """
+    書き込みキューのイベントを送信する（バックグラウンドスレッドから呼ばれる）
+    1. 挿入待ちの行をまとめて1回で挿入 → logged
+    2. 全イベントの獲得エントリをポイント台帳に追記 → done
+       （前回の送信で挿入だけ済んでいた行も、再送で重複として捨てられた行も含める。
+         台帳は client_event_id で一意なので、既に追記済みのエントリは増えない）
+    """
+    pending = [e for e in events if e["stage"] == "pending"]
+
+    if pending:
+        insert_mood_rows(supabase, [e["row"] for e in pending])
+        # 加算が途中で失敗しても、挿入からやり直さないよう先に記録する
+        mark_logged([e["event_id"] for e in pending])
+
+    # 1行 = 1エントリで追記する（client_event_id がキーなので、再送しても二重に加算されない）
+    points_ledger.append_entries(supabase, [points_ledger.mood_entry(e["row"]) for e in events])
+
+    return {"done": [e["event_id"] for e in events]}
+
+
+def _mood_outbox_client():
+    """
+    書き込みキューのワーカー専用の接続
+    ユーザーのセッションとは別に、service_role で全ユーザー分を送る（ローカルスタンドインはRLSなし）
+    """
+    if is_local_backend():
+        return get_local_client()
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+
+
+def is_mood_write_behind_available() -> bool:
+    """書き込みキューを使えるか（ワーカーの接続情報がなければ従来どおり同期で登録する）"""
+    return is_write_behind_enabled() and (is_local_backend() or bool(os.getenv("SUPABASE_SERVICE_ROLE_KEY")))
+
+
+def get_mood_outbox_worker():
+    """気分登録の書き込みキュー（プロセスに1つ）"""
+    return get_outbox_worker(flush_mood_events, _mood_outbox_client)
+
+
+def _record_character_outcome(onomatopoeia_id: int, situation_id: Optional[int], character_name: Optional[str], after_mood_id: int) -> None:
+    """キャラクター選択の統計に反映（集計表の次回読み直しまでの差分）"""
+    if character_name:
+        get_character_stats().record(onomatopoeia_id, situation_id, character_name, after_mood_id)
+
+
 def register_mood(
     supabase,
     user_id: str,
@@ -266,59 +440,36 @@ def register_mood(
 ) -> bool:
     """
     気分を登録
+    書き込みキューが有効なら、ローカルのジャーナルに書いた時点で成功として返す
+    （Supabaseへはバックグラウンドで送信。遅延・障害時も記録は失われない）
     """
     try:
-        data = {
-            "user_id": user_id,
-            "onomatopoeia_id": onomatopoeia_id,
-            "cat_id": cat_id,
-            "after_mood_id": after_mood_id,
-            "points_earned": points_earned,
-            "situation_id": situation_id,
-            "comment": comment
-        }
-        
-        # 追加データがあれば含める
-        if character_name:
-            data["character_name"] = character_name
-        if rhythm_content:
-            data["rhythm_content"] = rhythm_content
-        if meal_content:
-            data["meal_content"] = meal_content
-        
-        supabase.table("mood_register_log").insert(data).execute()
+        data = build_mood_row(
+            user_id,
+            onomatopoeia_id,
+            cat_id,
+            after_mood_id,
+            points_earned,
+            situation_id=situation_id,
+            comment=comment,
+            character_name=character_name,
+            rhythm_content=rhythm_content,
+            meal_content=meal_content,
+        )
 
-        # === weekly_points 更新処理 20251206石原追加===
-        now = datetime.now(timezone.utc)
-        week_start_date = get_week_start_date(now)
+        if is_mood_write_behind_available():
+            worker = get_mood_outbox_worker()
+            worker.outbox.enqueue(data)
+            worker.notify()
+            _record_character_outcome(onomatopoeia_id, situation_id, character_name, after_mood_id)
+            return True
 
-        existing_weekly = (
-            supabase.table("weekly_points")
-            .select("*")
-            .eq("user_id", user_id)
-            .eq("week_start_date", str(week_start_date))
-            .execute()
-        )
+        inserted = insert_mood_rows(supabase, [data])
 
-        if existing_weekly.data:
-            # レコードが存在する場合 → 更新
-            current_points = existing_weekly.data[0]["total_points"]
-            new_points = current_points + points_earned
-            supabase.table("weekly_points").update({
-                "total_points": new_points,
-                "updated_at": now.isoformat()
-            }).eq("id", existing_weekly.data[0]["id"]).execute()
-        else:
-            # レコードが存在しない場合 → 新規作成
-            supabase.table("weekly_points").insert({
-                "user_id": user_id,
-                "week_start_date": str(week_start_date),
-                "total_points": points_earned,
-                "exchangeable_next_week": True,
-                "exchangeable": False,
-                "created_at": now.isoformat(),
-                "updated_at": now.isoformat()
-            }).execute()
+        # === ポイント台帳への追記 ===
+        if inserted:
+            points_ledger.append_entries(supabase, [points_ledger.mood_entry(data)])
+            _record_character_outcome(onomatopoeia_id, situation_id, character_name, after_mood_id)
 
         return True
     except Exception as e:
@@ -378,7 +529,7 @@ def get_next_goal_message(points: int) -> str:
 
 def get_month_summary(supabase, user_id: str) -> Dict[str, Any]:
     """今月のサマリを取得"""
-    month_start = get_month_start_date()
+    month = jst_calendar.current_month()
     
     try:
         # 今月の記録件数とポイント
@@ -386,7 +537,8 @@ def get_month_summary(supabase, user_id: str) -> Dict[str, Any]:
             supabase.table("mood_register_log")
             .select("points_earned")
             .eq("user_id", user_id)
-            .gte("created_at", f"{month_start}T00:00:00")
+            .gte("created_at", month.start_iso())
+            .lt("created_at", month.end_iso())
             .execute()
         )
         
@@ -401,6 +553,67 @@ def get_month_summary(supabase, user_id: str) -> Dict[str, Any]:
         st.error(f"❌ 月次サマリ取得エラー: {e}")
         return {"total_records": 0, "total_points": 0}
 
+# =========================
+# 気分履歴（キーセットページング）
+# =========================
+
+HISTORY_COLUMNS = "id, created_at, situation_id, onomatopoeia_id, cat_id, after_mood_id, points_earned, character_name"
+
+def get_mood_history_page(
+    supabase,
+    user_id: str,
+    cursor: Optional[Tuple[str, int]] = None,
+    page_size: int = 50,
+    situation_id: Optional[int] = None,
+    onomatopoeia_id: Optional[int] = None,
+    cat_id: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+    """
+    気分履歴を新しい順に1ページ分取得（(created_at, id) のキーセットページング）
+    OFFSETを使わないので、何年分の記録があっても1ページのコストは一定
+
+    Args:
+        cursor: 前ページ最後の行の (created_at, id)。Noneなら先頭ページ
+        page_size: 1ページの件数
+        situation_id / onomatopoeia_id / cat_id: 絞り込み条件（Noneなら絞り込まない）
+
+    Returns:
+        (行のリスト, 次ページのカーソル or None)
+    """
+    try:
+        query = (
+            supabase.table("mood_register_log")
+            .select(HISTORY_COLUMNS)
+            .eq("user_id", user_id)
+        )
+        if situation_id is not None:
+            query = query.eq("situation_id", situation_id)
+        if onomatopoeia_id is not None:
+            query = query.eq("onomatopoeia_id", onomatopoeia_id)
+        if cat_id is not None:
+            query = query.eq("cat_id", cat_id)
+        if cursor is not None:
+            created_at, last_id = cursor
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{int(last_id)})'
+            )
+
+        # 1件多く取得して次ページの有無を判定
+        response = (
+            query.order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(page_size + 1)
+            .execute()
+        )
+        rows = response.data or []
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = (rows[-1]["created_at"], rows[-1]["id"]) if has_more and rows else None
+        return rows, next_cursor
+    except Exception as e:
+        st.error(f"❌ 履歴取得エラー: {e}")
+        return [], None
+
 # =========================
 # 週次餌やりイベント関連
 # =========================
@@ -409,18 +622,15 @@ def get_last_week_points(supabase, user_id: str) -> int:
     """
     先週の合計ポイントを取得
     """
-    today = datetime.now().date()
-    this_week_start = get_week_start_date(today)
-    last_week_start = this_week_start - timedelta(days=7)
-    last_week_end = this_week_start - timedelta(days=1)
+    last_week = jst_calendar.current_week(-1)
     
     try:
         response = (
             supabase.table("mood_register_log")
             .select("points_earned")
             .eq("user_id", user_id)
-            .gte("created_at", f"{last_week_start}T00:00:00")
-            .lte("created_at", f"{last_week_end}T23:59:59")
+            .gte("created_at", last_week.start_iso())
+            .lt("created_at", last_week.end_iso())
             .execute()
         )
         
@@ -434,25 +644,10 @@ def get_last_week_points(supabase, user_id: str) -> int:
 
 def has_fed_this_week(supabase, user_id: str) -> bool:
     """
-    今週すでに週次餌やりをしたかチェック
+    今週すでに週次餌やりをしたかチェック（最新の餌やりが今週か）
     """
-    week_start = get_week_start_date()
-    
     try:
-        response = (
-            supabase.table("feeding_event_log")
-            .select("feed_id")
-            .eq("user_id", user_id)
-            .gte("feed_at", f"{week_start}T00:00:00")
-            .execute()
-        )
-        
-        if not response.data:
-            return False
-        
-        # feed_id >= 2 (ちゅ〜る以上)が週次イベントの餌と仮定
-        weekly_feeds = [log for log in response.data if log.get("feed_id", 1) >= 2]
-        return len(weekly_feeds) > 0
+        return get_feeding_state_cache().get(supabase, user_id).fed_this_week()
         
     except Exception as e:
         st.error(f"❌ 餌やり済みチェックエラー: {e}")
@@ -484,152 +679,69 @@ def get_feeding_history(supabase, user_id: str, limit: int = 3) -> List[Dict[str
     餌やり履歴を取得
     """
     try:
-        response = (
-            supabase.table("feeding_event_log")
-            .select("feed_at, feed_id, feed_master(feed_name, feed_point)")
-            .eq("user_id", user_id)
-            .gte("feed_id", 2)  # 週次イベントのみ(カリカリ除外)
-            .order("feed_at", desc=True)
-            .limit(limit)
-            .execute()
-        )
-        
-        return response.data if response.data else []
+        # 餌やり済みチェックと同じ1回のクエリの結果（次の餌やりまでキャッシュ）
+        state = get_feeding_state_cache().get(supabase, user_id, limit)
+        
+        # 餌の名前・ポイントは結合せずマスタインデックスから解決
+        feeds = get_master_index(supabase)["feed"]
+        history = []
+        for record in state.history[:limit]:
+            feed = feeds.get(record["feed_id"], {})
+            history.append({
+                **record,
+                "feed_master": {"feed_name": feed.get("feed_name", "不明"), "feed_point": feed.get("feed_point", 0)},
+            })
+        return history
         
     except Exception as e:
         st.error(f"❌ 履歴取得エラー: {e}")
         return []
 
-def execute_weekly_feeding_event(supabase, user_id: str, feed_id: int) -> bool:
-    """
-    週次餌やりイベントを実行
-    """
-    try:
-        supabase.table("feeding_event_log").insert({
-            "user_id": user_id,
-            "feed_id": feed_id,
-            "feed_at": datetime.now().isoformat()
-        }).execute()
-        
-        return True
-        
-    except Exception as e:
-        st.error(f"❌ 餌やりエラー: {e}")
-        return False
+# 押した1回分の餌やりの冪等キー（(餌ID, キー)。結果が分からないまま失敗したら残して、押し直しで同じキーを送る）
+FEED_REQUEST_KEY = "weekly_feed_request"
 
-
-def initialize_weekly_points_if_needed(supabase, user_id: str) -> bool:
+def execute_weekly_feeding_event(supabase, user_id: str, feed_id: int) -> Optional[int]:
     """
-    今週のweekly_pointsレコードを作成（存在しない場合のみ）
+    週次餌やりイベントを実行し、餌やり後の残高を返す（失敗時はNone）
+    残高の確認・先週分からの消費・餌やりの記録は feed_weekly_event() が1トランザクションで行う
+    （必要ポイントはサーバー側で feed_master から読む。同じキーの再送では二重に消費しない）
     """
-    today = datetime.now().date()
-    week_start = get_week_start_date(today)
-    
+    request = st.session_state.get(FEED_REQUEST_KEY)
+    if not request or request[0] != feed_id:
+        request = (feed_id, str(uuid.uuid4()))
+        st.session_state[FEED_REQUEST_KEY] = request
+
     try:
-        # 既存レコードをチェック
-        response = (
-            supabase.table("weekly_points")
-            .select("id")
-            .eq("user_id", user_id)
-            .eq("week_start_date", week_start.isoformat())
-            .execute()
-        )
-        
-        if response.data:
-            return True  # 既に存在
+        response = supabase.rpc("feed_weekly_event", {"p_feed_id": feed_id, "p_request_id": request[1]}).execute()
+        st.session_state.pop(FEED_REQUEST_KEY, None)
+        get_feeding_state_cache().invalidate(user_id)
         
-        # 今週分を作成（初期値0）
-        supabase.table("weekly_points").insert({
-            "user_id": user_id,
-            "week_start_date": week_start.isoformat(),
-            "total_points": 0
-        }).execute()
-        
-        return True
+        return response.data
         
     except Exception as e:
-        st.error(f"❌ weekly_points初期化エラー: {e}")
-        return False
+        if "insufficient_points" in str(e):
+            # 消費されていないことが確かなので、次に押したときは新しいキーにする
+            st.session_state.pop(FEED_REQUEST_KEY, None)
+            st.error("❌ 残高不足です")
+        else:
+            st.error(f"❌ 餌やりエラー: {e}")
+        return None
+
 
 def get_weekly_balance(supabase, user_id: str) -> int:
     """
-    今週の餌やり可能残高を取得（先週分のポイント）
+    今週の餌やり可能残高を取得（先週分のポイント − 今週の餌やりで使った分）
     """
-    today = datetime.now().date()
-    this_week_start = get_week_start_date(today)
-    last_week_start = this_week_start - timedelta(days=7)
+    last_week_start = jst_calendar.current_week(-1).start_date
     
     try:
-        # 先週のweekly_pointsを取得
-        response = (
-            supabase.table("weekly_points")
-            .select("total_points")
-            .eq("user_id", user_id)
-            .eq("week_start_date", last_week_start.isoformat())
-            .execute()
-        )
-        
-        if response.data:
-            return response.data[0]["total_points"]
-        
-        # なければ先週分を集計して作成
-        last_week_points = get_last_week_points(supabase, user_id)
-        
-        if last_week_points > 0:
-            supabase.table("weekly_points").insert({
-                "user_id": user_id,
-                "week_start_date": last_week_start.isoformat(),
-                "total_points": last_week_points
-            }).execute()
-        
-        return last_week_points
+        return points_ledger.get_balance(supabase, user_id, last_week_start)
         
     except Exception as e:
         st.error(f"❌ 残高取得エラー: {e}")
         return 0
 
 
-def deduct_weekly_balance(supabase, user_id: str, points: int) -> bool:
-    """
-    残高からポイントを差し引く
-    """
-    today = datetime.now().date()
-    this_week_start = get_week_start_date(today)
-    last_week_start = this_week_start - timedelta(days=7)
-    
-    try:
-        # 現在の残高を取得
-        response = (
-            supabase.table("weekly_points")
-            .select("id, total_points")
-            .eq("user_id", user_id)
-            .eq("week_start_date", last_week_start.isoformat())
-            .execute()
-        )
-        
-        if not response.data:
-            st.error("❌ 残高データが見つかりません")
-            return False
-        
-        record = response.data[0]
-        current_balance = record["total_points"]
-        
-        if current_balance < points:
-            st.error(f"❌ 残高不足です（残高: {current_balance}pt、必要: {points}pt）")
-            return False
-        
-        # 残高を更新
-        new_balance = current_balance - points
-        supabase.table("weekly_points").update({
-            "total_points": new_balance
-        }).eq("id", record["id"]).execute()
-        
-        return True
-        
-    except Exception as e:
-        st.error(f"❌ 残高更新エラー: {e}")
-        return False
-
 # app/utils/services.py (追記・新規追加)
 
 import urllib.parse
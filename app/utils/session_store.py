@@ -0,0 +1,109 @@
+# app/utils/session_store.py
+"""
+気分登録の流れ（1_select → 2_suggest → 3_complete）でセッションに持つ状態の置き場
+
+以前は提案を組み合わせごとに st.session_state の別キー（rhythm_... / meal_...）に置き、
+3_complete では決まったキーしか消していなかったため、流れを回るたびにセッションが太っていた。
+ここでは st.session_state に SessionStore を1つだけ置き、
+
+- 提案は直近 SESSION_SUGGESTION_LIMIT 件だけのLRU（古いものから捨てる）
+- 登録結果は小さな MoodResult 1つ
+- 状態を消すタイミングは下のフックにまとめる
+    end_funnel   : 登録を終えてホームへ戻るとき（選択中のオノマトペ・キャラクター・提案・結果を消す）
+    clear_session: ログアウトのとき（SessionStore ごと消す）
+
+設定:
+    SESSION_SUGGESTION_LIMIT=4   # リズムリセットと食事提案、今回と直前の選択の分
+"""
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, MutableMapping, Optional, Tuple
+
+SESSION_STORE_KEY = "session_store"
+
+# 選択の流れで st.session_state に置くキー（ウィジェットや他ページが直接読むもの）
+FUNNEL_KEYS = (
+    "selected_situation_id",
+    "selected_onomatopoeia_id",
+    "selected_onomatopoeia",
+    "selected_cat_id",
+    "selected_cat_name",
+    "selected_cat_trait",
+    "selected_character",
+)
+
+SuggestionKey = Tuple[str, str, str, str, str]  # (種類, オノマトペ, キャラ名, シーン, 季節)
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    """生成した提案1件（content はそのまま mood_register_log に保存する）"""
+
+    __slots__ = ("key", "content")
+    key: SuggestionKey
+    content: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class MoodResult:
+    """2_suggest で登録した結果（3_complete で表示）"""
+
+    __slots__ = ("points_earned", "after_mood_label")
+    points_earned: int
+    after_mood_label: str
+
+
+class SessionStore:
+    """セッションごとの提案と登録結果（大きさは SESSION_SUGGESTION_LIMIT で頭打ち）"""
+
+    __slots__ = ("limit", "_suggestions", "result")
+
+    def __init__(self, limit: int = 4):
+        self.limit = limit
+        self._suggestions: "OrderedDict[SuggestionKey, Suggestion]" = OrderedDict()
+        self.result: Optional[MoodResult] = None
+
+    def suggestion(self, kind: str, onomatopoeia: str, character_name: str, situation: str, season: str) -> Optional[Dict[str, Any]]:
+        key = (kind, onomatopoeia, character_name, situation, season)
+        item = self._suggestions.get(key)
+        if item is None:
+            return None
+        self._suggestions.move_to_end(key)
+        return item.content
+
+    def remember_suggestion(self, kind: str, onomatopoeia: str, character_name: str, situation: str, season: str, content: Dict[str, Any]) -> None:
+        key = (kind, onomatopoeia, character_name, situation, season)
+        self._suggestions[key] = Suggestion(key, content)
+        self._suggestions.move_to_end(key)
+        while len(self._suggestions) > self.limit:
+            self._suggestions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._suggestions)
+
+
+def get_session_store(session_state: MutableMapping) -> SessionStore:
+    """セッションの SessionStore（なければ作る）"""
+    store = session_state.get(SESSION_STORE_KEY)
+    if store is None:
+        store = SessionStore(limit=max(int(os.getenv("SESSION_SUGGESTION_LIMIT", "4")), 2))
+        session_state[SESSION_STORE_KEY] = store
+    return store
+
+
+# =========================
+# ライフサイクル
+# =========================
+
+def end_funnel(session_state: MutableMapping) -> None:
+    """登録の流れを終える（選択中の状態・提案・登録結果を消す）"""
+    for key in FUNNEL_KEYS:
+        session_state.pop(key, None)
+    session_state.pop(SESSION_STORE_KEY, None)
+
+
+def clear_session(session_state: MutableMapping) -> None:
+    """ログアウト時（流れの状態に加えて先読みのキーも消す）"""
+    end_funnel(session_state)
+    session_state.pop("prefetch_session_key", None)
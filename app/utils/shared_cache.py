@@ -0,0 +1,304 @@
+# app/utils/shared_cache.py
+"""
+複数のアプリワーカー（Streamlitのプロセス）で共有するキャッシュ層（ローカルのSQLiteファイル）
+プロセス内のキャッシュ（st.cache_data・LLMの集約）の後ろに置き、
+ワーカーを増やしてもマスタ読み込みとLLM生成が台数分に増えないようにする
+
+    マスタ          : master/<表名>        → 行のリスト（1時間）
+    提案の生成結果  : llm/<モデル:キー>    → 使い回す本文を数通り（LLM_VARIANT_TTL）
+    振り返りレポート: feedback/<ハッシュ>  → 本文（1時間）
+
+- 同じ値を複数のワーカーが同時に作らないよう、作る側はリース（期限付きの鍵）を取る
+  リースを取れなかったワーカーは、出来上がるのを待って受け取る（期限を過ぎたら自分で作る）
+- 値はJSONで保存する（ファイルを書き換えられてもコードは実行されない）
+- ファイルの大きさは SHARED_CACHE_MAX_MB で頭打ち。超えたら最後に使われたのが古い順に消す
+
+設定（複数ワーカー構成のときだけ設定する。未設定ならプロセス内キャッシュだけで動く）:
+    SHARED_CACHE_PATH=/var/tmp/growbit-cache.sqlite3   # 全ワーカーで同じパスを指定
+    SHARED_CACHE_MAX_MB=64
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+SHARED_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_entry_accessed_idx ON cache_entry (accessed_at);
+
+-- 1つのキーに数通りの値を持つ（LLMの生成結果の使い回し）
+CREATE TABLE IF NOT EXISTS cache_variant (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_variant_key_idx ON cache_variant (namespace, key, created_at);
+
+CREATE TABLE IF NOT EXISTS cache_lease (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+# 値ができるのを待つときの確認間隔（秒）
+WAIT_POLL_SECONDS = 0.05
+
+# accessed_at の更新は、前回からこの秒数以上たったときだけ（読み取りのたびに書かない）
+TOUCH_INTERVAL_SECONDS = 60.0
+
+# この回数書き込むごとに期限切れの削除と大きさの確認をする
+PRUNE_EVERY_WRITES = 50
+
+
+class SharedCache:
+    """プロセス間で共有するキャッシュ（SQLiteファイル1つ）"""
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._owner = uuid.uuid4().hex
+        self._rng = random.Random()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SHARED_CACHE_SCHEMA)
+
+    def _count(self, namespace: str, name: str) -> None:
+        counts = self.stats.setdefault(namespace, {"hits": 0, "misses": 0, "waits": 0})
+        counts[name] += 1
+
+    # --- 単一の値 ---
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, accessed_at FROM cache_entry WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, now),
+            ).fetchone()
+            if row is not None and now - row[1] > TOUCH_INTERVAL_SECONDS:
+                self._conn.execute("UPDATE cache_entry SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        now = self._clock()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entry (namespace, key, value, size, created_at, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, payload, len(payload), now, now + ttl, now),
+            )
+            self._after_write(now)
+
+    def get_or_compute(self, namespace: str, key: str, ttl: float, fn: Callable[[], Any], wait: float = 30.0) -> Any:
+        """
+        共有キャッシュにあれば返し、なければ fn() で作って保存する
+        他のワーカーが作っている最中なら wait 秒まで待って受け取る（fn が None を返したら保存しない）
+        """
+        value = self.get(namespace, key)
+        if value is not None:
+            self._count(namespace, "hits")
+            return value
+        if not self.acquire_lease(namespace, key, wait):
+            self._count(namespace, "waits")
+            value = self._wait(lambda: self.get(namespace, key), namespace, key, wait)
+            if value is not None:
+                return value
+        self._count(namespace, "misses")
+        try:
+            value = fn()
+            if value is not None:
+                self.set(namespace, key, value, ttl)
+            return value
+        finally:
+            self.release_lease(namespace, key)
+
+    # --- 数通りの値（LLMの生成結果） ---
+    def pick_variant(self, namespace: str, key: str, pool_size: int, since: float = 0.0) -> Optional[Any]:
+        """
+        期限内の値が pool_size 通り以上あれば1つ選んで返す
+        since を指定したときは、その時刻以降に追加された値を（数に関係なく）返す
+        """
+        now = self._clock()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value, created_at FROM cache_variant WHERE namespace = ? AND key = ? AND expires_at > ? ORDER BY created_at DESC LIMIT ?",
+                (namespace, key, now, max(pool_size, 1)),
+            ).fetchall()
+        if since:
+            rows = [r for r in rows if r[1] >= since]
+            if not rows:
+                return None
+        elif len(rows) < pool_size:
+            return None
+        return json.loads(self._rng.choice(rows)[0])
+
+    def add_variant(self, namespace: str, key: str, value: Any, ttl: float, pool_size: int) -> None:
+        """値を1通り追加し、新しい pool_size 通りだけ残す"""
+        now = self._clock()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cache_variant (namespace, key, value, size, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, payload, len(payload), now, now + ttl),
+            )
+            self._conn.execute(
+                "DELETE FROM cache_variant WHERE namespace = ? AND key = ? AND id NOT IN "
+                "(SELECT id FROM cache_variant WHERE namespace = ? AND key = ? ORDER BY created_at DESC LIMIT ?)",
+                (namespace, key, namespace, key, max(pool_size, 1)),
+            )
+            self._after_write(now)
+
+    def compute_variant(self, namespace: str, key: str, pool_size: int, ttl: float, fn: Callable[[], Optional[str]], wait: float = 30.0) -> Optional[str]:
+        """
+        pool_size 通り揃っていればその中から返し、揃っていなければ fn() で1通り作って追加する
+        他のワーカーが作っている最中なら、それが出来上がるのを wait 秒まで待って受け取る
+        """
+        value = self.pick_variant(namespace, key, pool_size)
+        if value is not None:
+            self._count(namespace, "hits")
+            return value
+        started = self._clock()
+        if not self.acquire_lease(namespace, key, wait):
+            self._count(namespace, "waits")
+            value = self._wait(lambda: self.pick_variant(namespace, key, pool_size, since=started), namespace, key, wait)
+            if value is not None:
+                return value
+        self._count(namespace, "misses")
+        try:
+            value = fn()
+            if value:
+                self.add_variant(namespace, key, value, ttl, pool_size)
+            return value
+        finally:
+            self.release_lease(namespace, key)
+
+    # --- リース ---
+    def acquire_lease(self, namespace: str, key: str, ttl: float) -> bool:
+        """キーの値を作る権利を取る（期限切れのリースは奪える）"""
+        now = self._clock()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO cache_lease (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE cache_lease.expires_at <= ?",
+                (namespace, key, self._owner, now + ttl, now),
+            )
+            return cur.rowcount > 0
+
+    def release_lease(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_lease WHERE namespace = ? AND key = ? AND owner = ?", (namespace, key, self._owner))
+
+    def _lease_held(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM cache_lease WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, self._clock()),
+            ).fetchone()
+        return row is not None
+
+    def _wait(self, probe: Callable[[], Any], namespace: str, key: str, timeout: float) -> Optional[Any]:
+        """リースの持ち主が値を作り終えるまで待つ（失敗してリースが消えたらNone）"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            value = probe()
+            if value is not None:
+                return value
+            if not self._lease_held(namespace, key):
+                return probe()
+            time.sleep(WAIT_POLL_SECONDS)
+        return None
+
+    # --- 大きさの管理 ---
+    def _after_write(self, now: float) -> None:
+        """書き込みのたびに呼ぶ（ロック内）。ときどき期限切れを消し、上限を超えていれば古いものから消す"""
+        self._writes += 1
+        if self._writes % PRUNE_EVERY_WRITES:
+            return
+        self._conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (now,))
+        self._conn.execute("DELETE FROM cache_variant WHERE expires_at <= ?", (now,))
+        self._conn.execute("DELETE FROM cache_lease WHERE expires_at <= ?", (now,))
+        total = self._conn.execute(
+            "SELECT COALESCE((SELECT SUM(size) FROM cache_entry), 0) + COALESCE((SELECT SUM(size) FROM cache_variant), 0)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 上限の9割まで、最後に使われたのが古い値（生成結果は作られたのが古い値）から消す
+        excess = total - int(self.max_bytes * 0.9)
+        for table, order in (("cache_variant", "created_at"), ("cache_entry", "accessed_at")):
+            rows = self._conn.execute(f"SELECT rowid, size FROM {table} ORDER BY {order}").fetchall()
+            doomed: List[int] = []
+            for rowid, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append(rowid)
+                excess -= size
+            self._conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(r,) for r in doomed])
+            if excess <= 0:
+                break
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE((SELECT SUM(size) FROM cache_entry), 0) + COALESCE((SELECT SUM(size) FROM cache_variant), 0)"
+            ).fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entry")
+            self._conn.execute("DELETE FROM cache_variant")
+            self._conn.execute("DELETE FROM cache_lease")
+
+
+# =========================
+# プロセス内シングルトン
+# =========================
+
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """共有キャッシュ（SHARED_CACHE_PATH が未設定ならNone）"""
+    global _shared_cache
+    path = os.getenv("SHARED_CACHE_PATH")
+    if not path:
+        return None
+    if _shared_cache is None or _shared_cache.path != path:
+        with _shared_cache_lock:
+            if _shared_cache is None or _shared_cache.path != path:
+                _shared_cache = SharedCache(path, max_bytes=int(float(os.getenv("SHARED_CACHE_MAX_MB", "64")) * 1024 * 1024))
+    return _shared_cache
+
+
+def reset_shared_cache() -> None:
+    """設定を変えたときに作り直す（ベンチマーク用）"""
+    global _shared_cache
+    with _shared_cache_lock:
+        _shared_cache = None
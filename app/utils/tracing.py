@@ -0,0 +1,326 @@
+# app/utils/tracing.py
+"""
+リクエスト（Streamlitのrerun）単位の軽量トレーシング
+Supabaseクエリ・LLM呼び出しをspanとして記録し、
+デバッグパネル表示とOTLP互換JSONファイルへの書き出しを行う
+
+有効化:
+    GROWBIT_TRACE=1                      # デバッグパネルを表示
+    GROWBIT_TRACE_EXPORT=traces.jsonl    # rerunごとにOTLP/JSONを1行追記
+"""
+import atexit
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# =========================
+# span と trace
+# =========================
+
+
+class Span:
+    """1回のDBクエリ・LLM呼び出しの記録"""
+
+    __slots__ = ("span_id", "name", "kind", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, name: str, kind: str, attributes: Optional[Dict[str, Any]] = None):
+        self.span_id = secrets.token_hex(8)
+        self.name = name
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = self.start_ns
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class RerunTrace:
+    """1回のrerunで発生したspanの集まり"""
+
+    def __init__(self, page: str):
+        self.trace_id = secrets.token_hex(16)
+        self.page = page
+        self.start_ns = time.time_ns()
+        self.spans: List[Span] = []
+        # finish_rerun で閉じるときに1回だけ呼ぶ（デバッグパネルの描画）
+        self.on_finish: Optional[Callable[["RerunTrace"], None]] = None
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> Dict[str, Any]:
+        """種類別の件数と合計時間"""
+        by_kind: Dict[str, Dict[str, float]] = {}
+        for span in list(self.spans):
+            agg = by_kind.setdefault(span.kind, {"count": 0, "duration_ms": 0.0, "bytes": 0})
+            agg["count"] += 1
+            agg["duration_ms"] += span.duration_ms
+            agg["bytes"] += span.attributes.get("response.bytes", 0)
+        return by_kind
+
+    def repeated_queries(self) -> Dict[str, int]:
+        """同じテーブル・フィルタ形のクエリが複数回出たもの（N+1の兆候）"""
+        counts: Dict[str, int] = {}
+        for span in list(self.spans):
+            if span.kind != "db":
+                continue
+            key = f"{span.attributes.get('db.table')} {span.attributes.get('db.filter_shape', '')}"
+            counts[key] = counts.get(key, 0) + 1
+        return {k: v for k, v in counts.items() if v > 1}
+
+
+# 現在のrerunのtrace（Streamlitはスクリプトをスレッドで実行するのでcontextvarで保持）
+_current: contextvars.ContextVar[Optional[RerunTrace]] = contextvars.ContextVar("growbit_trace", default=None)
+
+# セッションごとに開いているtrace（rerunのたびにスレッドが変わっても前回分を閉じられるように）
+# 途中で止まったrerun（st.stop / st.switch_page）は次のrerunで閉じる。
+# そのまま離れたセッションの分が残り続けないよう、数と経過時間で上限を設けて古いものから閉じる
+_open_traces: "OrderedDict[str, RerunTrace]" = OrderedDict()
+_open_lock = threading.Lock()
+_OPEN_TRACES_MAX = 256
+_OPEN_TRACE_MAX_AGE_NS = 15 * 60 * 10**9
+
+
+def is_debug_enabled() -> bool:
+    return os.getenv("GROWBIT_TRACE", "").lower() in ("1", "true", "yes")
+
+
+def get_export_path() -> Optional[str]:
+    return os.getenv("GROWBIT_TRACE_EXPORT") or None
+
+
+def current_trace() -> Optional[RerunTrace]:
+    return _current.get()
+
+
+def start_rerun(page: str, session_key: str = "default") -> RerunTrace:
+    """rerunの開始（setup_page から呼ぶ）。同じセッションの直前のtraceと、古いtraceは書き出して閉じる"""
+    trace = RerunTrace(page)
+    closed = []
+    with _open_lock:
+        previous = _open_traces.pop(session_key, None)
+        if previous is not None:
+            closed.append(previous)
+        _open_traces[session_key] = trace
+        while _open_traces:
+            oldest = next(iter(_open_traces.values()))
+            if len(_open_traces) <= _OPEN_TRACES_MAX and trace.start_ns - oldest.start_ns <= _OPEN_TRACE_MAX_AGE_NS:
+                break
+            closed.append(_open_traces.popitem(last=False)[1])
+    for old in closed:
+        _export(old)
+    _current.set(trace)
+    return trace
+
+
+def finish_rerun(session_key: str = "default") -> None:
+    """セッションのtraceを閉じ、on_finish を呼んでから書き出す（ページの最後で呼ぶ）"""
+    with _open_lock:
+        trace = _open_traces.pop(session_key, None)
+    _current.set(None)
+    if trace is None:
+        return
+    try:
+        if trace.on_finish is not None:
+            trace.on_finish(trace)
+    finally:
+        _export(trace)
+
+
+def flush_all() -> None:
+    """開いている全traceを書き出す（プロセス終了時・ベンチマーク終了時）"""
+    with _open_lock:
+        traces = list(_open_traces.values())
+        _open_traces.clear()
+    for trace in traces:
+        _export(trace)
+
+
+def _export(trace: RerunTrace) -> None:
+    path = get_export_path()
+    if path and trace.spans:
+        export_otlp(trace, path)
+
+
+@contextmanager
+def span(name: str, kind: str, **attributes: Any):
+    """
+    spanを記録するコンテキストマネージャ
+    traceが開始されていない（ジョブやバックグラウンドスレッド）場合も安全に動く
+    """
+    s = Span(name, kind, attributes)
+    try:
+        yield s
+    except Exception as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        trace = _current.get()
+        if trace is not None:
+            trace.add(s)
+
+
+# =========================
+# OTLP/JSON 書き出し
+# =========================
+
+_export_lock = threading.Lock()
+
+atexit.register(flush_all)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: RerunTrace) -> Dict[str, Any]:
+    """OTLP ExportTraceServiceRequest のJSON表現に変換"""
+    spans = []
+    for s in list(trace.spans):
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 3,  # SPAN_KIND_CLIENT
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        }
+        if s.error:
+            otlp_span["status"] = {"code": 2, "message": s.error}
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "growbit"}},
+                        {"key": "streamlit.page", "value": {"stringValue": trace.page}},
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "utils.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def export_otlp(trace: RerunTrace, path: str) -> None:
+    """OTLP/JSONをJSON Lines形式で追記（otelcol の file receiver で読み込める）"""
+    line = json.dumps(to_otlp(trace), ensure_ascii=False)
+    with _export_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# =========================
+# Supabaseクライアントのラッパー
+# =========================
+
+_FILTER_METHODS = {"eq", "neq", "gt", "gte", "lt", "lte", "in_", "is_", "like", "ilike", "or_", "contains"}
+
+
+def _payload_bytes(data: Any) -> int:
+    try:
+        return len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class TracedQuery:
+    """クエリビルダーを包み、フィルタを記録して execute() をspanにする"""
+
+    def __init__(self, builder: Any, table: str):
+        self._builder = builder
+        self._table = table
+        self._action = "select"
+        self._columns = ""
+        self._filters: List[str] = []
+        self._filter_shape: List[str] = []
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            if name in ("select", "insert", "update", "upsert", "delete"):
+                self._action = name
+                if name == "select" and args:
+                    self._columns = str(args[0])
+            elif name in _FILTER_METHODS:
+                column = args[0] if args else ""
+                value = args[1] if len(args) > 1 else ""
+                self._filters.append(f"{column} {name} {value}")
+                self._filter_shape.append(f"{column}:{name}")
+            result = attr(*args, **kwargs)
+            if name == "execute":
+                return result
+            self._builder = result
+            return self
+
+        return wrapper
+
+    def execute(self):
+        with span(
+            f"db.{self._action} {self._table}",
+            "db",
+            **{
+                "db.system": "postgresql",
+                "db.table": self._table,
+                "db.operation": self._action,
+                "db.columns": self._columns,
+                "db.filter": " AND ".join(self._filters),
+                "db.filter_shape": ",".join(self._filter_shape),
+            },
+        ) as s:
+            response = self._builder.execute()
+            data = getattr(response, "data", None)
+            s.attributes["db.rows"] = len(data) if isinstance(data, list) else (1 if data else 0)
+            s.attributes["response.bytes"] = _payload_bytes(data)
+            return response
+
+
+class TracedClient:
+    """Supabaseクライアントを包み、table() 経由の全クエリをトレースする"""
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    @property
+    def raw(self) -> Any:
+        """ラップ前のクライアント"""
+        return self._client
+
+    def table(self, name: str) -> TracedQuery:
+        return TracedQuery(self._client.table(name), name)
+
+    def from_(self, name: str) -> TracedQuery:
+        return self.table(name)
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+def trace_client(client: Any) -> Any:
+    """二重ラップを避けてクライアントを包む"""
+    if client is None or isinstance(client, TracedClient):
+        return client
+    return TracedClient(client)
@@ -1,6 +1,10 @@
 # app/utils/ui.py
 import streamlit as st
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional
+
+from utils import tracing
+from utils.constants import AFTER_MOOD_CONFIG
 
 # =========================
 # 共通スタイル
@@ -107,6 +111,148 @@ def title_with_spacer(text: str, add_spacer: bool = True) -> None:
         st.markdown('<div class="page-title-spacer"></div>', unsafe_allow_html=True)
     st.title(text)
 
+# =========================
+# HTML部品（レンダーキャッシュ）
+# =========================
+# 入力が同じなら同じHTMLになる部品は lru_cache で使い回し、
+# 入力のない部品は import 時に1回だけ組み立てておく（rerun ごとに f-string を組み直さない）
+
+@lru_cache(maxsize=64)
+def food_tile_html(food_name: str, threshold: int, emoji: str, unlocked: bool, is_current: bool) -> str:
+    """ホームの餌の種類プレビュー（2x2グリッドの小さいタイル）"""
+    opacity = "1.0" if unlocked else "0.4"
+    border_color = "#667eea" if is_current else "#ddd"
+    bg_color = "#f0f4ff" if is_current else "#f9f9f9"
+    status = "✅" if unlocked else "🔒"
+    return f"""
+                <div style="
+                    text-align:center; 
+                    padding:8px; 
+                    margin:3px 0;
+                    border:2px solid {border_color}; 
+                    border-radius:8px; 
+                    background-color:{bg_color}; 
+                    opacity:{opacity};
+                ">
+                    <div style="font-size:24px; margin-bottom:2px;">{emoji}</div>
+                    <p style="margin:2px 0; font-weight:bold; font-size:11px;">{food_name}</p>
+                    <p style="margin:0; font-size:9px; color:#666;">{threshold}pt~</p>
+                    <p style="margin:2px 0; font-size:14px;">{status}</p>
+                </div>
+                """
+
+@lru_cache(maxsize=64)
+def food_card_html(food_name: str, threshold: int, emoji: str, unlocked: bool, is_current: bool) -> str:
+    """完了画面の今週の餌（4列のカード）"""
+    opacity = "1.0" if unlocked else "0.3"
+    border_color = "#667eea" if is_current else "#ddd"
+    bg_color = "#f0f4ff" if is_current else "#f9f9f9"
+    status = "✓" if unlocked else "🔒"
+    return f"""
+            <div style="
+                text-align:center; 
+                padding:15px; 
+                border:2px solid {border_color}; 
+                border-radius:10px; 
+                background-color:{bg_color}; 
+                opacity:{opacity};
+                transition: all 0.3s ease;
+            ">
+                <div style="font-size:40px; margin-bottom:5px;">{emoji}</div>
+                <p style="margin:3px 0; font-weight:bold; font-size:14px;">{food_name}</p>
+                <p style="margin:0; font-size:11px; color:#666;">{threshold}pt~</p>
+                <p style="margin:3px 0; font-size:18px;">{status}</p>
+            </div>
+            """
+
+@lru_cache(maxsize=256)
+def points_earned_html(points_earned: int, cat_name: str) -> str:
+    """完了画面の今回獲得ポイント"""
+    return f"""
+        <div style="text-align:center; padding:40px 20px; background:linear-gradient(135deg,#667eea 0%,#764ba2 100%); border-radius:15px; color:white; margin:10px 0;">
+            <h1 style="font-size:60px; margin:0;">+{points_earned}pt</h1>
+            <p style="font-size:20px; margin-top:15px; opacity:.9;">🐱 {cat_name} も喜んでいるよ！</p>
+        </div>
+        """
+
+@lru_cache(maxsize=256)
+def next_goal_html(remaining: int, food_name: str) -> str:
+    """完了画面の次の目標"""
+    return f"""
+                <div style="background-color:#e3f2fd; padding:12px; border-radius:8px; border-left:4px solid #2196f3; text-align:center;">
+                    <p style="font-size:18px; margin:0; color:#1976d2; font-weight:bold;">💡 あと{remaining}ptで「{food_name}」！</p>
+                </div>
+                """
+
+def _after_mood_card_html(config: Dict[str, object]) -> str:
+    return f"""
+            <div style="border:2px solid #ddd; border-radius:10px; padding:15px; margin:10px 0; background:#f9f9f9; text-align:center; height:180px; display:flex; flex-direction:column; justify-content:center;">
+                <h2 style="margin:10px 0; font-size:1.5em;">{config['label']}</h2>
+                <p style="color:#666; font-size:14px;">{config['description']}</p>
+                <p style="color:#999; font-size:12px;">+{config['points']}pt</p>
+            </div>
+            """
+
+# 提案画面の「今の気持ちは？」カード（設定だけで決まるので import 時に組み立てる）
+AFTER_MOOD_CARDS_HTML: Dict[int, str] = {
+    after_mood_id: _after_mood_card_html(config) for after_mood_id, config in AFTER_MOOD_CONFIG.items()
+}
+
+# =========================
+# トレース（rerun単位のDB/LLM計測）
+# =========================
+
+def _session_key() -> str:
+    """Streamlitセッションの識別子（取得できなければ既定値）"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else "default"
+    except Exception:
+        return "default"
+
+def render_trace_panel(trace: "tracing.RerunTrace", placeholder) -> None:
+    """サイドバーにspanの一覧と集計を表示"""
+    with placeholder.container():
+        with st.expander("🔍 トレース（このrerun）", expanded=False):
+            for kind, agg in trace.summary().items():
+                st.caption(f"{kind}: {agg['count']}回 / {agg['duration_ms']:.1f}ms / {agg['bytes']}B")
+            repeated = trace.repeated_queries()
+            if repeated:
+                st.warning("同じ形のクエリが繰り返されています（N+1の可能性）")
+                for shape, count in repeated.items():
+                    st.caption(f"×{count} {shape}")
+            st.dataframe(
+                [
+                    {
+                        "span": s.name,
+                        "ms": round(s.duration_ms, 1),
+                        "rows": s.attributes.get("db.rows", ""),
+                        "bytes": s.attributes.get("response.bytes", ""),
+                        "filter": s.attributes.get("db.filter", ""),
+                        "error": s.error or "",
+                    }
+                    for s in list(trace.spans)
+                ],
+                use_container_width=True,
+            )
+
+def start_page_trace(page_name: str, debug_panel: Optional[bool] = None) -> "tracing.RerunTrace":
+    """
+    rerunごとのトレースを開始
+    debug_panel が有効（既定は GROWBIT_TRACE=1）ならサイドバーに場所を取っておき、
+    finish_page_trace でパネルを1回だけ描く
+    """
+    trace = tracing.start_rerun(page_name, _session_key())
+    if debug_panel if debug_panel is not None else tracing.is_debug_enabled():
+        placeholder = st.sidebar.empty()
+        trace.on_finish = lambda t: render_trace_panel(t, placeholder)
+    return trace
+
+def finish_page_trace() -> None:
+    """ページの最後で呼ぶ（st.stop / st.switch_page で止まったrerunは、次のrerunの開始時に閉じる）"""
+    tracing.finish_rerun(_session_key())
+
 # =========================
 # ページセットアップ（共通初期化）
 # =========================
@@ -119,6 +265,7 @@ def setup_page(
     show_home: bool = True,
     home_href: str = "/",
     add_title_spacer: bool = True,
+    debug_panel: Optional[bool] = None,
 ) -> None:
     """ページの共通初期化"""
     st.set_page_config(
@@ -128,6 +275,7 @@ def setup_page(
         initial_sidebar_state=initial_sidebar_state,
     )
     inject_base_styles()
+    start_page_trace(page_title, debug_panel=debug_panel)
     if show_home:
         home_button(href=home_href)
     title_with_spacer(page_title, add_spacer=add_title_spacer)
\ No newline at end of file
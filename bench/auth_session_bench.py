@@ -0,0 +1,80 @@
+# bench/auth_session_bench.py
+"""
+ページ表示ごとの認証まわりの通信回数（utils/auth_session.py）
+1セッションが --hours 時間のあいだ --interval 秒おきに再実行したときの通信回数を比べる
+（アクセストークンの有効期限は --token-ttl 秒。時計は進めるだけで実際には待たない）
+
+    before : 再実行ごとに auth.set_session（有効ならユーザー確認、期限切れなら更新の通信が1回）
+    after  : AuthSessionManager（期限に余裕があれば通信なし、期限が近づいたら裏で更新）
+
+使い方（リポジトリのルートで実行）:
+    python bench/auth_session_bench.py --hours 8 --interval 20
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+
+def make_jwt(exp: float) -> str:
+    """署名なしのJWT（期限だけ読めればよい）"""
+    def part(obj: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    return f"{part({'alg': 'HS256', 'typ': 'JWT'})}.{part({'exp': int(exp), 'sub': 'bench'})}.sig"
+
+
+def run(mode: str, hours: float, interval: float, token_ttl: float) -> Dict[str, int]:
+    from utils.auth_session import AuthSessionManager, AuthTokens
+
+    now = [0.0]
+    calls = {"network_calls": 0, "reruns": 0, "expired_token_used": 0}
+    issued = [0]
+
+    def refresher(refresh_token: str) -> AuthTokens:
+        calls["network_calls"] += 1
+        issued[0] += 1
+        return AuthTokens(make_jwt(now[0] + token_ttl), f"refresh-{issued[0]}", now[0] + token_ttl)
+
+    session = {"access_token": make_jwt(token_ttl), "refresh_token": "refresh-0"}
+    manager = AuthSessionManager(refresher, clock=lambda: now[0])
+    while now[0] < hours * 3600:
+        calls["reruns"] += 1
+        if mode == "before":
+            from utils.auth_session import decode_jwt_expiry
+
+            # set_session: 期限切れなら更新、そうでなければユーザー確認（どちらも通信1回）
+            if decode_jwt_expiry(session["access_token"]) <= now[0]:
+                tokens = refresher(session["refresh_token"])
+                session.update(access_token=tokens.access_token, refresh_token=tokens.refresh_token)
+            else:
+                calls["network_calls"] += 1
+            expires_at = decode_jwt_expiry(session["access_token"])
+        else:
+            expires_at = manager.current(session).expires_at
+        if expires_at <= now[0]:
+            calls["expired_token_used"] += 1
+        now[0] += interval
+    return calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ページ表示ごとの認証まわりの通信回数")
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--interval", type=float, default=20.0, help="再実行の間隔（秒）")
+    parser.add_argument("--token-ttl", type=float, default=3600.0)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("before", "after"):
+        results[mode] = calls = run(mode, args.hours, args.interval, args.token_ttl)
+        print(f"{mode:>6}: {calls['network_calls']:>5} network calls / {calls['reruns']} reruns  ({calls['network_calls'] / calls['reruns']:.3f}/page)")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench/coalesce_bench.py
+"""
+朝のピーク（朝イチ）を想定した同時生成の集約効果の計測
+多数のセッションが同時にリズムリセット・食事提案を生成したときの
+LLM呼び出し回数とレイテンシ（p50/p95）を、集約の設定ごとに比べる
+
+    off      : 集約なし（LLM_COALESCE=0）
+    flight   : 実行中の同一リクエストへの相乗りだけ（LLM_VARIANT_POOL_SIZE=0）
+    pool     : 相乗り + 生成結果を --pool-size 通りまで使い回す
+
+使い方（リポジトリのルートで実行）:
+    python bench/coalesce_bench.py --sessions 300 --concurrency 50 --llm-latency-ms 800
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def build_workload(sessions: int, seed: int) -> List[tuple]:
+    """朝イチのセッション列（オノマトペは人気に偏りを持たせる）"""
+    from utils.character_profiles import CHARACTER_MAPPING
+
+    rng = random.Random(seed)
+    onomatopoeias = list(CHARACTER_MAPPING)
+    weights = [1 / (rank + 1) for rank in range(len(onomatopoeias))]
+    workload = []
+    for _ in range(sessions):
+        onomatopoeia = rng.choices(onomatopoeias, weights)[0]
+        character_name = rng.choice(CHARACTER_MAPPING[onomatopoeia])
+        workload.append((onomatopoeia, character_name, "朝イチ", "秋"))
+    return workload
+
+
+def run(mode: str, workload: List[tuple], concurrency: int, latency_ms: float, pool_size: int) -> Dict[str, float]:
+    from utils import llm
+    from utils.character_profiles import CHARACTER_PROFILES
+    from utils.llm_fake import FakeLLM, FakeOpenAI
+    from utils.meal_suggest import generate_meal_suggestion
+    from utils.rhythm_reset import generate_rhythm_reset
+
+    os.environ["LLM_COALESCE"] = "0" if mode == "off" else "1"
+    os.environ["LLM_VARIANT_POOL_SIZE"] = str(pool_size if mode == "pool" else 0)
+    llm.reset_llm_client()
+    llm.reset_completion_coalescer()
+    llm._client = FakeOpenAI(FakeLLM(latency_ms=latency_ms, latency_dist="lognormal", jitter=0.3, seed=0))
+    calls_before = llm.get_llm_call_count()
+
+    def session(item: tuple) -> float:
+        onomatopoeia, character_name, situation, season = item
+        profile = CHARACTER_PROFILES[character_name]
+        start = time.perf_counter()
+        generate_rhythm_reset(onomatopoeia, character_name, profile, situation, season)
+        generate_meal_suggestion(onomatopoeia, character_name, profile, situation, season)
+        return (time.perf_counter() - start) * 1000
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(session, workload))
+    wall = time.perf_counter() - wall_start
+
+    calls = llm.get_llm_call_count() - calls_before
+    return {
+        "sessions": len(workload),
+        "llm_calls": calls,
+        "calls_per_session": round(calls / len(workload), 3),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "wall_s": round(wall, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="同時生成の集約効果の計測")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--pool-size", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["LLM_BACKEND"] = "fake"
+    # 計測中はレート制限・予算で呼び出しが止まらないようにする
+    os.environ.setdefault("LLM_LIMITS", "0")
+    workload = build_workload(args.sessions, args.seed)
+
+    results = {}
+    for mode in ("off", "flight", "pool"):
+        results[mode] = result = run(mode, workload, args.concurrency, args.llm_latency_ms, args.pool_size)
+        print(f"{mode:>6}: {result['llm_calls']:>4} calls ({result['calls_per_session']:.2f}/session)  p50 {result['p50_ms']:>7.1f} ms  p95 {result['p95_ms']:>7.1f} ms")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
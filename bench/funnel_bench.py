@@ -0,0 +1,305 @@
+# bench/funnel_bench.py
+"""
+気分登録ファネルのE2Eベンチマーク
+Streamlit の AppTest で実際のページスクリプトをヘッドレス実行し、
+select → suggest → register → complete → feedback の各ステップについて
+レイテンシ（p50/p95/p99）・DB往復回数・LLM呼び出し回数を計測する
+
+ローカルのスタンドイン（SQLite版Supabase + LLM fake/スタブ）に対して実行するため
+ネットワークなしで再現性のある計測ができる
+
+使い方（リポジトリのルートで実行）:
+    python bench/funnel_bench.py --iterations 30 --llm-latency-ms 800
+    python bench/funnel_bench.py --llm-backend stub --llm-base-url http://127.0.0.1:8787/v1
+
+結果は bench/results/funnel-<commit>.json に保存される（git の管理外。--out で保存先を変えられる）
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+PAGES_DIR = os.path.join(APP_DIR, "pages")
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+STEPS = ["select", "suggest", "register", "complete", "feedback"]
+
+BENCH_USER_ID = "00000000-0000-4000-8000-00000000b0b0"
+
+# ページ間で引き継ぐセッションステート（選択中の状態は utils.session_store.FUNNEL_KEYS も加える）
+CARRY_KEYS = [
+    "auth_user_id",
+    "user_email",
+    "access_token",
+    "refresh_token",
+    "prefetch_session_key",
+]
+
+
+# =========================
+# 計測ユーティリティ
+# =========================
+
+def percentile(values: List[float], pct: float) -> float:
+    """線形補間のパーセンタイル"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples: List[Dict[str, float]]) -> Dict[str, Any]:
+    latencies = [s["latency_ms"] for s in samples]
+    return {
+        "n": len(samples),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        },
+        "db_round_trips": round(sum(s["db_round_trips"] for s in samples) / max(len(samples), 1), 2),
+        "llm_calls": round(sum(s["llm_calls"] for s in samples) / max(len(samples), 1), 2),
+        "errors": sum(s["errors"] for s in samples),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+# =========================
+# 環境の準備
+# =========================
+
+def configure_env(args: argparse.Namespace) -> None:
+    """アプリをローカルスタンドインに向ける（utils の import 前に呼ぶ）"""
+    os.environ["SUPABASE_BACKEND"] = "local"
+    os.environ["LOCAL_DB_PATH"] = args.db_path
+    os.environ["LLM_BACKEND"] = args.llm_backend
+    if args.llm_base_url:
+        os.environ["LLM_BASE_URL"] = args.llm_base_url
+    os.environ["LLM_FAKE_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["LLM_FAKE_LATENCY_DIST"] = args.llm_latency_dist
+    os.environ["LLM_FAKE_JITTER"] = str(args.llm_jitter)
+    os.environ["LLM_FAKE_ERROR_RATE"] = str(args.llm_error_rate)
+    os.environ["LLM_FAKE_SEED"] = str(args.seed)
+    # 計測中はレート制限・予算で呼び出しが止まらないようにする
+    os.environ.setdefault("LLM_LIMITS", "0")
+    # 書き込みキューのジャーナルは実行ごとに分ける（前回の送信待ちを持ち越さない）
+    os.environ.setdefault("MOOD_OUTBOX_PATH", os.path.join(tempfile.mkdtemp(prefix="growbit-bench-"), "outbox.sqlite3"))
+    os.chdir(ROOT)  # cat_icon.png を相対パスで読むため
+    sys.path.insert(0, APP_DIR)
+
+
+def seed_history(client, user_id: str, days: int, per_day: int, rng: random.Random) -> None:
+    """振り返りページ用に過去の記録を投入"""
+    client.table("users").upsert({"id": user_id, "email": "bench@example.com"}).execute()
+    now = datetime.now(timezone.utc)
+    rows = []
+    for d in range(days):
+        for _ in range(per_day):
+            onomatopoeia_id = rng.randint(1, 12)
+            after_mood_id = rng.randint(1, 3)
+            created_at = now - timedelta(days=d, minutes=rng.randint(0, 600))
+            rows.append({
+                "user_id": user_id,
+                "onomatopoeia_id": onomatopoeia_id,
+                "cat_id": onomatopoeia_id,
+                "after_mood_id": after_mood_id,
+                "points_earned": {1: 5, 2: 10, 3: 20}[after_mood_id],
+                "situation_id": rng.randint(1, 8),
+                "created_at": created_at.isoformat(),
+            })
+    if rows:
+        client.table("mood_register_log").insert(rows).execute()
+
+
+# =========================
+# ファネルの実行
+# =========================
+
+class FunnelRunner:
+    def __init__(self, args: argparse.Namespace):
+        from streamlit.testing.v1 import AppTest
+        from utils.local_backend import get_local_client
+        from utils.llm import get_llm_call_count
+
+        import streamlit as st
+        from utils.session_store import FUNNEL_KEYS, SESSION_STORE_KEY
+
+        self.AppTest = AppTest
+        self.client = get_local_client()
+        self.llm_call_count = get_llm_call_count
+        self.timeout = args.timeout
+        self.rng = random.Random(args.seed)
+        self.state: Dict[str, Any] = {}
+        self.carry_keys = list(dict.fromkeys(CARRY_KEYS + list(FUNNEL_KEYS) + [SESSION_STORE_KEY]))
+        self.switched_to: Optional[str] = None
+
+        # AppTest はページを1枚ずつ実行するので st.navigation のページ登録がなく、
+        # 本物の st.switch_page は StreamlitPageNotFoundError になる。
+        # 遷移先を記録してそのページの実行を止め、次のページは _new_app で開く
+        def switch_page(page) -> None:
+            self.switched_to = str(page)
+            st.stop()
+
+        st.switch_page = switch_page
+
+    def _new_app(self, page: str):
+        self.switched_to = None
+        at = self.AppTest.from_file(os.path.join(PAGES_DIR, page), default_timeout=self.timeout)
+        for key, value in self.state.items():
+            at.session_state[key] = value
+        return at
+
+    def _save_state(self, at) -> None:
+        for key in self.carry_keys:
+            try:
+                self.state[key] = at.session_state[key]
+            except KeyError:
+                self.state.pop(key, None)
+
+    def _measure(self, action, expect_page: Optional[str] = None) -> Dict[str, float]:
+        """action を計測する。例外、または expect_page 以外への遷移（なし含む）はエラーに数える"""
+        trips0, llm0 = self.client.round_trips, self.llm_call_count()
+        self.switched_to = None
+        start = time.perf_counter()
+        at = action()
+        elapsed = (time.perf_counter() - start) * 1000
+        errors = len(at.exception) if at is not None else 0
+        if self.switched_to != expect_page:
+            errors += 1
+            self.last_errors.append(f"expected page {expect_page}, got {self.switched_to}")
+        if at is not None:
+            self.last_errors.extend(e.message for e in at.exception)
+        return {
+            "latency_ms": elapsed,
+            "db_round_trips": self.client.round_trips - trips0,
+            "llm_calls": self.llm_call_count() - llm0,
+            "errors": errors,
+        }, at
+
+    def run_once(self) -> Dict[str, Dict[str, float]]:
+        self.state = {
+            "auth_user_id": BENCH_USER_ID,
+            "user_email": "bench@example.com",
+        }
+        self.last_errors: List[str] = []
+        result: Dict[str, Dict[str, float]] = {}
+        onomatopoeia_id = self.rng.randint(1, 12)
+        polarity = "neg" if onomatopoeia_id <= 4 else "neu" if onomatopoeia_id <= 8 else "pos"
+
+        # 1. 気分選択（表示 → オノマトペ選択 → 確定）
+        def select():
+            at = self._new_app("1_select.py").run()
+            at.button(key=f"ono_{polarity}_{onomatopoeia_id}").click().run()
+            at.button(key="confirm_selection").click().run()
+            return at
+        result["select"], at = self._measure(select, expect_page="pages/2_suggest.py")
+        self._save_state(at)
+
+        # 2. 提案表示（LLM生成）
+        def suggest():
+            return self._new_app("2_suggest.py").run()
+        result["suggest"], at = self._measure(suggest)
+
+        # 3. 気分変化の登録（同じセッションでボタン押下）
+        after_mood_id = self.rng.randint(1, 3)
+        result["register"], at = self._measure(
+            lambda: at.button(key=f"after_mood_{after_mood_id}").click().run(),
+            expect_page="pages/3_complete.py",
+        )
+        self._save_state(at)
+
+        # 4. 完了ページ
+        result["complete"], at = self._measure(lambda: self._new_app("3_complete.py").run())
+
+        # 5. 振り返りページ
+        result["feedback"], at = self._measure(lambda: self._new_app("4_feedback.py").run())
+        return result
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(f"{'step':<10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'db':>8}{'llm':>8}{'err':>6}")
+    for step in STEPS:
+        s = summary[step]
+        lat = s["latency_ms"]
+        print(f"{step:<10}{lat['p50']:>10.1f}{lat['p95']:>10.1f}{lat['p99']:>10.1f}{s['db_round_trips']:>8.1f}{s['llm_calls']:>8.1f}{s['errors']:>6}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="気分登録ファネルのE2Eベンチマーク")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2, help="計測から除外する初回実行数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db-path", default=":memory:")
+    parser.add_argument("--history-days", type=int, default=28, help="事前投入する記録の日数")
+    parser.add_argument("--logs-per-day", type=int, default=3)
+    parser.add_argument("--llm-backend", choices=["fake", "stub"], default="fake")
+    parser.add_argument("--llm-base-url", default=None)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-dist", default="fixed")
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--clear-cache", action="store_true", help="毎回 st.cache_data をクリアする")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--out", default=None, help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    configure_env(args)
+    runner = FunnelRunner(args)
+    seed_history(runner.client, BENCH_USER_ID, args.history_days, args.logs_per_day, random.Random(args.seed))
+
+    samples: Dict[str, List[Dict[str, float]]] = {step: [] for step in STEPS}
+    for i in range(args.warmup + args.iterations):
+        if args.clear_cache:
+            import streamlit as st
+            st.cache_data.clear()
+        result = runner.run_once()
+        for message in runner.last_errors:
+            print(f"⚠️  iteration {i}: {message}")
+        if i >= args.warmup:
+            for step in STEPS:
+                samples[step].append(result[step])
+
+    summary = {step: summarize(samples[step]) for step in STEPS}
+    print_report(summary)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "steps": summary,
+        "samples": samples,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"funnel-{commit}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 saved: {out}")
+
+    # エラーのあった計測は数字が意味を持たないので、失敗として終了する
+    errors = sum(summary[step]["errors"] for step in STEPS)
+    if errors:
+        print(f"❌ {errors} step(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
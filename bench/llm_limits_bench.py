@@ -0,0 +1,124 @@
+# bench/llm_limits_bench.py
+"""
+LLMのレート制限・予算判定（utils/llm_limits.py）のマイクロベンチマーク
+先に判定の振る舞いを確認してから、1回の判定にかかる時間を計る
+
+    - バースト分は通り、その後は補充されるまで拒否される
+    - 全体で拒否されたときはユーザーの分が減らない
+    - 予算を使い切ると拒否され、JSTの日付が変わると戻る
+    - 制限超過のとき complete_text は使い回しの生成結果に切り替える
+
+使い方（リポジトリのルートで実行）:
+    python bench/llm_limits_bench.py --iterations 200000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+
+class ManualClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def check_behavior() -> List[str]:
+    from utils.llm_limits import GLOBAL_BUDGET, GLOBAL_RATE, USER_BUDGET, USER_RATE, LLMLimiter
+
+    checked = []
+    clock, wall = ManualClock(), ManualClock(1_700_000_000.0)
+
+    limiter = LLMLimiter(user_rate_per_min=6, user_burst=2, global_rate_per_min=0, user_daily_tokens=0, global_daily_tokens=0, clock=clock, wall_clock=wall)
+    assert [limiter.acquire("u1") for _ in range(3)] == [None, None, USER_RATE]
+    assert limiter.acquire("u2") is None, "ユーザーごとに別のバケット"
+    clock.now += 10  # 6回/分 → 10秒で1回分
+    assert limiter.acquire("u1") is None and limiter.acquire("u1") == USER_RATE
+    checked.append("user token bucket")
+
+    limiter = LLMLimiter(user_rate_per_min=60, user_burst=5, global_rate_per_min=60, global_burst=1, user_daily_tokens=0, global_daily_tokens=0, clock=clock, wall_clock=wall)
+    assert limiter.acquire("u1") is None and limiter.acquire("u2") == GLOBAL_RATE
+    clock.now += 1
+    assert limiter.acquire("u2") is None
+    assert limiter._user_buckets["u2"].tokens == 4, "全体で拒否された分はユーザーに返す"
+    checked.append("global token bucket")
+
+    limiter = LLMLimiter(user_rate_per_min=0, global_rate_per_min=0, user_daily_tokens=100, global_daily_tokens=150, clock=clock, wall_clock=wall)
+    limiter.charge("u1", 100)
+    assert limiter.acquire("u1") == USER_BUDGET and limiter.acquire("u2") is None
+    limiter.charge("u2", 60)
+    assert limiter.acquire("u2") == GLOBAL_BUDGET
+    wall.now += 86400
+    assert limiter.acquire("u1") is None and limiter.usage("u1") == {"global_tokens": 0, "user_tokens": 0}
+    checked.append("daily budget with JST rollover")
+
+    os.environ.update({"LLM_BACKEND": "fake", "LLM_LIMITS": "1", "LLM_USER_RATE_PER_MIN": "1", "LLM_USER_BURST": "1", "LLM_VARIANT_POOL_SIZE": "3"})
+    from utils import llm, llm_limits
+    from utils.llm_limits import LLMLimitExceeded
+
+    llm_limits.reset_llm_limiter()
+    llm.reset_llm_client()
+    llm.reset_completion_coalescer()
+    messages = [{"role": "user", "content": "onomatopoeia=\"うとうと\""}]
+    first = llm.complete_text(messages, coalesce_key="bench", user_id="u1")
+    assert llm.complete_text(messages, coalesce_key="bench", user_id="u1") == first, "制限超過時は使い回しの結果"
+    try:
+        llm.complete_text(messages, coalesce_key="other", user_id="u1")
+        raise AssertionError("使い回しがなければ LLMLimitExceeded")
+    except LLMLimitExceeded as e:
+        assert e.reason == USER_RATE
+    checked.append("complete_text degrades to pooled variants")
+    return checked
+
+
+def time_acquire(iterations: int) -> Dict[str, float]:
+    from utils.llm_limits import LLMLimiter
+
+    results = {}
+    scenarios = {
+        # 許可される判定（十分大きいバケット）
+        "allow": dict(user_rate_per_min=1e9, user_burst=10**9, global_rate_per_min=1e9, global_burst=10**9),
+        # すぐに拒否される判定（ユーザーのバースト1）
+        "deny_rate": dict(user_rate_per_min=1e-9, user_burst=1, global_rate_per_min=1e9, global_burst=10**9),
+    }
+    users = [f"user-{i}" for i in range(1000)]
+    for name, config in scenarios.items():
+        limiter = LLMLimiter(**config)
+        acquire = limiter.acquire
+        start = time.perf_counter_ns()
+        for i in range(iterations):
+            acquire(users[i % 1000])
+        elapsed = time.perf_counter_ns() - start
+        results[f"{name}_us"] = round(elapsed / iterations / 1000, 3)
+
+    limiter = LLMLimiter()
+    charge = limiter.charge
+    start = time.perf_counter_ns()
+    for i in range(iterations):
+        charge(users[i % 1000], 1)
+    results["charge_us"] = round((time.perf_counter_ns() - start) / iterations / 1000, 3)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLMのレート制限・予算判定のマイクロベンチマーク")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    for name in check_behavior():
+        print(f"ok  {name}")
+    results = time_acquire(args.iterations)
+    for name, value in results.items():
+        print(f"{name:>12}: {value:.3f} µs")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# bench/payload_bench.py
+"""
+ページごとのレスポンスペイロード量ベンチマーク
+列の絞り込み（select "*" や マスタ結合の廃止）前後で、
+各ページのクエリが返すバイト数とJSONデコード時間を比較する
+
+使い方（リポジトリのルートで実行）:
+    python bench/payload_bench.py --history-days 365 --logs-per-day 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+os.environ["SUPABASE_BACKEND"] = "local"
+
+from funnel_bench import BENCH_USER_ID, seed_history  # noqa: E402
+from utils import tracing  # noqa: E402
+from utils.local_backend import LocalSupabaseClient  # noqa: E402
+
+
+def measure(client, fn: Callable[[Any], Any], repeat: int) -> Dict[str, float]:
+    """関数が発行したクエリのレスポンス合計バイト数とJSONデコード時間"""
+    trace = tracing.start_rerun("payload_bench", "payload_bench")
+    fn(client)
+    total_bytes = sum(s.attributes.get("response.bytes", 0) for s in trace.spans)
+    queries = len(trace.spans)
+
+    # PostgRESTのレスポンス本文をデコードする時間を再現
+    payloads = []
+    trace = tracing.start_rerun("payload_bench", "payload_bench")
+    fn(client)
+    for s in trace.spans:
+        payloads.append(s.attributes.get("_payload", "[]"))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for p in payloads:
+            json.loads(p)
+    decode_ms = (time.perf_counter() - start) * 1000 / repeat
+    tracing.finish_rerun("payload_bench")
+    return {"queries": queries, "bytes": total_bytes, "decode_ms": round(decode_ms, 3)}
+
+
+def keep_payload(client):
+    """spanにレスポンス本文を残すラッパー（デコード時間の計測用）"""
+    class Capturing(tracing.TracedQuery):
+        def execute(self):
+            response = super().execute()
+            trace = tracing.current_trace()
+            if trace is not None and trace.spans:
+                trace.spans[-1].attributes["_payload"] = json.dumps(response.data, ensure_ascii=False, default=str)
+            return response
+
+    class CapturingClient(tracing.TracedClient):
+        def table(self, name):
+            return Capturing(self._client.table(name), name)
+
+    return CapturingClient(client)
+
+
+# =========================
+# 変更前のクエリ形（比較用に固定）
+# =========================
+
+def before_select_page(c):
+    c.table("situation_master").select("*").order("id").execute()
+    c.table("onomatopoeia_master").select("*").order("id").execute()
+    c.table("cat_master").select("*").eq("onomatopoeia_id", 1).execute()
+
+
+def before_register(c):
+    c.table("weekly_points").select("*").eq("user_id", BENCH_USER_ID).execute()
+
+
+def before_home_history(c):
+    c.table("feeding_event_log").select("feed_at, feed_id, feed_master(feed_name, feed_point)").eq("user_id", BENCH_USER_ID).gte("feed_id", 2).order("feed_at", desc=True).limit(3).execute()
+
+
+def before_feedback(c):
+    c.table("mood_register_log").select(
+        "id, created_at, situation_master(situation), onomatopoeia_master(onomatopoeia), cat_master(cat_name), points_earned"
+    ).eq("user_id", BENCH_USER_ID).gte("created_at", "1970-01-01").execute()
+
+
+# =========================
+# 変更後（services.py の実装を呼ぶ）
+# =========================
+
+def after_select_page(c):
+    from utils.services import get_all_situations, get_all_onomatopoeia, get_cat_by_onomatopoeia_id
+    get_all_situations(c)
+    get_all_onomatopoeia(c)
+    get_cat_by_onomatopoeia_id(c, 1)
+
+
+def after_register(c):
+    c.table("weekly_points").select("id, total_points").eq("user_id", BENCH_USER_ID).execute()
+
+
+def after_home_history(c):
+    from utils.services import get_feeding_history
+    get_feeding_history(c, BENCH_USER_ID, limit=3)
+
+
+def after_feedback(c):
+    c.table("mood_register_log").select(
+        "id, created_at, situation_id, onomatopoeia_id, cat_id, points_earned"
+    ).eq("user_id", BENCH_USER_ID).gte("created_at", "1970-01-01").execute()
+
+
+def after_master_index(c):
+    from utils.services import _load_master_index
+    _load_master_index.clear()
+    _load_master_index(c)
+
+
+PAGES: List[tuple] = [
+    ("1_select", before_select_page, after_select_page),
+    ("2_suggest(register)", before_register, after_register),
+    ("main(feeding history)", before_home_history, after_home_history),
+    ("4_feedback", before_feedback, after_feedback),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ページごとのペイロード量ベンチマーク")
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--logs-per-day", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    raw = LocalSupabaseClient()
+    seed_history(raw, BENCH_USER_ID, args.history_days, args.logs_per_day, random.Random(args.seed))
+    raw.table("weekly_points").insert({"user_id": BENCH_USER_ID, "week_start_date": "2026-01-05", "total_points": 40}).execute()
+    raw.table("feeding_event_log").insert([{"user_id": BENCH_USER_ID, "feed_id": f} for f in (2, 3, 4)]).execute()
+    client = keep_payload(raw)
+
+    # マスタインデックスは1時間キャッシュされるので先に温めておく
+    after_master_index(client)
+
+    print(f"{'page':<24}{'before(B)':>12}{'after(B)':>12}{'ratio':>8}{'decode before(ms)':>20}{'after(ms)':>12}")
+    results = {}
+    for name, before, after in PAGES:
+        b = measure(client, before, args.repeat)
+        a = measure(client, after, args.repeat)
+        ratio = a["bytes"] / b["bytes"] if b["bytes"] else 0.0
+        results[name] = {"before": b, "after": a}
+        print(f"{name:<24}{b['bytes']:>12}{a['bytes']:>12}{ratio:>8.2f}{b['decode_ms']:>20.3f}{a['decode_ms']:>12.3f}")
+
+    idx = measure(client, after_master_index, args.repeat)
+    print(f"\nmaster index (1h cache, per process): {idx['bytes']}B in {idx['queries']} queries")
+
+
+if __name__ == "__main__":
+    main()
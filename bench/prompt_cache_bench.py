@@ -0,0 +1,109 @@
+# bench/prompt_cache_bench.py
+"""
+プロンプトの並び順によるプロンプトキャッシュ率の比較
+LLM fake（PrefixCacheEmulator でプロバイダの前方一致キャッシュを再現）に対して
+同じリクエスト列を2通りのレイアウトで送り、usage の cached_tokens / prompt_tokens を比べる
+
+    legacy   : 以前の get_system_prompt（キャラ紹介の直後にシーン・季節、その後に共通ルール）
+    registry : utils/prompts.py（共通ルール → キャラクター → 入力は最後のユーザーメッセージ）
+
+使い方（リポジトリのルートで実行）:
+    python bench/prompt_cache_bench.py --requests 500
+    python bench/prompt_cache_bench.py --min-tokens 256   # キャッシュの最小長を変えて比較
+
+注意: OpenAIのプロンプトキャッシュは 1024 トークン以上の接頭辞から効く
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+SITUATIONS = ["会議前", "締め切り直前", "朝イチ", "昼食後", "夕方", "その他"]
+SEASONS = ["春", "夏", "秋", "冬"]
+
+
+def legacy_messages(kind: str, character_name: str, profile: dict, onomatopoeia: str, situation: str, season: str) -> List[Dict[str, str]]:
+    """以前のレイアウト（可変部分がシステムプロンプトの先頭付近に入る）を再現"""
+    from utils.prompts import TEMPLATES
+
+    rules, character, user = TEMPLATES[kind]
+    identity = character.format(
+        character_name=character_name,
+        specialty=profile["specialty"],
+        rhythm_focus=profile["rhythm_focus"],
+        food_focus=profile["food_focus"],
+        tone=profile["tone"],
+        catchphrase=profile["catchphrase"],
+    )
+    head, _, tail = identity.strip().partition("\n\nあなたの特徴:")
+    system = f"{head}\n\n現在のシーン: {situation}\n現在の季節: {season}\n\nあなたの特徴:{tail}\n\n{rules}"
+    # 以前のユーザーメッセージは入力値が先頭
+    lines = user.splitlines()
+    user_legacy = "\n".join([lines[0], *lines[3:], *lines[1:3]]).format(onomatopoeia=onomatopoeia, situation=situation, season=season)
+    return [{"role": "system", "content": system}, {"role": "user", "content": user_legacy}]
+
+
+def run(layout: str, workload: List[tuple], min_tokens: int) -> Dict[str, float]:
+    from utils.character_profiles import CHARACTER_PROFILES
+    from utils.llm import create_chat_completion, get_llm_usage, reset_llm_client
+    from utils.llm_fake import FakeLLM, FakeOpenAI
+    from utils.prompts import get_prompt
+    from utils import llm
+
+    reset_llm_client()
+    llm._client = FakeOpenAI(FakeLLM(cache_min_tokens=min_tokens))
+    before = get_llm_usage()
+
+    for kind, onomatopoeia, character_name, situation, season in workload:
+        if layout == "registry":
+            prompt = get_prompt(kind, character_name)
+            create_chat_completion(prompt.messages(onomatopoeia, situation, season), prompt_cache_key=prompt.cache_key)
+        else:
+            create_chat_completion(legacy_messages(kind, character_name, CHARACTER_PROFILES[character_name], onomatopoeia, situation, season))
+
+    after = get_llm_usage()
+    prompt_tokens = after["prompt_tokens"] - before["prompt_tokens"]
+    cached_tokens = after["cached_tokens"] - before["cached_tokens"]
+    return {
+        "requests": len(workload),
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "cached_ratio": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="プロンプトキャッシュ率の比較")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--min-tokens", type=int, nargs="+", default=[1024, 256])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["LLM_BACKEND"] = "fake"
+    # 計測中はレート制限・予算で呼び出しが止まらないようにする
+    os.environ.setdefault("LLM_LIMITS", "0")
+    from utils.character_profiles import CHARACTER_MAPPING
+
+    rng = random.Random(args.seed)
+    workload = []
+    for _ in range(args.requests):
+        onomatopoeia = rng.choice(list(CHARACTER_MAPPING))
+        character_name = rng.choice(CHARACTER_MAPPING[onomatopoeia])
+        workload.append((rng.choice(["rhythm", "meal"]), onomatopoeia, character_name, rng.choice(SITUATIONS), rng.choice(SEASONS)))
+
+    results = {}
+    for min_tokens in args.min_tokens:
+        for layout in ("legacy", "registry"):
+            results[f"{layout}@{min_tokens}"] = result = run(layout, workload, min_tokens)
+            print(f"{layout:>8} (min {min_tokens:>4} tokens): cached {result['cached_tokens']:>7} / {result['prompt_tokens']:>7} = {result['cached_ratio']:.1%}")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
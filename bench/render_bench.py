@@ -0,0 +1,78 @@
+# bench/render_bench.py
+"""
+ページごとのHTML部品の組み立て時間のマイクロベンチマーク（utils/ui.py のレンダーキャッシュ）
+1回の rerun で各ページが組み立てるHTMLを、キャッシュなし（毎回 f-string）と
+キャッシュあり（lru_cache / import 時に組み立て済み）で比べる
+
+    main       : 餌の種類プレビュー 4枚
+    suggest    : 「今の気持ちは？」カード 3枚
+    complete   : 今回獲得ポイント + 次の目標 + 今週の餌 4枚
+
+使い方（リポジトリのルートで実行）:
+    python bench/render_bench.py --reruns 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+os.chdir(ROOT)  # constants が cat_icon.png を相対パスで読むため
+
+FOOD_TILES = [("カリカリ", 10, "😿"), ("ちゅ~る", 30, "😺"), ("サーモン", 60, "😸"), ("マグロ", 100, "😻")]
+
+
+def page_renderers(cached: bool) -> Dict[str, Callable[[int], int]]:
+    """ページ名 → (今週のポイント → 組み立てたHTMLの文字数)"""
+    from utils import ui
+    from utils.constants import AFTER_MOOD_CONFIG, FOOD_EMOJIS, FOOD_THRESHOLDS
+
+    tile = ui.food_tile_html if cached else ui.food_tile_html.__wrapped__
+    card = ui.food_card_html if cached else ui.food_card_html.__wrapped__
+    earned = ui.points_earned_html if cached else ui.points_earned_html.__wrapped__
+    goal = ui.next_goal_html if cached else ui.next_goal_html.__wrapped__
+
+    def main(week_points: int) -> int:
+        return sum(len(tile(name, threshold, emoji, week_points >= threshold, name == "ちゅ~る")) for name, threshold, emoji in FOOD_TILES)
+
+    def suggest(week_points: int) -> int:
+        if cached:
+            return sum(len(ui.AFTER_MOOD_CARDS_HTML[i]) for i in AFTER_MOOD_CONFIG)
+        return sum(len(ui._after_mood_card_html(config)) for config in AFTER_MOOD_CONFIG.values())
+
+    def complete(week_points: int) -> int:
+        size = len(earned(10, "だいじょうぶにゃん")) + len(goal(max(60 - week_points, 0), "サーモン"))
+        for name, threshold in FOOD_THRESHOLDS.items():
+            size += len(card(name, threshold, FOOD_EMOJIS[name], week_points >= threshold, name == "ちゅ〜る"))
+        return size
+
+    return {"main": main, "suggest": suggest, "complete": complete}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTML部品の組み立て時間のマイクロベンチマーク")
+    parser.add_argument("--reruns", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {}
+    for cached in (False, True):
+        label = "cached" if cached else "inline"
+        for page, render in page_renderers(cached).items():
+            # ポイントは数通りに限られる（同じユーザーの rerun を想定）
+            start = time.perf_counter_ns()
+            for i in range(args.reruns):
+                render(35 + i % 3)
+            per_rerun_us = (time.perf_counter_ns() - start) / args.reruns / 1000
+            results.setdefault(page, {})[f"{label}_us"] = round(per_rerun_us, 3)
+
+    for page, timing in results.items():
+        timing["speedup"] = round(timing["inline_us"] / timing["cached_us"], 1) if timing["cached_us"] else None
+        print(f"{page:>9}: inline {timing['inline_us']:>7.3f} µs  cached {timing['cached_us']:>7.3f} µs  (x{timing['speedup']})")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# bench/session_store_bench.py
+"""
+気分登録の流れを何周もしたときのセッションの大きさ（utils/session_store.py）
+1セッションで --rounds 周（選択 → 提案2件 → 登録 → ホームへ）したときの
+st.session_state 相当の辞書の大きさを、以前の持ち方と比べる
+
+    before : 提案を組み合わせごとの別キーに置き、ホームへ戻るときは決まったキーだけ消す
+    after  : SessionStore（直近の提案だけのLRU）+ end_funnel
+
+使い方（リポジトリのルートで実行）:
+    python bench/session_store_bench.py --rounds 200
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+OLD_KEYS_TO_CLEAR = [
+    "selected_onomatopoeia_id",
+    "selected_onomatopoeia",
+    "selected_cat_id",
+    "selected_cat_name",
+    "selected_cat_trait",
+    "selected_character",
+    "points_earned",
+    "after_mood_label",
+]
+
+
+def fake_suggestion(kind: str, rng: random.Random) -> dict:
+    """生成結果と同じくらいの大きさの提案"""
+    if kind == "rhythm":
+        return {"title": "深呼吸" * 3, "steps": ["ゆっくり吸う" * 4 for _ in range(3)], "one_liner_after": "おつかれ" * 3, "cat_ritual": "のびをする" * 5}
+    return {
+        "empathy": "わかるよ" * 5,
+        "human": {"menu": "おにぎり" * 2, "ingredients": ["ごはん" * 2 for _ in range(4)], "steps": ["にぎる" * 5 for _ in range(3)]},
+        "cat": {"menu": "ささみ", "message": "にゃー" * 6},
+        "seed": rng.random(),
+    }
+
+
+def run(mode: str, rounds: int, seed: int) -> List[int]:
+    from utils.character_profiles import CHARACTER_MAPPING
+    from utils.prompts import suggestion_cache_key
+    from utils.session_store import MoodResult, end_funnel, get_session_store
+
+    rng = random.Random(seed)
+    session: Dict[str, object] = {}
+    onomatopoeias = list(CHARACTER_MAPPING)
+    sizes = []
+    for _ in range(rounds):
+        onomatopoeia = rng.choice(onomatopoeias)
+        character_name = rng.choice(CHARACTER_MAPPING[onomatopoeia])
+        situation = rng.choice(["朝イチ", "会議前", "昼食後", "夕方"])
+        session.update({
+            "selected_onomatopoeia_id": 1,
+            "selected_onomatopoeia": onomatopoeia,
+            "selected_cat_id": 1,
+            "selected_cat_name": "にゃん",
+            "selected_cat_trait": "のんびり",
+            "selected_character": {"onomatopoeia": onomatopoeia, "situation_id": 3, "name": character_name},
+        })
+        if mode == "before":
+            for kind in ("rhythm", "meal"):
+                session[suggestion_cache_key(kind, onomatopoeia, character_name, situation, "秋")] = fake_suggestion(kind, rng)
+            session["points_earned"] = 10
+            session["after_mood_label"] = "まあまあ"
+            sizes.append(len(pickle.dumps(session)))
+            for key in OLD_KEYS_TO_CLEAR:
+                session.pop(key, None)
+        else:
+            store = get_session_store(session)
+            for kind in ("rhythm", "meal"):
+                store.remember_suggestion(kind, onomatopoeia, character_name, situation, "秋", fake_suggestion(kind, rng))
+            store.result = MoodResult(10, "まあまあ")
+            sizes.append(len(pickle.dumps(session)))
+            end_funnel(session)
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="流れを何周もしたときのセッションの大きさ")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("before", "after"):
+        sizes = run(mode, args.rounds, args.seed)
+        checkpoints = {str(n): sizes[n - 1] for n in (1, 10, 50, args.rounds) if n <= len(sizes)}
+        results[mode] = checkpoints
+        print(f"{mode:>6}: " + "  ".join(f"{n}周目 {size:>7,}B" for n, size in checkpoints.items()))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# bench/shared_cache_bench.py
+"""
+複数ワーカー構成での共有キャッシュ（utils/shared_cache.py）のヒット率の計測
+同じリクエスト列を --workers 個のプロセスに振り分けて流し、
+LLM呼び出し回数・マスタ読み込み回数・振り返りレポートの生成回数を比べる
+
+    per-process : これまで通りプロセス内のキャッシュだけ（SHARED_CACHE_PATH なし）
+    shared      : 全ワーカーで1つの共有キャッシュファイルを使う
+
+各ワーカーは起動直後の状態（st.cache_data が空）から始め、
+    - マスタ4表の読み込み（services._load_master_index と同じ読み方）
+    - 朝イチの提案生成（リズムリセット + 食事提案）
+    - 振り返りレポート（ユーザーごと。プロセス内の辞書を st.cache_data の代わりにする）
+を処理する
+
+使い方（リポジトリのルートで実行）:
+    python bench/shared_cache_bench.py --workers 1 2 4 8 --sessions 400 --llm-latency-ms 200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+MASTER_TABLES = {
+    "situation": ("situation_master", "id, situation"),
+    "onomatopoeia": ("onomatopoeia_master", "id, onomatopoeia, polarity"),
+    "cat": ("cat_master", "id, cat_name"),
+    "feed": ("feed_master", "id, feed_name, feed_point"),
+}
+
+
+def build_workload(sessions: int, users: int, seed: int) -> List[tuple]:
+    """朝イチのセッション列（オノマトペは人気に偏りを持たせ、1割は振り返りも開く）"""
+    from utils.character_profiles import CHARACTER_MAPPING
+
+    rng = random.Random(seed)
+    onomatopoeias = list(CHARACTER_MAPPING)
+    weights = [1 / (rank + 1) for rank in range(len(onomatopoeias))]
+    workload = []
+    for _ in range(sessions):
+        onomatopoeia = rng.choices(onomatopoeias, weights)[0]
+        character_name = rng.choice(CHARACTER_MAPPING[onomatopoeia])
+        feedback_user = f"user-{rng.randrange(users)}" if rng.random() < 0.1 else None
+        workload.append((onomatopoeia, character_name, "朝イチ", "秋", feedback_user))
+    return workload
+
+
+def worker(items: List[tuple], shared_path: Optional[str], latency_ms: float, pool_size: int, concurrency: int, seed: int, results) -> None:
+    """1ワーカー分のリクエストを処理し、回数を results に入れる"""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_LIMITS"] = "0"
+    os.environ["LLM_VARIANT_POOL_SIZE"] = str(pool_size)
+    os.environ["SUPABASE_BACKEND"] = "local"
+    if shared_path:
+        os.environ["SHARED_CACHE_PATH"] = shared_path
+    else:
+        os.environ.pop("SHARED_CACHE_PATH", None)
+
+    from utils import llm
+    from utils.character_profiles import CHARACTER_PROFILES
+    from utils.llm_fake import FakeLLM, FakeOpenAI
+    from utils.local_backend import get_local_client
+    from utils.meal_suggest import generate_meal_suggestion
+    from utils.rhythm_reset import generate_rhythm_reset
+    from utils.shared_cache import get_shared_cache
+
+    llm._client = FakeOpenAI(FakeLLM(latency_ms=latency_ms, latency_dist="lognormal", jitter=0.3, seed=seed))
+    supabase = get_local_client()
+    shared = get_shared_cache()
+    counts = {"master_reads": 0, "feedback_requests": 0, "feedback_generations": 0}
+
+    # マスタ（services._load_master_index と同じ。プロセスごとに1回）
+    for table, columns in MASTER_TABLES.values():
+        def load(table=table, columns=columns) -> list:
+            counts["master_reads"] += 1
+            return supabase.table(table).select(columns).execute().data or []
+        if shared is not None:
+            shared.get_or_compute("master", table, 3600, load)
+        else:
+            load()
+
+    # 振り返りレポート（st.cache_data の代わりのプロセス内辞書 → 共有キャッシュ → 生成）
+    local_reports: Dict[str, str] = {}
+
+    def feedback(user_id: str) -> str:
+        counts["feedback_requests"] += 1
+        if user_id in local_reports:
+            return local_reports[user_id]
+
+        def generate() -> str:
+            counts["feedback_generations"] += 1
+            return llm.complete_text([{"role": "user", "content": f"振り返り {user_id}"}], user_id=user_id) or ""
+
+        report = shared.get_or_compute("feedback", user_id, 3600, generate) if shared is not None else generate()
+        local_reports[user_id] = report
+        return report
+
+    def session(item: tuple) -> None:
+        onomatopoeia, character_name, situation, season, feedback_user = item
+        profile = CHARACTER_PROFILES[character_name]
+        generate_rhythm_reset(onomatopoeia, character_name, profile, situation, season)
+        generate_meal_suggestion(onomatopoeia, character_name, profile, situation, season)
+        if feedback_user:
+            feedback(feedback_user)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(session, items))
+
+    counts["llm_calls"] = llm.get_llm_call_count()
+    counts["sessions"] = len(items)
+    results.put(counts)
+
+
+def run(workload: List[tuple], workers: int, shared: bool, latency_ms: float, pool_size: int, concurrency: int) -> Dict[str, float]:
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    with tempfile.TemporaryDirectory() as tmp:
+        shared_path = os.path.join(tmp, "shared-cache.sqlite3") if shared else None
+        processes = [
+            ctx.Process(target=worker, args=(workload[i::workers], shared_path, latency_ms, pool_size, concurrency, i, results))
+            for i in range(workers)
+        ]
+        wall_start = time.perf_counter()
+        for p in processes:
+            p.start()
+        totals: Dict[str, int] = {}
+        for _ in processes:
+            for name, value in results.get().items():
+                totals[name] = totals.get(name, 0) + value
+        for p in processes:
+            p.join()
+        wall = time.perf_counter() - wall_start
+        size = os.path.getsize(shared_path) if shared_path and os.path.exists(shared_path) else 0
+
+    # 提案の生成は1セッション2回。振り返りの生成もLLM呼び出しに含まれる
+    suggestion_requests = totals["sessions"] * 2
+    suggestion_calls = totals["llm_calls"] - totals["feedback_generations"]
+    return {
+        "workers": workers,
+        "llm_calls": totals["llm_calls"],
+        "suggestion_hit_rate": round(1 - suggestion_calls / suggestion_requests, 3),
+        "master_reads": totals["master_reads"],
+        "master_hit_rate": round(1 - totals["master_reads"] / (len(MASTER_TABLES) * workers), 3),
+        "feedback_generations": totals["feedback_generations"],
+        "feedback_hit_rate": round(1 - totals["feedback_generations"] / max(totals["feedback_requests"], 1), 3),
+        "cache_file_bytes": size,
+        "wall_s": round(wall, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="複数ワーカー構成での共有キャッシュのヒット率")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--sessions", type=int, default=400)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8, help="1ワーカー内の同時セッション数")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--pool-size", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workload = build_workload(args.sessions, args.users, args.seed)
+    results = {}
+    for workers in args.workers:
+        for mode in ("per-process", "shared"):
+            result = run(workload, workers, mode == "shared", args.llm_latency_ms, args.pool_size, args.concurrency)
+            results[f"{mode}/{workers}"] = result
+            print(
+                f"{mode:>11} x{workers}: {result['llm_calls']:>4} LLM calls"
+                f"  suggest hit {result['suggestion_hit_rate']:.0%}"
+                f"  master reads {result['master_reads']:>2} (hit {result['master_hit_rate']:.0%})"
+                f"  feedback hit {result['feedback_hit_rate']:.0%}"
+                f"  {result['wall_s']:.2f}s"
+            )
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+-- supabase/migrations/20261019000000_hot_query_indexes.sql
+-- services.py のクエリ形に合わせた複合インデックスと一意制約
+--
+--   mood_register_log : user_id = ? AND created_at >= ? / < ?      （週・月・28日集計）
+--                       user_id = ? ORDER BY created_at DESC, id DESC （履歴のキーセットページング）
+--   weekly_points     : user_id = ? AND week_start_date = ?
+--   feeding_event_log : user_id = ? AND feed_at >= ?  /  ORDER BY feed_at DESC
+
+-- =========================
+-- mood_register_log
+-- =========================
+
+create index if not exists mood_register_log_user_created_idx
+    on public.mood_register_log (user_id, created_at desc, id desc);
+
+-- =========================
+-- weekly_points
+-- =========================
+
+-- 一意制約を張る前に、同じ週の重複行を1行にする（ポイントの多い行を残す）
+-- 消す行は weekly_points_duplicates に退避しておき、必要なら手で突き合わせる
+create table if not exists public.weekly_points_duplicates (
+    like public.weekly_points,
+    kept_id    bigint      not null,
+    removed_at timestamptz not null default now()
+);
+
+alter table public.weekly_points_duplicates enable row level security;
+
+with ranked as (
+    select id,
+           first_value(id) over w as kept_id,
+           row_number() over w as rn
+    from public.weekly_points
+    window w as (
+        partition by user_id, week_start_date
+        order by total_points desc, id asc
+    )
+),
+removed as (
+    delete from public.weekly_points p
+    using ranked r
+    where p.id = r.id
+      and r.rn > 1
+    returning p.*, r.kept_id
+)
+insert into public.weekly_points_duplicates
+select * from removed;
+
+-- 再実行しても失敗しないよう、一意インデックスを作ってから未登録のときだけ制約にする
+create unique index if not exists weekly_points_user_week_key
+    on public.weekly_points (user_id, week_start_date);
+
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conrelid = 'public.weekly_points'::regclass
+          and conname = 'weekly_points_user_week_key'
+    ) then
+        alter table public.weekly_points
+            add constraint weekly_points_user_week_key unique using index weekly_points_user_week_key;
+    end if;
+end;
+$$;
+
+-- =========================
+-- feeding_event_log
+-- =========================
+
+create index if not exists feeding_event_log_user_feed_at_idx
+    on public.feeding_event_log (user_id, feed_at desc, feed_id);
+
+-- =========================
+-- マスタ
+-- =========================
+
+create index if not exists cat_master_onomatopoeia_idx
+    on public.cat_master (onomatopoeia_id);
@@ -0,0 +1,12 @@
+-- supabase/migrations/20261019020000_mood_register_log_client_event_id.sql
+-- 気分登録の書き込みキュー（app/utils/mood_outbox.py）用の冪等キー
+-- クライアントが登録時に決めた client_event_id と created_at で一意にし、
+-- 再送された行は on conflict do nothing で捨てる
+-- （supabase/runbooks/partition_mood_register_log.sql でパーティション化したときも使えるよう、
+--   パーティションキー created_at を含めておく）
+
+alter table public.mood_register_log
+    add column if not exists client_event_id uuid;
+
+create unique index if not exists mood_register_log_client_event_key
+    on public.mood_register_log (client_event_id, created_at);
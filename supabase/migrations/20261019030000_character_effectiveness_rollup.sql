@@ -0,0 +1,90 @@
+-- supabase/migrations/20261019030000_character_effectiveness_rollup.sql
+-- キャラクター選択（app/utils/character_selector.py）用の効果集計
+--
+-- (オノマトペ, シーン, キャラクター) ごとの試行数と成功数（after_mood_id >= 2）を持つ小さな表。
+-- アプリはこれをまとめて読み込んでメモリ上の索引にし、選択のたびにDBを引かない。
+-- 全ユーザー横断の集計値だけなので、ログイン済みユーザーなら誰でも読める。
+
+create table if not exists public.character_effectiveness_rollup (
+    onomatopoeia_id bigint not null,
+    situation_id    bigint not null default 0,  -- 0 = シーン未設定
+    character_name  text   not null,
+    trials          bigint not null default 0,
+    successes       bigint not null default 0,
+    refreshed_at    timestamptz not null default now(),
+    primary key (onomatopoeia_id, situation_id, character_name)
+);
+
+alter table public.character_effectiveness_rollup enable row level security;
+
+create policy "character_effectiveness_rollup_select_authenticated" on public.character_effectiveness_rollup
+    for select to authenticated using (true);
+
+-- 直近 window_days 日の mood_register_log と、アーカイブ済みの月次集計から作り直す
+create or replace function public.refresh_character_effectiveness_rollup(window_days integer default 365)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    since     timestamptz := now() - make_interval(days => window_days);
+    refreshed integer;
+begin
+    delete from public.character_effectiveness_rollup;
+
+    insert into public.character_effectiveness_rollup
+        (onomatopoeia_id, situation_id, character_name, trials, successes, refreshed_at)
+    select onomatopoeia_id, situation_id, character_name, sum(trials), sum(successes), now()
+    from (
+        select onomatopoeia_id,
+               coalesce(situation_id, 0) as situation_id,
+               character_name,
+               count(*) as trials,
+               count(*) filter (where after_mood_id >= 2) as successes
+        from public.mood_register_log
+        where created_at >= since
+          and onomatopoeia_id is not null
+          and character_name is not null
+        group by 1, 2, 3
+
+        union all
+
+        select onomatopoeia_id,
+               situation_id,
+               character_name,
+               sum(records),
+               coalesce(sum(records) filter (where after_mood_id >= 2), 0)
+        from public.mood_register_log_monthly_summary
+        where month_start >= date_trunc('month', since)::date
+          and onomatopoeia_id <> 0
+          and character_name <> ''
+        group by 1, 2, 3
+    ) s
+    group by 1, 2, 3;
+
+    get diagnostics refreshed = row_count;
+    return refreshed;
+end;
+$$;
+
+revoke all on function public.refresh_character_effectiveness_rollup(integer) from public;
+grant execute on function public.refresh_character_effectiveness_rollup(integer) to service_role;
+
+select public.refresh_character_effectiveness_rollup();
+
+-- =========================
+-- 定期実行（pg_cron が有効な場合のみ）
+-- =========================
+
+do $$
+begin
+    if exists (select 1 from pg_extension where extname = 'pg_cron') then
+        perform cron.schedule(
+            'character-effectiveness-rollup',
+            '*/15 * * * *',
+            'select public.refresh_character_effectiveness_rollup(365)'
+        );
+    end if;
+end;
+$$;
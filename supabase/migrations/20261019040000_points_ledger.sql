@@ -0,0 +1,237 @@
+-- supabase/migrations/20261019040000_points_ledger.sql
+-- ポイント台帳（app/utils/points_ledger.py）
+--
+-- weekly_points.total_points を複数の場所で読み書きする代わりに、獲得・消費を追記だけの台帳に記録する。
+--   points_ledger          : 1行 = (ユーザー, 週, 増減)。獲得は正、餌やりでの消費は負
+--                            (source, source_id) で一意にし、再送は on conflict do nothing で捨てる
+--   points_ledger_snapshot : (ユーザー, 週) ごとの「last_entry_id までの合計」
+--                            残高 = スナップショット + last_entry_id より後のエントリ
+-- weekly_points はこのマイグレーション以降アプリから書き込まない（移行前の残高の出どころとしてだけ残す）
+
+-- =========================
+-- 1. 台帳とスナップショット
+-- =========================
+
+create table if not exists public.points_ledger (
+    id              bigint generated always as identity primary key,
+    user_id         uuid    not null,
+    week_start_date date    not null,
+    delta           integer not null,
+    source          text    not null,   -- mood / feed / adjust
+    source_id       text    not null,
+    created_at      timestamptz not null default now()
+);
+
+create unique index if not exists points_ledger_source_key
+    on public.points_ledger (source, source_id);
+create index if not exists points_ledger_user_week_idx
+    on public.points_ledger (user_id, week_start_date, id);
+
+create table if not exists public.points_ledger_snapshot (
+    user_id         uuid    not null,
+    week_start_date date    not null,
+    balance         integer not null default 0,
+    last_entry_id   bigint  not null default 0,
+    updated_at      timestamptz not null default now(),
+    primary key (user_id, week_start_date)
+);
+
+-- =========================
+-- 2. 行レベルセキュリティ
+-- =========================
+-- 台帳は読み取りと追記だけ（更新・削除のポリシーは作らない）
+-- クライアントから追記できるのは、自分の気分登録と同じポイント・週の獲得エントリだけ
+-- （消費は下の feed_weekly_event()、調整は service_role のツールだけが書く）
+
+alter table public.points_ledger enable row level security;
+
+create policy "points_ledger_select_own" on public.points_ledger
+    for select using (auth.uid() = user_id);
+create policy "points_ledger_insert_own_mood" on public.points_ledger
+    for insert with check (
+        auth.uid() = user_id
+        and source = 'mood'
+        and exists (
+            select 1
+            from public.mood_register_log m
+            where m.user_id = auth.uid()
+              and m.client_event_id::text = points_ledger.source_id
+              and m.points_earned = points_ledger.delta
+              and date_trunc('week', m.created_at at time zone 'Asia/Tokyo')::date = points_ledger.week_start_date
+        )
+    );
+
+-- スナップショットはクライアントからは読むだけ（書き込みは下の advance_points_snapshot() とジョブ）
+alter table public.points_ledger_snapshot enable row level security;
+
+create policy "points_ledger_snapshot_select_own" on public.points_ledger_snapshot
+    for select using (auth.uid() = user_id);
+
+-- スナップショットを進める（残高の読み取りでテールが長くなったときに呼ぶ）
+-- 値はクライアントから受け取らず台帳から計算する。
+-- 採番順とコミット順が入れ替わっても取りこぼさないよう、直近60秒のエントリの手前までを畳み込む
+create or replace function public.advance_points_snapshot(p_week_start date)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    uid         uuid := auth.uid();
+    base        integer;
+    last_id     bigint;
+    cutoff      bigint;
+    added       integer;
+    new_last_id bigint;
+begin
+    if uid is null then
+        raise exception 'not_authenticated' using errcode = '28000';
+    end if;
+
+    select balance, last_entry_id into base, last_id
+    from public.points_ledger_snapshot
+    where user_id = uid and week_start_date = p_week_start;
+    base := coalesce(base, 0);
+    last_id := coalesce(last_id, 0);
+
+    select min(id) into cutoff
+    from public.points_ledger
+    where user_id = uid and week_start_date = p_week_start and id > last_id
+      and created_at >= now() - interval '60 seconds';
+
+    select sum(delta), max(id) into added, new_last_id
+    from public.points_ledger
+    where user_id = uid and week_start_date = p_week_start and id > last_id
+      and id < coalesce(cutoff, 9223372036854775807);
+
+    if new_last_id is null then
+        return base;
+    end if;
+
+    -- 読んでから書くまでに他の呼び出しが進めていたら何もしない
+    insert into public.points_ledger_snapshot (user_id, week_start_date, balance, last_entry_id, updated_at)
+    values (uid, p_week_start, base + added, new_last_id, now())
+    on conflict (user_id, week_start_date) do update
+        set balance = excluded.balance,
+            last_entry_id = excluded.last_entry_id,
+            updated_at = excluded.updated_at
+        where points_ledger_snapshot.last_entry_id = last_id;
+
+    return base + added;
+end;
+$$;
+
+revoke all on function public.advance_points_snapshot(date) from public;
+grant execute on function public.advance_points_snapshot(date) to authenticated;
+
+-- =========================
+-- 3. 週次の餌やり（残高の確認・消費・餌やりの記録を1トランザクションで）
+-- =========================
+-- 餌やりは先週分の残高から差し引く。必要ポイントは feed_master から読む（クライアントから受け取らない）
+-- p_request_id はクライアントがボタンを押した1回ごとに作る冪等キー（消費エントリのキーになる）
+-- 同じキーの再送では二重に消費しない。同じ週に同じ餌を何度あげても、押すたびに別のキーになる
+-- 戻り値は餌やり後の残高（再送のときは今の残高）
+
+create or replace function public.feed_weekly_event(p_feed_id integer, p_request_id uuid)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    uid        uuid := auth.uid();
+    this_week  date := date_trunc('week', now() at time zone 'Asia/Tokyo')::date;
+    spend_week date := this_week - 7;
+    cost       integer;
+    spend_key  text;
+    balance    integer;
+begin
+    if uid is null then
+        raise exception 'not_authenticated' using errcode = '28000';
+    end if;
+    if p_request_id is null then
+        raise exception 'missing_request_id' using errcode = '22023';
+    end if;
+
+    select feed_point into cost from public.feed_master where id = p_feed_id;
+    if cost is null then
+        raise exception 'unknown_feed: %', p_feed_id using errcode = '22023';
+    end if;
+
+    -- 同じユーザーの餌やりは1つずつ処理する（確認から追記までの間に割り込ませない）
+    perform pg_advisory_xact_lock(hashtextextended('points_ledger:' || uid::text, 0));
+
+    select coalesce(s.balance, 0) + coalesce((
+               select sum(l.delta)
+               from public.points_ledger l
+               where l.user_id = uid and l.week_start_date = spend_week and l.id > coalesce(s.last_entry_id, 0)
+           ), 0)
+    into balance
+    from (select 1) one
+    left join public.points_ledger_snapshot s
+        on s.user_id = uid and s.week_start_date = spend_week;
+
+    -- キーはクライアントが決めるので、ユーザーIDを前に付けて他のユーザーのキーとぶつからないようにする
+    spend_key := 'weekly_feed:' || uid::text || ':' || p_request_id::text;
+    if exists (select 1 from public.points_ledger where source = 'feed' and source_id = spend_key) then
+        return balance;
+    end if;
+
+    if balance < cost then
+        raise exception 'insufficient_points: balance %, required %', balance, cost using errcode = 'P0001';
+    end if;
+
+    insert into public.points_ledger (user_id, week_start_date, delta, source, source_id)
+    values (uid, spend_week, -cost, 'feed', spend_key);
+    insert into public.feeding_event_log (user_id, feed_id, feed_at)
+    values (uid, p_feed_id, now());
+
+    return balance - cost;
+end;
+$$;
+
+revoke all on function public.feed_weekly_event(integer, uuid) from public;
+grant execute on function public.feed_weekly_event(integer, uuid) to authenticated;
+
+-- =========================
+-- 4. 既存データの移行
+-- =========================
+
+-- 獲得: 気分登録1件 = 1エントリ（冪等キーのない古い行は id をキーにする）
+insert into public.points_ledger (user_id, week_start_date, delta, source, source_id, created_at)
+select user_id,
+       date_trunc('week', created_at at time zone 'Asia/Tokyo')::date,
+       points_earned,
+       'mood',
+       coalesce(client_event_id::text, 'mood_register_log:' || id),
+       created_at
+from public.mood_register_log
+where points_earned <> 0
+on conflict (source, source_id) do nothing;
+
+-- 消費などの差分: weekly_points の残高と獲得の合計の差を週ごとの調整エントリにする
+insert into public.points_ledger (user_id, week_start_date, delta, source, source_id)
+select w.user_id,
+       w.week_start_date,
+       w.total_points - coalesce(e.earned, 0),
+       'adjust',
+       'weekly_points:' || w.id
+from public.weekly_points w
+left join (
+    select user_id, week_start_date, sum(delta) as earned
+    from public.points_ledger
+    where source = 'mood'
+    group by 1, 2
+) e using (user_id, week_start_date)
+where w.total_points <> coalesce(e.earned, 0)
+on conflict (source, source_id) do nothing;
+
+-- 移行した分をスナップショットに畳み込む
+insert into public.points_ledger_snapshot (user_id, week_start_date, balance, last_entry_id)
+select user_id, week_start_date, sum(delta), max(id)
+from public.points_ledger
+group by 1, 2
+on conflict (user_id, week_start_date) do update
+    set balance = excluded.balance,
+        last_entry_id = excluded.last_entry_id,
+        updated_at = now();
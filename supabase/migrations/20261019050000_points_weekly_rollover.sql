@@ -0,0 +1,74 @@
+-- supabase/migrations/20261019050000_points_weekly_rollover.sql
+-- 週の切り替えジョブ（ポイント台帳のスナップショットを全ユーザー分まとめて進める）
+--
+-- 以前はホーム画面を開くたびに initialize_weekly_points_if_needed と get_weekly_balance が
+-- 今週・先週の行を1ユーザーずつ作っていた。週1回このジョブで
+--   1. 餌やりの期間が終わった先々週と、獲得が締まった先週のスナップショットを台帳の合計で確定し
+--   2. その週に動きのあったユーザーの今週のスナップショットを作る
+-- ので、ページ表示ではスナップショットと短いテールを読むだけになる。
+-- 確定に含めるのは advance_points_snapshot と同じく、直近60秒に書かれた最初のエントリより前だけ。
+-- 月曜0:05は先週分の餌やりが始まり、日曜夜の気分登録の送信も続いている時間帯なので、
+-- 小さいidを取ったまま後からコミットされるエントリを last_entry_id の内側に取り残さない
+-- （除いた分はテールとして読まれ、次に advance_points_snapshot が畳み込む）。
+-- ローカルでは tools/points_rollover.py が同じ処理をSQLite版スタンドインに対して実行する。
+
+create or replace function public.rollover_points_week(target_week date default null)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    -- target_week = 今から始まる週（月曜）。省略時はJSTの今週
+    this_week date := coalesce(target_week, date_trunc('week', now() at time zone 'Asia/Tokyo')::date);
+    closed    integer;
+begin
+    insert into public.points_ledger_snapshot (user_id, week_start_date, balance, last_entry_id, updated_at)
+    select l.user_id, l.week_start_date, sum(l.delta), max(l.id), now()
+    from public.points_ledger l
+    left join (
+        select user_id, week_start_date, min(id) as first_recent_id
+        from public.points_ledger
+        where week_start_date in (this_week - 14, this_week - 7)
+          and created_at >= now() - interval '60 seconds'
+        group by user_id, week_start_date
+    ) r on r.user_id = l.user_id and r.week_start_date = l.week_start_date
+    where l.week_start_date in (this_week - 14, this_week - 7)
+      and l.id < coalesce(r.first_recent_id, 9223372036854775807)
+    group by l.user_id, l.week_start_date
+    on conflict (user_id, week_start_date) do update
+        set balance = excluded.balance,
+            last_entry_id = excluded.last_entry_id,
+            updated_at = excluded.updated_at;
+
+    get diagnostics closed = row_count;
+
+    insert into public.points_ledger_snapshot (user_id, week_start_date, balance, last_entry_id)
+    select distinct user_id, this_week, 0, 0
+    from public.points_ledger
+    where week_start_date = this_week - 7
+    on conflict (user_id, week_start_date) do nothing;
+
+    return closed;
+end;
+$$;
+
+revoke all on function public.rollover_points_week(date) from public;
+grant execute on function public.rollover_points_week(date) to service_role;
+
+-- =========================
+-- 定期実行（pg_cron が有効な場合のみ）
+-- =========================
+-- 月曜 0:05 JST（日曜 15:05 UTC）
+
+do $$
+begin
+    if exists (select 1 from pg_extension where extname = 'pg_cron') then
+        perform cron.schedule(
+            'points-weekly-rollover',
+            '5 15 * * 0',
+            'select public.rollover_points_week()'
+        );
+    end if;
+end;
+$$;
@@ -0,0 +1,346 @@
+-- supabase/runbooks/partition_mood_register_log.sql
+-- 手動の手順: mood_register_log を created_at の月（JST）単位でレンジパーティション化する
+--
+-- 週・月・28日の集計や履歴は常に created_at の範囲で読むので、
+-- パーティションプルーニングで直近のパーティションだけを走査するようになる。
+-- 古い月は archive_mood_register_log() で集計行にまとめてから切り離す。
+--
+-- 既存の表を作り直すので、マイグレーションの連番には含めずメンテナンス時間に手で流す:
+--   1. バックアップを取る（pg_dump -t public.mood_register_log ...）
+--   2. psql -v ON_ERROR_STOP=1 -f supabase/runbooks/partition_mood_register_log.sql
+--      全体が1トランザクション。前提と違えば何も変えずに止まる
+--   3. python tools/check_query_plans.py --dsn ... で、直近のパーティションだけを読むことを確認する
+--   4. 月次の保守を有効にする（pg_cron があれば下で登録される。なければ tools/mood_log_maintenance.py）
+--
+-- 前提（満たさなければ例外で止まる）:
+--   - public.mood_register_log が通常の表である（パーティション化済みでない）
+--   - mood_register_log を参照する外部キーがない（主キーが (id, created_at) になるため）
+--   - ユーザー定義のトリガーがない（作り直さないため）
+-- 引き継ぐもの:
+--   列・既定値・CHECK制約・コメント、identity / serial の採番、主キー以外のインデックス、
+--   RLS の有効化とポリシー（定義をそのまま複製）、表の権限、所有者
+-- パーティションは RLS を有効にして anon / authenticated の権限を外す（親表経由でだけ読ませる）
+
+begin;
+
+-- =========================
+-- 0. 前提の確認
+-- =========================
+
+do $$
+declare
+    rel     regclass := to_regclass('public.mood_register_log');
+    blocker text;
+begin
+    if rel is null then
+        raise exception 'public.mood_register_log がありません';
+    end if;
+    if (select relkind from pg_class where oid = rel) <> 'r' then
+        raise exception 'public.mood_register_log は通常の表ではありません（パーティション化済み？）';
+    end if;
+
+    select string_agg(format('%s.%s', conrelid::regclass, conname), ', ') into blocker
+    from pg_constraint
+    where contype = 'f' and confrelid = rel;
+    if blocker is not null then
+        raise exception 'mood_register_log を参照する外部キーがあります: %', blocker;
+    end if;
+
+    select string_agg(tgname, ', ') into blocker
+    from pg_trigger
+    where tgrelid = rel and not tgisinternal;
+    if blocker is not null then
+        raise exception 'mood_register_log にトリガーがあります（この手順では作り直しません）: %', blocker;
+    end if;
+end;
+$$;
+
+-- =========================
+-- 1. パーティション表の作成
+-- =========================
+
+alter table public.mood_register_log rename to mood_register_log_legacy;
+
+-- 主キー以外のインデックスの定義を控え、旧表の側を改名しておく（新しい表で同じ名前を使う）
+create temp table mood_register_log_index_defs on commit drop as
+select c.relname as name,
+       replace(pg_get_indexdef(i.indexrelid), ' ON public.mood_register_log_legacy ', ' ON public.mood_register_log ') as definition
+from pg_index i
+join pg_class c on c.oid = i.indexrelid
+where i.indrelid = 'public.mood_register_log_legacy'::regclass
+  and not i.indisprimary;
+
+do $$
+declare
+    idx record;
+begin
+    for idx in select name from mood_register_log_index_defs loop
+        execute format('alter index public.%I rename to %I', idx.name, left(idx.name, 56) || '_legacy');
+    end loop;
+end;
+$$;
+
+create table public.mood_register_log (
+    like public.mood_register_log_legacy
+        including defaults including identity including generated
+        including constraints including comments including storage
+) partition by range (created_at);
+
+-- パーティション表の主キーにはパーティションキーを含める必要がある
+alter table public.mood_register_log add primary key (id, created_at);
+
+-- =========================
+-- 2. 月次パーティションの自動作成（JSTの月初で区切る）
+-- =========================
+
+create or replace function public.ensure_mood_register_log_partitions(
+    months_ahead integer default 3,
+    from_month date default null
+)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    this_month  date := date_trunc('month', now() at time zone 'Asia/Tokyo')::date;
+    start_month date := date_trunc('month', coalesce(from_month, this_month))::date;
+    end_month   date := (this_month + make_interval(months => months_ahead))::date;
+    m           date;
+    part_name   text;
+    created     integer := 0;
+begin
+    m := start_month;
+    while m <= end_month loop
+        part_name := format('mood_register_log_y%sm%s', to_char(m, 'YYYY'), to_char(m, 'MM'));
+        if to_regclass('public.' || part_name) is null then
+            execute format(
+                'create table public.%I partition of public.mood_register_log for values from (%L) to (%L)',
+                part_name,
+                m::timestamp at time zone 'Asia/Tokyo',
+                (m + interval '1 month')::timestamp at time zone 'Asia/Tokyo'
+            );
+            -- パーティションを直接読ませない（RLSは親表のポリシーだけが効く）
+            execute format('alter table public.%I enable row level security', part_name);
+            execute format('revoke all on public.%I from anon, authenticated', part_name);
+            created := created + 1;
+        end if;
+        m := (m + interval '1 month')::date;
+    end loop;
+    return created;
+end;
+$$;
+
+-- 範囲外の行を取りこぼさないための受け皿（行が入っている月のパーティションは後から作れないので、
+-- ensure_mood_register_log_partitions で先の月まで作っておき、ここは空に保つ）
+create table public.mood_register_log_default
+    partition of public.mood_register_log default;
+alter table public.mood_register_log_default enable row level security;
+revoke all on public.mood_register_log_default from anon, authenticated;
+
+-- 既存データの最古月（JST）から3か月先まで作成
+select public.ensure_mood_register_log_partitions(
+    3,
+    (select min(created_at at time zone 'Asia/Tokyo')::date from public.mood_register_log_legacy)
+);
+
+-- =========================
+-- 3. データ移行と採番
+-- =========================
+
+do $$
+declare
+    cols            text;
+    legacy_identity char;
+    legacy_seq      text;
+    seq             text;
+begin
+    -- 生成列は移行先で計算し直すので除く。identity 列は元の値をそのまま入れる
+    select string_agg(quote_ident(attname), ', ' order by attnum) into cols
+    from pg_attribute
+    where attrelid = 'public.mood_register_log_legacy'::regclass
+      and attnum > 0 and not attisdropped and attgenerated = '';
+    execute format(
+        'insert into public.mood_register_log (%1$s) overriding system value select %1$s from public.mood_register_log_legacy',
+        cols
+    );
+
+    select attidentity into legacy_identity
+    from pg_attribute
+    where attrelid = 'public.mood_register_log_legacy'::regclass and attname = 'id';
+
+    -- serial の場合、新しい表の既定値は旧表の持つシーケンスを指しているので持ち主を移す
+    legacy_seq := pg_get_serial_sequence('public.mood_register_log_legacy', 'id');
+    if legacy_identity = '' and legacy_seq is not null then
+        execute format('alter sequence %s owned by public.mood_register_log.id', legacy_seq);
+    end if;
+
+    seq := pg_get_serial_sequence('public.mood_register_log', 'id');
+    if seq is null then
+        raise exception 'mood_register_log.id の採番シーケンスが見つかりません';
+    end if;
+    perform setval(seq, coalesce((select max(id) from public.mood_register_log), 1));
+end;
+$$;
+
+-- =========================
+-- 4. インデックス・RLS・権限の引き継ぎ
+-- =========================
+
+do $$
+declare
+    idx   record;
+    pol   record;
+    acl   record;
+    flags record;
+begin
+    -- 親表に張ると全パーティションに作られる（一意インデックスは created_at を含まないと作れず、ここで止まる）
+    for idx in select definition from mood_register_log_index_defs loop
+        execute idx.definition;
+    end loop;
+
+    select relrowsecurity, relforcerowsecurity, pg_get_userbyid(relowner) as owner into flags
+    from pg_class
+    where oid = 'public.mood_register_log_legacy'::regclass;
+    execute format('alter table public.mood_register_log owner to %I', flags.owner);
+    if flags.relrowsecurity then
+        alter table public.mood_register_log enable row level security;
+    end if;
+    if flags.relforcerowsecurity then
+        alter table public.mood_register_log force row level security;
+    end if;
+
+    for pol in
+        select * from pg_policies
+        where schemaname = 'public' and tablename = 'mood_register_log_legacy'
+    loop
+        execute format(
+            'create policy %I on public.mood_register_log as %s for %s to %s%s%s',
+            pol.policyname,
+            pol.permissive,
+            pol.cmd,
+            (select string_agg(case when r = 'public' then 'public' else quote_ident(r) end, ', ') from unnest(pol.roles) r),
+            case when pol.qual is not null then format(' using (%s)', pol.qual) else '' end,
+            case when pol.with_check is not null then format(' with check (%s)', pol.with_check) else '' end
+        );
+    end loop;
+
+    for acl in
+        select case when a.grantee = 0 then 'public' else quote_ident(pg_get_userbyid(a.grantee)) end as grantee,
+               string_agg(a.privilege_type, ', ') as privileges
+        from pg_class c, aclexplode(c.relacl) a
+        where c.oid = 'public.mood_register_log_legacy'::regclass
+          and a.grantee <> c.relowner
+        group by 1
+    loop
+        execute format('grant %s on public.mood_register_log to %s', acl.privileges, acl.grantee);
+    end loop;
+end;
+$$;
+
+drop table public.mood_register_log_legacy;
+
+-- =========================
+-- 5. アーカイブ（古い月を集計行に圧縮）
+-- =========================
+
+create table if not exists public.mood_register_log_monthly_summary (
+    user_id         uuid    not null,
+    month_start     date    not null,   -- JSTの月初
+    onomatopoeia_id integer not null default 0,
+    situation_id    integer not null default 0,
+    cat_id          integer not null default 0,
+    after_mood_id   integer not null default 0,
+    character_name  text    not null default '',
+    records         integer not null,
+    points_earned   integer not null,
+    primary key (user_id, month_start, onomatopoeia_id, situation_id, cat_id, after_mood_id, character_name)
+);
+
+alter table public.mood_register_log_monthly_summary enable row level security;
+
+create policy "mood_register_log_monthly_summary_select_own" on public.mood_register_log_monthly_summary
+    for select using (auth.uid() = user_id);
+
+-- 切り離したパーティションの置き場（APIには公開しない）
+create schema if not exists mood_register_log_archive;
+revoke all on schema mood_register_log_archive from public, anon, authenticated;
+
+-- retain_months より古い月次パーティションを集計行にまとめて切り離す
+-- 切り離した表は mood_register_log_archive スキーマに移して残す（drop_detached => true のときだけ削除）
+create or replace function public.archive_mood_register_log(retain_months integer default 24, drop_detached boolean default false)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    cutoff    date := (date_trunc('month', now() at time zone 'Asia/Tokyo') - make_interval(months => retain_months))::date;
+    part      record;
+    archived  integer := 0;
+begin
+    for part in
+        select c.relname as name,
+               to_date(substring(c.relname from 'y(\d{4})m(\d{2})$'), 'YYYYMM') as month_start
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        where i.inhparent = 'public.mood_register_log'::regclass
+          and c.relname ~ '^mood_register_log_y\d{4}m\d{2}$'
+        order by 2
+    loop
+        exit when part.month_start >= cutoff;
+
+        execute format(
+            'insert into public.mood_register_log_monthly_summary
+                 (user_id, month_start, onomatopoeia_id, situation_id, cat_id, after_mood_id, character_name, records, points_earned)
+             select user_id, %L::date,
+                    coalesce(onomatopoeia_id, 0), coalesce(situation_id, 0), coalesce(cat_id, 0),
+                    coalesce(after_mood_id, 0), coalesce(character_name, ''''),
+                    count(*), coalesce(sum(points_earned), 0)
+             from public.%I
+             group by 1, 2, 3, 4, 5, 6, 7
+             on conflict (user_id, month_start, onomatopoeia_id, situation_id, cat_id, after_mood_id, character_name)
+             do update set records = excluded.records, points_earned = excluded.points_earned',
+            part.month_start,
+            part.name
+        );
+        execute format('alter table public.mood_register_log detach partition public.%I', part.name);
+        if drop_detached then
+            execute format('drop table public.%I', part.name);
+        else
+            execute format('alter table public.%I set schema mood_register_log_archive', part.name);
+        end if;
+        archived := archived + 1;
+    end loop;
+    return archived;
+end;
+$$;
+
+revoke execute on function public.ensure_mood_register_log_partitions(integer, date) from public, anon, authenticated;
+revoke execute on function public.archive_mood_register_log(integer, boolean) from public, anon, authenticated;
+grant execute on function public.ensure_mood_register_log_partitions(integer, date) to service_role;
+grant execute on function public.archive_mood_register_log(integer, boolean) to service_role;
+
+-- =========================
+-- 6. 定期実行（pg_cron が有効な場合のみ）
+-- =========================
+-- 毎月1日 12:00 / 12:30 JST（パーティションは3か月先まで作るので、実行時刻は月初のどこでもよい）
+
+do $$
+begin
+    if exists (select 1 from pg_extension where extname = 'pg_cron') then
+        perform cron.schedule(
+            'mood-register-log-partitions',
+            '0 3 1 * *',
+            'select public.ensure_mood_register_log_partitions(3)'
+        );
+        perform cron.schedule(
+            'mood-register-log-archive',
+            '30 3 1 * *',
+            'select public.archive_mood_register_log(24)'
+        );
+    end if;
+end;
+$$;
+
+commit;
@@ -0,0 +1,108 @@
+# tools/check_prompt_prefix.py
+"""
+提案生成のプロンプトの先頭が入力によって変わらないかを確認するスクリプト
+
+キャラクターごとに、リズムリセット・食事提案を入力（オノマトペ・シーン・季節）を変えて2回生成し、
+LLMに実際に送られたメッセージ（LLM fake で受け取ったもの）を比べる
+    - 最後のユーザーメッセージより前のメッセージがバイト単位で一致すること
+    - prompt_cache_key が一致すること
+    - 入力の値が最後のユーザーメッセージに入っていること
+プロバイダのプロンプトキャッシュは前方一致なので、先頭が1バイトでも変わると効かなくなる
+
+    python tools/check_prompt_prefix.py
+
+一致しないものがあれば終了コード1
+"""
+import json
+import os
+import sys
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+os.environ.update({"LLM_BACKEND": "fake", "LLM_LIMITS": "0", "LLM_COALESCE": "0"})
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+# 2回の生成で使う入力（すべての項目が異なるようにする）
+INPUTS = [
+    ("うとうと", "朝イチ", "春"),
+    ("イライラ", "締め切り直前", "冬"),
+]
+
+
+class RecordingCompletions:
+    """送られたリクエストを記録してから fake に渡す"""
+
+    def __init__(self, inner: Any):
+        self.inner = inner
+        self.requests: List[Dict[str, Any]] = []
+
+    def create(self, **kwargs: Any) -> Any:
+        self.requests.append(kwargs)
+        return self.inner.create(**kwargs)
+
+
+def check() -> List[str]:
+    from utils import llm
+    from utils.character_profiles import CHARACTER_PROFILES
+    from utils.llm_fake import FakeLLM, FakeOpenAI
+    from utils.meal_suggest import generate_meal_suggestion
+    from utils.rhythm_reset import generate_rhythm_reset
+
+    fake = FakeOpenAI(FakeLLM())
+    recorder = RecordingCompletions(fake.chat.completions)
+    llm._client = SimpleNamespace(chat=SimpleNamespace(completions=recorder))
+
+    generators = {"rhythm": generate_rhythm_reset, "meal": generate_meal_suggestion}
+    failures = []
+    for kind, generate in generators.items():
+        for character_name, profile in CHARACTER_PROFILES.items():
+            requests = []
+            for onomatopoeia, situation, season in INPUTS:
+                recorder.requests.clear()
+                # プロファイルは呼び出しごとに別のオブジェクトを渡す（中身で文字列が変わらないこと）
+                generate(onomatopoeia, character_name, dict(profile), situation, season)
+                if len(recorder.requests) != 1:
+                    failures.append(f"{kind}/{character_name}: LLMへの送信が {len(recorder.requests)} 回")
+                    break
+                requests.append(recorder.requests[0])
+            else:
+                failures.extend(f"{kind}/{character_name}: {problem}" for problem in compare(requests))
+            status = "❌" if any(f.startswith(f"{kind}/{character_name}:") for f in failures) else "✅"
+            print(f"{status} {kind}/{character_name}")
+    return failures
+
+
+def compare(requests: List[Dict[str, Any]]) -> List[str]:
+    """入力だけが違う2回のリクエストの先頭を比べる"""
+    problems = []
+    first, second = requests
+    if len(first["messages"]) < 2:
+        problems.append("最後のユーザーメッセージより前のメッセージがない")
+    prefixes = [json.dumps(r["messages"][:-1], ensure_ascii=False).encode("utf-8") for r in requests]
+    if prefixes[0] != prefixes[1]:
+        at = next((i for i, (a, b) in enumerate(zip(*prefixes)) if a != b), min(len(p) for p in prefixes))
+        problems.append(f"先頭のメッセージが {at} バイト目から異なる")
+    if first.get("prompt_cache_key") != second.get("prompt_cache_key"):
+        problems.append(f"prompt_cache_key が異なる（{first.get('prompt_cache_key')} / {second.get('prompt_cache_key')}）")
+    for request, values in zip(requests, INPUTS):
+        missing = [v for v in values if v not in request["messages"][-1]["content"]]
+        if missing:
+            problems.append(f"入力 {', '.join(missing)} が最後のユーザーメッセージに入っていない")
+    return problems
+
+
+def main() -> None:
+    failures = check()
+    print()
+    if failures:
+        print(f"❌ 先頭が入力によって変わるプロンプトが {len(failures)} 件あります")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("✅ すべてのキャラクターでプロンプトの先頭が入力によらず一致しています")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+# tools/history_transfer.py
+"""
+ユーザーの記録（mood_register_log / points_ledger / feeding_event_log）の一括エクスポート・インポート
+1行ずつ register_mood を通さず、チャンク単位で読み書きするのでメモリ使用量は一定
+
+エクスポート（キーセットページングで chunk-size 行ずつ取得し、そのまま追記）:
+    python tools/history_transfer.py export --user-id <uuid> --out exports/ --format parquet
+    python tools/history_transfer.py export --user-id <uuid> --out exports/ --format csv
+
+インポート（chunk-size 行ずつ一括挿入し、挿入できた行の分だけポイント台帳に追記）:
+    python tools/history_transfer.py import --user-id <uuid> --src exports/
+    python tools/history_transfer.py import --user-id <new-uuid> --src exports/ --from-user-id <old-uuid>
+
+出力ファイル: <out>/<テーブル名>.parquet または .csv
+Parquet には pyarrow が必要（pip install pyarrow）。CSVは標準ライブラリのみ
+
+接続先:
+    SUPABASE_BACKEND=local のときはローカルのSQLite版スタンドイン
+    それ以外は SUPABASE_URL と SUPABASE_SERVICE_ROLE_KEY（RLSを越えて読み書きするため）
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# 列と型（Parquetのスキーマをチャンク間で固定するため明示する）
+# int / str / json（dictをJSON文字列で保存） / bool
+TABLE_COLUMNS: Dict[str, Dict[str, str]] = {
+    "mood_register_log": {
+        "id": "int",
+        "client_event_id": "str",
+        "user_id": "str",
+        "onomatopoeia_id": "int",
+        "cat_id": "int",
+        "after_mood_id": "int",
+        "points_earned": "int",
+        "situation_id": "int",
+        "comment": "str",
+        "character_name": "str",
+        "rhythm_content": "json",
+        "meal_content": "json",
+        "created_at": "str",
+    },
+    "points_ledger": {
+        "id": "int",
+        "user_id": "str",
+        "week_start_date": "str",
+        "delta": "int",
+        "source": "str",
+        "source_id": "str",
+        "created_at": "str",
+    },
+    "feeding_event_log": {
+        "id": "int",
+        "user_id": "str",
+        "feed_id": "int",
+        "feed_at": "str",
+    },
+}
+
+# キーセットページングの並び順（インデックスの先頭列 user_id の後ろに続く列）
+TABLE_ORDER: Dict[str, str] = {
+    "mood_register_log": "created_at",
+    "points_ledger": "created_at",
+    "feeding_event_log": "feed_at",
+}
+
+
+def get_client():
+    from dotenv import load_dotenv
+    from utils.local_backend import is_local_backend, get_local_client
+
+    load_dotenv()
+    if is_local_backend():
+        return get_local_client()
+
+    from supabase import create_client
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        print("❌ SUPABASE_URL と SUPABASE_SERVICE_ROLE_KEY を設定してください")
+        sys.exit(2)
+    return create_client(url, key)
+
+
+# =========================
+# 読み出し（キーセットページング）
+# =========================
+
+def iter_table_chunks(supabase, table: str, user_id: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """(order列, id) の昇順で chunk_size 行ずつ返す。OFFSETを使わないので深いページも一定コスト"""
+    order_col = TABLE_ORDER[table]
+    columns = ", ".join(TABLE_COLUMNS[table])
+    cursor: Optional[Tuple[str, int]] = None
+
+    while True:
+        query = supabase.table(table).select(columns).eq("user_id", user_id)
+        if cursor is not None:
+            value, last_id = cursor
+            query = query.or_(f'{order_col}.gt."{value}",and({order_col}.eq."{value}",id.gt.{last_id})')
+        rows = query.order(order_col).order("id").limit(chunk_size).execute().data or []
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        cursor = (rows[-1][order_col], rows[-1]["id"])
+
+
+# =========================
+# 書き出し
+# =========================
+
+def _to_cell(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    if kind == "json":
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    if kind == "int":
+        return int(value)
+    if kind == "bool":
+        return bool(value)
+    return str(value)
+
+
+def _from_cell(value: Any, kind: str) -> Any:
+    """CSV/Parquetから読んだ値を元の型に戻す（CSVの空文字はNone）"""
+    if value is None or value == "":
+        return None
+    if kind == "json":
+        return json.loads(value) if isinstance(value, str) else value
+    if kind == "int":
+        return int(value)
+    if kind == "bool":
+        return value if isinstance(value, bool) else str(value).lower() in ("true", "1")
+    return str(value)
+
+
+class CsvChunkWriter:
+    def __init__(self, path: str, columns: Dict[str, str]):
+        self.columns = columns
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=list(columns))
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._writer.writerows({c: _to_cell(row.get(c), k) for c, k in self.columns.items()} for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetChunkWriter:
+    """チャンクごとに1つの row group として追記する"""
+
+    def __init__(self, path: str, columns: Dict[str, str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {"int": pa.int64(), "str": pa.string(), "json": pa.string(), "bool": pa.bool_()}
+        self.pa = pa
+        self.columns = columns
+        self.schema = pa.schema([(c, types[k]) for c, k in columns.items()])
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        data = {c: [_to_cell(row.get(c), k) for row in rows] for c, k in self.columns.items()}
+        self._writer.write_table(self.pa.Table.from_pydict(data, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def _open_writer(path: str, fmt: str, columns: Dict[str, str]):
+    if fmt == "parquet":
+        try:
+            return ParquetChunkWriter(path, columns)
+        except ImportError:
+            print("❌ pyarrow がインストールされていません（pip install pyarrow）。--format csv も使えます")
+            sys.exit(2)
+    return CsvChunkWriter(path, columns)
+
+
+def export_history(supabase, user_id: str, out_dir: str, fmt: str, chunk_size: int) -> Dict[str, int]:
+    os.makedirs(out_dir, exist_ok=True)
+    counts: Dict[str, int] = {}
+    for table, columns in TABLE_COLUMNS.items():
+        path = os.path.join(out_dir, f"{table}.{fmt}")
+        writer = _open_writer(path, fmt, columns)
+        counts[table] = 0
+        try:
+            for rows in iter_table_chunks(supabase, table, user_id, chunk_size):
+                writer.write(rows)
+                counts[table] += len(rows)
+        finally:
+            writer.close()
+        print(f"✅ {table}: {counts[table]}行 → {path}")
+    return counts
+
+
+# =========================
+# 読み込み
+# =========================
+
+def iter_file_chunks(path: str, columns: Dict[str, str], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("❌ pyarrow がインストールされていません（pip install pyarrow）")
+            sys.exit(2)
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield [
+                {c: _from_cell(row.get(c), k) for c, k in columns.items()}
+                for row in batch.to_pylist()
+            ]
+        return
+
+    with open(path, newline="", encoding="utf-8") as f:
+        chunk: List[Dict[str, Any]] = []
+        for row in csv.DictReader(f):
+            chunk.append({c: _from_cell(row.get(c), k) for c, k in columns.items()})
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _find_file(src_dir: str, table: str) -> Optional[str]:
+    for ext in ("parquet", "csv"):
+        path = os.path.join(src_dir, f"{table}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _event_id(user_id: str, row: Dict[str, Any], source_id: Optional[Any]) -> str:
+    """
+    移行先の冪等キーを決める（同じファイルを再インポートしても同じ値になる）
+    元の行を区別できるよう、元の client_event_id、なければ移行元の id を含める
+    （内容だけでは、同じ時刻・同じ選択の別々の登録が1件にまとめられてしまう）
+    """
+    original = row.get("client_event_id") or (f"id:{source_id}" if source_id is not None else "")
+    key = f"{user_id}|{original}|{row['created_at']}|{row.get('onomatopoeia_id')}|{row.get('after_mood_id')}|{row.get('points_earned')}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+def import_mood_log(supabase, user_id: str, path: str, chunk_size: int, from_user_id: Optional[str]) -> int:
+    from utils import points_ledger
+    from utils.services import insert_mood_rows
+
+    inserted = 0
+    for rows in iter_file_chunks(path, TABLE_COLUMNS["mood_register_log"], chunk_size):
+        batch = []
+        for row in rows:
+            if from_user_id and row["user_id"] != from_user_id:
+                continue
+            source_id = row.pop("id", None)  # IDは移行先で採番
+            if user_id != row["user_id"] or not row.get("client_event_id"):
+                row["client_event_id"] = _event_id(user_id, row, source_id)
+            row["user_id"] = user_id
+            batch.append(row)
+        if batch:
+            logged = insert_mood_rows(supabase, batch)
+            # 前回のインポートで行だけ入っていた分も追記する（台帳は client_event_id で一意）
+            points_ledger.append_entries(supabase, [points_ledger.mood_entry(row) for row in batch])
+            inserted += len(logged)
+    return inserted
+
+
+def import_feeding_log(supabase, user_id: str, path: str, chunk_size: int, from_user_id: Optional[str]) -> int:
+    from utils import jst_calendar, points_ledger
+    from utils.services import get_all_feeds
+
+    # 餌やりは週1回なので既存分は全件読んでも小さい。同じ時刻の行はスキップして再インポートに備える
+    existing = {
+        row["feed_at"]
+        for rows in iter_table_chunks(supabase, "feeding_event_log", user_id, chunk_size)
+        for row in rows
+    }
+    feed_points = {feed["id"]: feed["feed_point"] for feed in get_all_feeds(supabase)}
+    inserted = 0
+    for rows in iter_file_chunks(path, TABLE_COLUMNS["feeding_event_log"], chunk_size):
+        batch = [
+            {"user_id": user_id, "feed_id": row["feed_id"], "feed_at": row["feed_at"]}
+            for row in rows
+            if (not from_user_id or row["user_id"] == from_user_id) and row["feed_at"] not in existing
+        ]
+        if batch:
+            fed = supabase.table("feeding_event_log").insert(batch).execute().data or []
+            # 餌やりは先週分の残高から差し引かれる
+            entries = []
+            for row in fed:
+                feed_week = jst_calendar.week_start_of(datetime.fromisoformat(row["feed_at"].replace("Z", "+00:00")))
+                entries.append(points_ledger.spend_entry(
+                    user_id,
+                    jst_calendar.week_window(feed_week, -1).start_date,
+                    feed_points.get(row["feed_id"], 0),
+                    source_id=f"feeding_event_log:{row['id']}",
+                ))
+            points_ledger.append_entries(supabase, entries)
+            inserted += len(batch)
+    return inserted
+
+
+def import_history(supabase, user_id: str, src_dir: str, chunk_size: int, from_user_id: Optional[str]) -> None:
+    mood_path = _find_file(src_dir, "mood_register_log")
+    if mood_path:
+        print(f"✅ mood_register_log: {import_mood_log(supabase, user_id, mood_path, chunk_size, from_user_id)}行を追加")
+    feeding_path = _find_file(src_dir, "feeding_event_log")
+    if feeding_path:
+        print(f"✅ feeding_event_log: {import_feeding_log(supabase, user_id, feeding_path, chunk_size, from_user_id)}行を追加")
+    # points_ledger は派生データなのでファイルからは入れず、取り込んだ記録の分だけ追記している
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="記録の一括エクスポート・インポート")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_exp = sub.add_parser("export", help="ユーザーの記録をファイルに書き出す")
+    p_exp.add_argument("--user-id", required=True)
+    p_exp.add_argument("--out", required=True, help="出力先ディレクトリ")
+    p_exp.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    p_exp.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    p_imp = sub.add_parser("import", help="書き出したファイルから記録を取り込む")
+    p_imp.add_argument("--user-id", required=True, help="取り込み先のユーザー")
+    p_imp.add_argument("--src", required=True, help="export の出力ディレクトリ")
+    p_imp.add_argument("--from-user-id", default=None, help="ファイル内のこのユーザーの行だけ取り込む")
+    p_imp.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    args = parser.parse_args()
+    supabase = get_client()
+
+    if args.command == "export":
+        export_history(supabase, args.user_id, args.out, args.format, args.chunk_size)
+    else:
+        import_history(supabase, args.user_id, args.src, args.chunk_size, args.from_user_id)
+
+
+if __name__ == "__main__":
+    main()
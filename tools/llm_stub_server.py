@@ -0,0 +1,103 @@
+# tools/llm_stub_server.py
+"""
+OpenAI互換のローカルLLMスタブサーバー
+/v1/chat/completions に対して、設定したレイテンシ分布・エラー率で
+キャラクター別の定型JSONを返す（ネットワークなしでのベンチマーク用）
+
+使い方:
+    python tools/llm_stub_server.py --port 8787 --latency-ms 800 --latency-dist lognormal --jitter 0.4 --error-rate 0.05 --seed 42
+
+アプリ側の設定（.env など）:
+    LLM_BACKEND=stub
+    LLM_BASE_URL=http://127.0.0.1:8787/v1
+"""
+import argparse
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from utils.llm_fake import FakeLLM, FakeLLMError, build_completion  # noqa: E402
+
+
+def make_handler(llm: FakeLLM, quiet: bool):
+    class StubHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body: dict) -> None:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "invalid JSON body"}})
+                return
+
+            messages = request.get("messages") or []
+            try:
+                content = llm.complete(messages)
+            except FakeLLMError as e:
+                # OpenAI SDK がリトライ対象として扱う 503 を返す
+                self._send_json(503, {"error": {"message": str(e), "type": "server_error"}})
+                return
+
+            cached_tokens = llm.prefix_cache.lookup(messages)
+            self._send_json(200, build_completion(content, messages, request.get("model", "gpt-4o-mini"), cached_tokens))
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+    return StubHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI互換のローカルLLMスタブ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="レイテンシの中央値（ミリ秒）")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "normal", "lognormal"], default="lognormal")
+    parser.add_argument("--jitter", type=float, default=0.4, help="分布の広がり")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="エラー注入率（0〜1）")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cache-min-tokens", type=int, default=1024, help="プロンプトキャッシュが効き始めるトークン数")
+    parser.add_argument("--quiet", action="store_true", help="アクセスログを出さない")
+    args = parser.parse_args()
+
+    llm = FakeLLM(
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        cache_min_tokens=args.cache_min_tokens,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(llm, args.quiet))
+    print(f"🐱 LLM stub listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# tools/log_analytics.py
+"""
+エクスポート済みの mood_register_log（tools/history_transfer.py の出力）を使った横断集計
+ファイルをチャンクごとに読み、pandas の groupby で集計して足し合わせるので、
+数千万行でも1台のマシンでメモリを一定に保ったまま処理できる
+
+    python tools/log_analytics.py exports/            # ディレクトリ（中の mood_register_log.*）
+    python tools/log_analytics.py exports/*/ --out analytics/ --chunk-size 500000
+
+集計内容:
+    transitions  オノマトペ → 気分の変化（after_mood_id）の遷移率
+    characters   キャラクターごとの記録数・合計ポイント・平均ポイント
+    heatmap      シーン × 時間帯（JST）の記録数
+    retention    初回週ごとのコホートの週次継続率
+
+Parquet の読み込みには pyarrow が必要（pip install pyarrow）
+"""
+import argparse
+import glob
+import os
+import sys
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+DEFAULT_CHUNK_SIZE = 200_000
+
+USECOLS = ["user_id", "onomatopoeia_id", "after_mood_id", "points_earned", "situation_id", "character_name", "created_at"]
+
+# 読み込み時の型（文字列の繰り返しが多い列は category にしてメモリを抑える）
+DTYPES = {
+    "user_id": "category",
+    "onomatopoeia_id": "Int64",
+    "after_mood_id": "Int64",
+    "points_earned": "Int64",
+    "situation_id": "Int64",
+    "character_name": "category",
+}
+
+# (user_id, 週) の重複除去をまとめて行う目安の行数
+USER_WEEKS_COMPACT_ROWS = 1_000_000
+
+
+# =========================
+# 読み込み
+# =========================
+
+def find_log_files(paths: List[str]) -> List[str]:
+    """
+    ファイル・ディレクトリ・globパターンから mood_register_log のファイルを集める
+    ディレクトリは1つにつき1ファイル（parquet があればそれ、なければ csv。両方あっても二重に数えない）
+    """
+    files: List[str] = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            if os.path.isdir(path):
+                for ext in ("parquet", "csv"):
+                    candidate = os.path.join(path, f"mood_register_log.{ext}")
+                    if os.path.exists(candidate):
+                        files.append(candidate)
+                        break
+            elif os.path.exists(path):
+                files.append(path)
+    return files
+
+
+def iter_log_chunks(files: List[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+    for path in files:
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                print("❌ pyarrow がインストールされていません（pip install pyarrow）")
+                sys.exit(2)
+            parquet = pq.ParquetFile(path)
+            columns = [c for c in USECOLS if c in parquet.schema_arrow.names]
+            for batch in parquet.iter_batches(batch_size=chunk_size, columns=columns):
+                yield batch.to_pandas().astype({c: t for c, t in DTYPES.items() if c in columns})
+        else:
+            yield from pd.read_csv(
+                path,
+                usecols=lambda c: c in USECOLS,
+                dtype=DTYPES,
+                chunksize=chunk_size,
+            )
+
+
+def prepare_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """created_at をJSTにし、集計用の hour / week 列を追加"""
+    created_at = pd.to_datetime(df["created_at"], format="ISO8601", utc=True).dt.tz_convert("Asia/Tokyo")
+    local = created_at.dt.tz_localize(None)
+    df = df.drop(columns=["created_at"])
+    df["hour"] = local.dt.hour.astype("int8")
+    # 週は月曜0:00 JST始まり（utils/jst_calendar.py と同じ区切り）
+    df["week"] = local.dt.normalize() - pd.to_timedelta(local.dt.weekday, unit="D")
+    return df
+
+
+# =========================
+# 集計（チャンクごとに部分集計して足し合わせる）
+# =========================
+
+class LogMetrics:
+    def __init__(self):
+        self.rows = 0
+        self.transitions: Optional[pd.Series] = None
+        self.characters: Optional[pd.DataFrame] = None
+        self.heatmap: Optional[pd.Series] = None
+        self._user_weeks: List[pd.DataFrame] = []
+        self._user_weeks_rows = 0
+
+    @staticmethod
+    def _add(total, part):
+        return part if total is None else total.add(part, fill_value=0)
+
+    def update(self, df: pd.DataFrame) -> None:
+        df = prepare_chunk(df)
+        self.rows += len(df)
+
+        self.transitions = self._add(
+            self.transitions,
+            df.groupby(["onomatopoeia_id", "after_mood_id"], observed=True).size(),
+        )
+        self.characters = self._add(
+            self.characters,
+            df.groupby("character_name", observed=True)["points_earned"].agg(["count", "sum"]),
+        )
+        self.heatmap = self._add(
+            self.heatmap,
+            df.groupby(["situation_id", "hour"], observed=True).size(),
+        )
+
+        pairs = df[["user_id", "week"]].drop_duplicates()
+        self._user_weeks.append(pairs)
+        self._user_weeks_rows += len(pairs)
+        if self._user_weeks_rows >= USER_WEEKS_COMPACT_ROWS:
+            self._compact_user_weeks()
+
+    def _compact_user_weeks(self) -> None:
+        if not self._user_weeks:
+            return
+        merged = pd.concat(self._user_weeks, ignore_index=True)
+        merged["user_id"] = merged["user_id"].astype(str)
+        merged = merged.drop_duplicates()
+        self._user_weeks = [merged]
+        self._user_weeks_rows = len(merged)
+
+    # ---------- 結果 ----------
+
+    def transition_rates(self) -> pd.DataFrame:
+        from utils.constants import AFTER_MOOD_CONFIG
+
+        if self.transitions is None:
+            return pd.DataFrame()
+        counts = self.transitions.unstack(fill_value=0)
+        rates = counts.div(counts.sum(axis=1), axis=0).round(4)
+        rates.columns = [AFTER_MOOD_CONFIG.get(int(c), {}).get("label", c) for c in rates.columns]
+        rates["n"] = counts.sum(axis=1).astype("int64")
+        return rates
+
+    def character_points(self) -> pd.DataFrame:
+        if self.characters is None:
+            return pd.DataFrame()
+        table = self.characters.rename(columns={"count": "records", "sum": "points"}).astype("int64")
+        table["mean_points"] = (table["points"] / table["records"]).round(2)
+        return table.sort_values("mean_points", ascending=False)
+
+    def situation_heatmap(self) -> pd.DataFrame:
+        if self.heatmap is None:
+            return pd.DataFrame()
+        return self.heatmap.unstack(fill_value=0).reindex(columns=range(24), fill_value=0).astype("int64")
+
+    def weekly_retention(self) -> pd.DataFrame:
+        self._compact_user_weeks()
+        if not self._user_weeks:
+            return pd.DataFrame()
+        user_weeks = self._user_weeks[0]
+        cohort = user_weeks.groupby("user_id")["week"].transform("min")
+        offset = ((user_weeks["week"] - cohort).dt.days // 7).astype("int64")
+        active = (
+            pd.DataFrame({"cohort": cohort.dt.date, "week_offset": offset})
+            .groupby(["cohort", "week_offset"])
+            .size()
+            .unstack(fill_value=0)
+        )
+        rates = active.div(active[0], axis=0).round(4)
+        rates.insert(0, "users", active[0])
+        return rates
+
+    def results(self) -> Dict[str, pd.DataFrame]:
+        return {
+            "transitions": self.transition_rates(),
+            "characters": self.character_points(),
+            "heatmap": self.situation_heatmap(),
+            "retention": self.weekly_retention(),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="エクスポート済みログの横断集計")
+    parser.add_argument("paths", nargs="+", help="mood_register_log のファイル、またはエクスポート先ディレクトリ（glob可）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--out", default=None, help="各集計をCSVで書き出すディレクトリ")
+    args = parser.parse_args()
+
+    files = find_log_files(args.paths)
+    if not files:
+        print("❌ mood_register_log のファイルが見つかりません")
+        sys.exit(2)
+
+    metrics = LogMetrics()
+    for chunk in iter_log_chunks(files, args.chunk_size):
+        metrics.update(chunk)
+        print(f"  … {metrics.rows:,}行", end="\r", file=sys.stderr)
+    print(file=sys.stderr)
+    print(f"✅ {len(files)}ファイル・{metrics.rows:,}行を集計しました")
+
+    results = metrics.results()
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    for name, table in results.items():
+        print(f"\n## {name}")
+        print(table.to_string() if not table.empty else "（データなし）")
+        if args.out:
+            table.to_csv(os.path.join(args.out, f"{name}.csv"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# tools/mood_log_maintenance.py
+"""
+mood_register_log の月次パーティション保守ジョブ
+supabase/runbooks/partition_mood_register_log.sql でパーティション化したDBが対象
+pg_cron が使えない環境では、このスクリプトを月1回（cronやGitHub Actionsなど）で実行する
+
+    python tools/mood_log_maintenance.py partitions --months-ahead 3
+    python tools/mood_log_maintenance.py archive --retain-months 24
+
+必要な環境変数:
+    SUPABASE_URL
+    SUPABASE_SERVICE_ROLE_KEY  （関数の実行権限は service_role のみ）
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+
+def get_service_client():
+    load_dotenv()
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        print("❌ SUPABASE_URL と SUPABASE_SERVICE_ROLE_KEY を設定してください")
+        sys.exit(2)
+    return create_client(url, key)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="mood_register_log のパーティション保守")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_part = sub.add_parser("partitions", help="先の月のパーティションを作成")
+    p_part.add_argument("--months-ahead", type=int, default=3)
+
+    p_arch = sub.add_parser("archive", help="古い月を集計行に圧縮して切り離す")
+    p_arch.add_argument("--retain-months", type=int, default=24)
+
+    args = parser.parse_args()
+    supabase = get_service_client()
+
+    if args.command == "partitions":
+        created = supabase.rpc("ensure_mood_register_log_partitions", {"months_ahead": args.months_ahead}).execute()
+        print(f"✅ 作成したパーティション: {created.data}")
+    else:
+        archived = supabase.rpc("archive_mood_register_log", {"retain_months": args.retain_months}).execute()
+        print(f"✅ アーカイブしたパーティション: {archived.data}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# tools/mood_outbox_status.py
+"""
+気分登録の書き込みキュー（utils/mood_outbox.py）の停止中イベントの確認
+MOOD_OUTBOX_MAX_ATTEMPTS 回続けて失敗し、ワーカーが再試行をやめたイベントをユーザーごとに出す
+
+    python tools/mood_outbox_status.py                      # 停止中のユーザー一覧
+    python tools/mood_outbox_status.py --requeue            # 原因を直したあと、全員分を送信待ちに戻す
+    python tools/mood_outbox_status.py --requeue --user-id <uuid>
+
+停止中のイベントがあり --requeue なしの場合は終了コード1
+ジャーナルはアプリのサーバー上にあるので、アプリと同じ MOOD_OUTBOX_PATH で実行する
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+
+def main() -> None:
+    from utils.mood_outbox import DEFAULT_OUTBOX_PATH, MoodOutbox
+
+    parser = argparse.ArgumentParser(description="書き込みキューの停止中イベントの確認")
+    parser.add_argument("--path", default=os.getenv("MOOD_OUTBOX_PATH", DEFAULT_OUTBOX_PATH))
+    parser.add_argument("--user-id", action="append", default=[], help="--requeue の対象ユーザー（複数指定可）")
+    parser.add_argument("--requeue", action="store_true", help="停止中のイベントを送信待ちに戻す")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"✅ ジャーナルがありません: {args.path}")
+        return
+
+    outbox = MoodOutbox(args.path)
+    stuck = outbox.stuck_users()
+    for user in stuck:
+        print(json.dumps(user, ensure_ascii=False))
+
+    if args.requeue:
+        count = outbox.requeue_stuck(args.user_id or None)
+        print(f"✅ {count}件を送信待ちに戻しました（アプリのワーカーが次の確認で送ります）")
+        return
+
+    print(f"{'✅' if not stuck else '⚠️'} 停止中 {len(stuck)}人 / 送信待ち {outbox.pending_count()}件")
+    if stuck:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# tools/points_reconcile.py
+"""
+ポイント台帳（points_ledger）と記録の突き合わせジョブ
+台帳に入っていない気分登録と、台帳の合計と食い違うスナップショットを数える
+
+    python tools/points_reconcile.py --since-days 14          # 直近14日に登録したユーザー全員
+    python tools/points_reconcile.py --user-id <uuid> --fix   # 足りないエントリの追記とスナップショットの作り直し
+
+食い違いが見つかり --fix なしの場合は終了コード1
+
+接続先:
+    SUPABASE_BACKEND=local のときはローカルのSQLite版スタンドイン
+    それ以外は SUPABASE_URL と SUPABASE_SERVICE_ROLE_KEY（RLSを越えて全ユーザーを読むため）
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from history_transfer import get_client  # noqa: E402
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def active_user_ids(supabase, since_days: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[str]:
+    """直近 since_days 日に気分を登録したユーザー（(created_at, id) のキーセットページング）"""
+    since = (datetime.now(timezone.utc) - timedelta(days=since_days)).isoformat()
+    users = set()
+    cursor = None
+    while True:
+        query = supabase.table("mood_register_log").select("id, user_id, created_at").gte("created_at", since)
+        if cursor is not None:
+            value, last_id = cursor
+            query = query.or_(f'created_at.gt."{value}",and(created_at.eq."{value}",id.gt.{last_id})')
+        rows = query.order("created_at").order("id").limit(chunk_size).execute().data or []
+        users.update(row["user_id"] for row in rows)
+        if len(rows) < chunk_size:
+            return sorted(users)
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+def main() -> None:
+    from utils.points_ledger import reconcile_user
+
+    parser = argparse.ArgumentParser(description="ポイント台帳と記録の突き合わせ")
+    parser.add_argument("--user-id", action="append", default=[], help="対象ユーザー（複数指定可）")
+    parser.add_argument("--since-days", type=int, default=14, help="--user-id がないとき、この日数内に登録したユーザーを対象にする")
+    parser.add_argument("--fix", action="store_true", help="足りないエントリを追記し、スナップショットを作り直す")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    supabase = get_client()
+    user_ids = args.user_id or active_user_ids(supabase, args.since_days, args.chunk_size)
+
+    drifted = 0
+    for user_id in user_ids:
+        report = reconcile_user(supabase, user_id, fix=args.fix, chunk_size=args.chunk_size)
+        if report["missing_entries"] or report["mismatched_entries"] or report["stale_snapshots"]:
+            drifted += 1
+            print(json.dumps(report, ensure_ascii=False))
+
+    print(f"{'✅' if not drifted else '⚠️'} {len(user_ids)}人中 {drifted}人に食い違い{'（修正済み）' if args.fix and drifted else ''}")
+    if drifted and not args.fix:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# tools/points_rollover.py
+"""
+週の切り替えジョブ（ポイント台帳のスナップショットを全ユーザー分まとめて進める）
+pg_cron が使えない環境では、このスクリプトを週1回（月曜 0:05 JST）に実行する
+
+    python tools/points_rollover.py                     # JSTの今週を開く
+    python tools/points_rollover.py --week 2026-10-19   # 指定した週（月曜）を開く
+
+処理の中身は supabase/migrations/20261019050000_points_weekly_rollover.sql の
+rollover_points_week() と同じ（先々週・先週の確定と今週のスナップショット作成）
+
+接続先:
+    SUPABASE_BACKEND=local のときはローカルのSQLite版スタンドインに同じSQLを直接流す
+    それ以外は SUPABASE_URL と SUPABASE_SERVICE_ROLE_KEY（関数の実行権限は service_role のみ）
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from history_transfer import get_client  # noqa: E402
+
+# rollover_points_week() のSQLite版
+LOCAL_CLOSE_SQL = """
+INSERT INTO points_ledger_snapshot (user_id, week_start_date, balance, last_entry_id, updated_at)
+SELECT l.user_id, l.week_start_date, SUM(l.delta), MAX(l.id), strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')
+FROM points_ledger l
+LEFT JOIN (
+    SELECT user_id, week_start_date, MIN(id) AS first_recent_id
+    FROM points_ledger
+    WHERE week_start_date IN (:week_before, :last_week)
+      AND created_at >= strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now', '-60 seconds')
+    GROUP BY user_id, week_start_date
+) r ON r.user_id = l.user_id AND r.week_start_date = l.week_start_date
+WHERE l.week_start_date IN (:week_before, :last_week)
+  AND l.id < COALESCE(r.first_recent_id, 9223372036854775807)
+GROUP BY l.user_id, l.week_start_date
+ON CONFLICT (user_id, week_start_date) DO UPDATE
+    SET balance = excluded.balance,
+        last_entry_id = excluded.last_entry_id,
+        updated_at = excluded.updated_at
+"""
+
+LOCAL_OPEN_SQL = """
+INSERT INTO points_ledger_snapshot (user_id, week_start_date, balance, last_entry_id)
+SELECT DISTINCT user_id, ?, 0, 0
+FROM points_ledger
+WHERE week_start_date = ?
+ON CONFLICT (user_id, week_start_date) DO NOTHING
+"""
+
+
+def rollover_local(client, this_week: date) -> int:
+    """ローカルのスタンドインで週を切り替え、確定したスナップショットの数を返す"""
+    last_week = (this_week - timedelta(days=7)).isoformat()
+    week_before = (this_week - timedelta(days=14)).isoformat()
+    conn = client.connection
+    closed = conn.execute(LOCAL_CLOSE_SQL, {"week_before": week_before, "last_week": last_week}).rowcount
+    conn.execute(LOCAL_OPEN_SQL, (this_week.isoformat(), last_week))
+    conn.commit()
+    return closed
+
+
+def main() -> None:
+    from utils import jst_calendar
+    from utils.local_backend import is_local_backend
+
+    parser = argparse.ArgumentParser(description="ポイント台帳の週の切り替え")
+    parser.add_argument("--week", type=date.fromisoformat, default=None, help="開く週（月曜、省略時はJSTの今週）")
+    args = parser.parse_args()
+
+    this_week = jst_calendar.week_window(args.week or jst_calendar.today_jst()).start_date
+    supabase = get_client()
+
+    if is_local_backend():
+        closed = rollover_local(supabase, this_week)
+    else:
+        closed = supabase.rpc("rollover_points_week", {"target_week": this_week.isoformat()}).execute().data
+    print(f"✅ {this_week.isoformat()} の週を開きました（確定したスナップショット: {closed}）")
+
+
+if __name__ == "__main__":
+    main()